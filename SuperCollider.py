@@ -1,48 +1,540 @@
 import sublime
 import sublime_plugin
+import bisect
+import codecs
+import concurrent.futures
+import fnmatch
+import hashlib
+import itertools
+import html
+import json
+import math
+import mmap
 import os
+import re
+import socket
+import struct
 import subprocess
 import threading
+import time
 from collections import deque
 
 TERMINATE_MSG = 'SublimeText: sclang terminated!\n'
-
-sc = None
+DROPPED_MSG = 'SublimeText: {} lines of sclang output dropped\n'
+SUPPRESSED_MSG = 'SublimeText: {} lines like "{}" suppressed\n'
+# maximum number of completions returned for a prefix
+COMPLETIONS_LIMIT = 200
+# maximum number of bytes taken from sclang's stdout per read
+READ_CHUNK_SIZE = 65536
+# maximum number of bytes written to sclang's stdin per write
+WRITE_CHUNK_SIZE = 16384
+# maximum number of bytes waiting to be written to sclang's stdin
+WRITE_QUEUE_BYTES = 4194304
+# how often the input queue status is refreshed while it is not empty
+INPUT_STATUS_MS = 250
+# how often the pipeline metrics in the status bar are refreshed
+METRICS_STATUS_MS = 1000
+# lines restored from the session log when the post view has no line limit
+SESSION_LOG_RESTORE_LINES = 10000
+# maximum number of results of a session log search
+SESSION_LOG_SEARCH_LIMIT = 1000
+# how long a blocked reader waits before re-checking whether it may block
+BACKLOG_BLOCK_WAIT = 0.1
+# post view flushes: minimum delay between flushes and max bytes per flush
+POST_VIEW_FRAME_MS = 16
+POST_VIEW_FRAME_BYTES = 65536
+# how often the count of a run of repeated post lines is posted
+POST_COALESCE_FLUSH_MS = 100
+# rate limited patterns tracked before expired ones are forgotten
+RATE_LIMIT_PATTERNS = 10000
+# how long to wait for sclang to answer a request
+REQUEST_TIMEOUT_MS = 5000
+# error and warning records kept for jumping to with next error
+OUTPUT_RECORDS_LIMIT = 1000
+# lines after an error or warning searched for its file and position
+OUTPUT_RECORD_LINES = 40
+# scsynth is reported as not responding after this many unanswered polls
+SERVER_STATUS_MISSED_POLLS = 3
+# minimum time between server CPU and late message warnings
+SERVER_WARNING_INTERVAL = 5
+# latest captured OSC messages shown in the trace view, and its refresh rate
+OSC_TRACE_VIEW_MESSAGES = 200
+OSC_TRACE_VIEW_MS = 500
+# posted by sclang once the class library has been compiled, or failed to
+SCLANG_READY = 'Welcome to SuperCollider'
+SCLANG_COMPILE_FAILED = 'Library has not been compiled successfully'
+# how long sclang is given to exit before it is terminated, then killed
+SCLANG_EXIT_MS = 1000
+SCLANG_TERMINATE_MS = 2000
+# how often the supervisor checks on sclang
+SUPERVISOR_TICK_MS = 100
+# sclang is busy while a heartbeat has been unanswered for this long
+HEARTBEAT_BUSY_MS = 500
+# delay before the first automatic restart, doubled up to the maximum for
+# each restart within AUTO_RESTART_RESET_S of the previous one
+AUTO_RESTART_MS = 1000
+AUTO_RESTART_MAX_MS = 60000
+AUTO_RESTART_RESET_S = 60
+
+# wraps code sent with SuperColliderProcess.request, the result is posted as
+# a flagged header line "<id> <status> <number of lines>" followed by the
+# result itself, all in a single post so nothing can be printed in between
+REQUEST_TEMPLATE = '''
+{{
+    var result, status = "ok";
+    result = {{
+        {code}
+    }}.try {{ |error|
+        status = "error";
+        error.errorString;
+    }};
+    result = result.asString;
+    ("{flag}rpc{flag}{id} " ++ status ++ " "
+        ++ (result.occurrencesOf($\\n) + 1) ++ "\\n" ++ result).postln;
+}}.value;
+'''
+
+# runs code warmup times, then times runs more runs of it, the result is the
+# times in milliseconds separated by spaces. Sent as a request, the code is
+# already in a function
+BENCHMARK_TEMPLATE = '''
+    var func = {{
+        {code}
+    }};
+    {warmup}.do {{ func.value }};
+    Array.fill({runs}, {{
+        var start = Main.elapsedTime;
+        func.value;
+        ((Main.elapsedTime - start) * 1000).asString;
+    }}).join(" ");
+'''
+
+# installs the OSC responder for the control channel, it only evaluates code
+# sent to its own port along with the token generated for this session
+CONTROL_TEMPLATE = '''
+    if(thisProcess.openUDPPort({port}).not) {{
+        Error("could not open UDP port {port}").throw;
+    }};
+    OSCdef(\\sublimeControl, {{ |msg|
+        if(msg[1].asString == "{token}") {{
+            msg[2].asString.interpret;
+        }};
+    }}, '/sublime/eval', recvPort: {port}).permanent_(true);
+    {port};
+'''
+# forwards every OSC message sclang receives, but the excluded addresses, to
+# the plugin's trace socket as '/sublime/trace', source port, receiving port,
+# address and arguments
+OSC_TRACE_START_TEMPLATE = '''
+    var net = NetAddr("127.0.0.1", {port});
+    var exclude = {exclude};
+    var func = Library.at(\\sublime, \\oscTrace);
+    if(func.notNil) {{ thisProcess.removeOSCRecvFunc(func) }};
+    func = {{ |msg, time, addr, recvPort|
+        if(exclude.includes(msg[0]).not) {{
+            net.sendMsg("/sublime/trace", addr.port, recvPort, *msg);
+        }};
+    }};
+    Library.put(\\sublime, \\oscTrace, func);
+    thisProcess.addOSCRecvFunc(func);
+'''
+OSC_TRACE_STOP_CODE = '''
+    var func = Library.at(\\sublime, \\oscTrace);
+    if(func.notNil) {
+        thisProcess.removeOSCRecvFunc(func);
+        Library.put(\\sublime, \\oscTrace, nil);
+    };
+'''
+# sclang may still be compiling the class library when the channel is set up
+CONTROL_TIMEOUT_MS = 60000
+# larger control commands go through stdin
+CONTROL_MAX_BYTES = 8192
+
+# lists every class with the files defining it and its methods (extensions)
+CLASS_LIST_CODE = '''
+    Class.allClasses.reject(_.isMetaClass).collect {
+        |class|
+        var files = Set[class.filenameSymbol];
+        (class.methods ? []).do { |method| files.add(method.filenameSymbol) };
+        (class.class.methods ? []).do { |method|
+            files.add(method.filenameSymbol)
+        };
+        ([class.name] ++ files.asArray.sort).join("\\t");
+    }.join("\\n");
+'''
+# exports class, superclass, file and methods with argument names and defaults
+# a line per class: C name superclass file
+# and per method:   M class 0|1 (class method) name arg=default...
+CLASS_EXPORT_TEMPLATE = '''
+    var out = List[];
+    {classes}.do {{ |name|
+        var class = name.asClass;
+        if(class.notNil) {{
+            out.add(["C", class.name,
+                     if(class.superclass.notNil) {{
+                         class.superclass.name
+                     }} {{
+                         ""
+                     }},
+                     class.filenameSymbol].join("\\t"));
+            [class, class.class].do {{ |methodClass, isClassMethod|
+                (methodClass.methods ? []).do {{ |method|
+                    var args = List[];
+                    (method.argNames ? []).do {{ |argName, i|
+                        if(i > 0) {{
+                            args.add(argName ++ "=" ++
+                                (method.prototypeFrame ? [])[i].asCompileString);
+                        }};
+                    }};
+                    out.add((["M", class.name, isClassMethod, method.name]
+                            ++ args).join("\\t"));
+                }};
+            }};
+        }};
+    }};
+    out.join("\\n");
+'''
+
+# a changed SynthDef block, in place of SynthDef(...).add: stored in the
+# cache directory, then its hash is written next to it, which only happens
+# if building the SynthDef did not fail
+SYNTHDEF_STORE_TEMPLATE = (
+    '{{ |def| def.store(dir: {dir}); '
+    'File.use({dir} ++ "{name}.sha1", "w", {{ |file| file << "{digest}" }}); '
+    'def }}.value({source})')
+# unchanged SynthDefs are read from the cache directory, their descriptions
+# into the SynthDescLib and the defs into running servers with a single
+# /d_loadDir, servers booted later load the directory too
+SYNTHDEF_LOAD_TEMPLATE = '''
+    var dir = {dir};
+    {names}.do {{ |name|
+        SynthDescLib.global.read(dir ++ name ++ ".scsyndef");
+    }};
+    Library.put(\\sublime, \\synthDefDir, dir);
+    if(Library.at(\\sublime, \\synthDefBoot).isNil) {{
+        Library.put(\\sublime, \\synthDefBoot, {{ |server|
+            server.sendMsg("/d_loadDir", Library.at(\\sublime, \\synthDefDir));
+        }});
+        ServerBoot.add(Library.at(\\sublime, \\synthDefBoot));
+    }};
+    Server.all.do {{ |server|
+        if(server.serverRunning) {{ server.sendMsg("/d_loadDir", dir) }};
+    }};
+'''
+
+# file extensions of the SuperCollider syntax
+SOURCE_EXTENSIONS = ('.sc', '.scd')
+# worker threads used to index project files
+SYMBOL_INDEX_WORKERS = 4
+# maximum number of results of a help search
+HELP_SEARCH_LIMIT = 50
+# terms a partly typed search word may expand to
+HELP_PREFIX_TERMS = 200
+# the help files are checked for changes at most this often when searching
+HELP_INDEX_REFRESH_S = 60
+HELP_PANEL_NAME = 'SuperCollider - Help'
+BENCHMARK_PANEL_NAME = 'SuperCollider - Benchmark'
+# benchmarked blocks whose history is kept, the least recent are forgotten
+BENCHMARK_HISTORY_BLOCKS = 500
+
+instances = None
+symbols = None
+help_index = None
+benchmarks = None
 
 
 def plugin_loaded():
-    global sc
-    sc = SuperColliderProcess()
+    global instances, symbols, help_index, benchmarks
+    instances = InstancePool()
+    symbols = ProjectSymbolIndex(os.path.join(
+        sublime.cache_path(), 'SuperCollider', 'symbol_index.json'))
+    sublime.set_timeout_async(symbols.load_and_refresh_windows, 0)
+    help_index = HelpIndex(os.path.join(
+        sublime.cache_path(), 'SuperCollider', 'help_index.json'))
+    sublime.set_timeout_async(refresh_help_index, 0)
+    benchmarks = BenchmarkHistory(os.path.join(
+        sublime.cache_path(), 'SuperCollider', 'benchmark_history.json'))
 
 
 def plugin_unloaded():
-    global sc
-    if sc is not None:
-        sc.stop()
-        sc.deactivate_post_view(TERMINATE_MSG)
+    if instances is not None:
+        for instance in instances.all():
+            instance.stop()
+            instance.deactivate_post_view(TERMINATE_MSG)
+            instance.close()
+
+
+class InstancePool():
+    """The sclang instances, by window or project
+
+    The interpreter_per setting decides which windows share an instance:
+    'application' (all of them), 'project' (windows of the same project,
+    windows without one share the default instance) or 'window'.
+    Instances are created when first asked for and are given the
+    "SuperCollider" settings of their project's data, which override the
+    package settings, e.g. a different sc_path or sclang_args.
+    Instances share the class index and completions.
+    """
+
+    def __init__(self):
+        self.settings = sublime.load_settings('SuperCollider.sublime-settings')
+        self.instances = {}
+        self.class_index = ClassIndex(os.path.join(
+            sublime.cache_path(), 'SuperCollider', 'class_index.json'))
+        self.completions = CompletionIndex()
+        self.class_index.add_listener(self.completions.rebuild)
+        sublime.set_timeout_async(self.class_index.load, 0)
+
+    def key_for(self, window):
+        """(key, name) of the instance of window, name is None by default"""
+        per = self.settings.get('interpreter_per', 'project')
+        if window is None or per == 'application':
+            return 'default', None
+
+        if per == 'window':
+            return 'window-{}'.format(window.id()), 'window {}'.format(
+                window.id())
+
+        project = window.project_file_name()
+        if project:
+            return project, os.path.splitext(os.path.basename(project))[0]
+        return 'default', None
+
+    def get(self, view=None, window=None, create=True):
+        """The instance owning view (its post view), or window's instance"""
+        if view is not None:
+            for instance in self.instances.values():
+                if instance.owns_view(view):
+                    return instance
+            window = view.window() or window
+
+        if window is None:
+            window = sublime.active_window()
+
+        key, name = self.key_for(window)
+        instance = self.instances.get(key)
+        if instance is None and create:
+            instance = SuperColliderProcess(
+                key, name, self.project_settings(window), self.class_index,
+                self.completions)
+            self.instances[key] = instance
+        return instance
+
+    def project_settings(self, window):
+        data = window.project_data() if window is not None else None
+        if not isinstance(data, dict):
+            return {}
+        return data.get('SuperCollider', {})
+
+    def all(self):
+        return sorted(self.instances.values(),
+                      key=lambda instance: instance.key != 'default')
+
+    def prune(self):
+        """Forget stopped instances whose windows have all been closed"""
+        window_keys = set(self.key_for(window)[0]
+                          for window in sublime.windows())
+        for key, instance in list(self.instances.items()):
+            if (key != 'default' and key not in window_keys and
+                    not instance.is_alive()):
+                instance.close()
+                del self.instances[key]
+
+
+def process_rss(pid):
+    """Resident memory of process pid in bytes, None where unknown
+
+    Read from /proc on Linux, from ps on macOS (and other systems without
+    /proc), unknown on Windows.
+    """
+    try:
+        with open('/proc/{}/status'.format(pid)) as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    if sublime.platform() == 'windows':
+        return None
+    try:
+        output = subprocess.check_output(['ps', '-o', 'rss=', '-p', str(pid)])
+        return int(output.split()[0]) * 1024
+    except (OSError, subprocess.CalledProcessError, ValueError, IndexError):
+        return None
+
+
+def spawn_sclang(args, cwd, close_fds, shell):
+    return subprocess.Popen(
+        args=args,
+        cwd=cwd,
+        bufsize=0,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        close_fds=close_fds,
+        shell=shell
+    )
 
 
 class SuperColliderProcess():
     post_view = None
     tracing_osc = False
 
-    def __init__(self):
+    def __init__(self, key='default', name=None, overrides=None,
+                 class_index=None, completions=None):
         self.settings = sublime.load_settings('SuperCollider.sublime-settings')
+        # instances other than the default one are named after their
+        # project or window, and can override settings
+        self.key = key
+        self.name = name
+        self.overrides = overrides or {}
+        self.setting_tags = []
+
+        self.sclang_thread = None
+        self.sclang_process = None
+        self.sclang_queue = None
+        self.sclang_coalescer = None
+        self.sclang_writer = None
+        # a compiled sclang waiting to replace this one, see warm_standby
+        self.standby = None
+        self.ready_requested = None
+        self.last_ready_ms = None
+        self.recompiling = False
+        # the supervisor of the current process keeps its state up to date:
+        # starting, compiling, ready, busy, hung or dead
+        self.supervisor = None
+        self.state = 'dead'
+        self.outage = None
+        self.last_recovery_ms = None
+        self.auto_restarts = 0
+        self.last_auto_restart = 0
+        self.input_status_scheduled = False
+        # status bar texts by kind (state, input, metrics, server), None once
+        # cleared, shown in the views of this instance's windows
+        self.statuses = {}
+        # requests waiting for an answer from sclang, by id
+        self.requests = {}
+        self.requests_lock = threading.Lock()
+        self.request_ids = itertools.count(1)
+        # class library metadata, loaded from disk and updated from sclang
+        if class_index is None:
+            class_index = ClassIndex(os.path.join(
+                sublime.cache_path(), 'SuperCollider', 'class_index.json'))
+            completions = CompletionIndex()
+            class_index.add_listener(completions.rebuild)
+            sublime.set_timeout_async(class_index.load, 0)
+        self.class_index = class_index
+        self.completions = completions
+        # scsynth's /status, polled directly without going through sclang
+        self.server_monitor = ServerStatusMonitor(self.on_server_status)
+        self.server_late_lines = 0
+        self.server_late_shown = 0
+        self.server_warned = 0
+        # OSC messages received by sclang, captured outside of the post view
+        self.osc_trace = OscTrace()
+        self.osc_trace_view = None
+        self.osc_trace_view_scheduled = False
+        # out of band control channel, see start_control_channel
+        self.control_socket = None
+        self.control_port = None
+        self.control_token = None
+        # post view flushes are only scheduled when there is output waiting
+        self.post_view_update_lock = threading.Lock()
+        self.post_view_update_scheduled = False
+        self.coalescer_flush_scheduled = False
+        self.post_view_update_requested = None
+        # throughput and latency of reading, posting and writing
+        self.metrics = PipelineMetrics()
+        self.metrics_status_scheduled = False
+        self.metrics_status_last = None
+        # errors and warnings found in the output of the current session
+        self.output_records = deque(maxlen=OUTPUT_RECORDS_LIMIT)
+        self.output_record_serials = itertools.count(1)
+        self.output_record_visited = 0
 
         # load settings
         self.update_sc_path()
-        self.settings.add_on_change('sc_path', self.update_sc_path)
+        self.add_on_change('sc_path', self.update_sc_path)
+        self.add_on_change('sclang_args', self.update_sc_path)
 
         self.update_post_view_max_lines()
-        self.settings.add_on_change('max_post_view_lines',
-                                    self.update_post_view_max_lines)
+        self.add_on_change('max_post_view_lines',
+                           self.update_post_view_max_lines)
+
+        self.update_post_backlog()
+        self.add_on_change('max_post_backlog_lines',
+                           self.update_post_backlog)
+        self.add_on_change('post_backlog_overflow',
+                           self.update_post_backlog)
+
+        self.update_post_coalescing()
+        self.add_on_change('collapse_repeated_post_lines',
+                           self.update_post_coalescing)
+        self.add_on_change('post_rate_limit_per_pattern',
+                           self.update_post_coalescing)
 
         self.update_stdout_flag()
-        self.settings.add_on_change('stdout_flag', self.update_stdout_flag)
+        self.add_on_change('stdout_flag', self.update_stdout_flag)
+
+        self.update_warm_standby()
+        self.add_on_change('warm_standby', self.update_warm_standby)
+
+        self.update_supervision()
+        for key in ('sclang_heartbeat_ms', 'sclang_hang_timeout_ms',
+                    'auto_restart_sclang'):
+            self.add_on_change(key, self.update_supervision)
+
+        self.update_show_pipeline_metrics()
+        self.add_on_change('show_pipeline_metrics',
+                           self.update_show_pipeline_metrics)
 
         self.update_open_post_view_in()
-        self.settings.add_on_change('open_post_view_in',
-                                    self.update_open_post_view_in)
+        self.add_on_change('open_post_view_in',
+                           self.update_open_post_view_in)
+
+        self.update_osc_control_port()
+        self.add_on_change('osc_control_port',
+                           self.update_osc_control_port)
+
+        self.update_osc_trace()
+        for key in ('osc_trace_buffer', 'osc_trace_include',
+                    'osc_trace_exclude', 'osc_trace_sample',
+                    'osc_trace_rate_limit', 'osc_trace_to_post_view'):
+            self.add_on_change(key, self.update_osc_trace)
+
+        self.update_server_status()
+        for key in ('server_address', 'server_port', 'server_status_poll_ms',
+                    'server_cpu_warning'):
+            self.add_on_change(key, self.update_server_status)
+
+        # every line of output is kept in a rotating log on disk
+        log_dir = os.path.join(sublime.cache_path(), 'SuperCollider', 'logs')
+        if self.name is not None:
+            log_dir = os.path.join(log_dir, re.sub(r'[^\w.-]', '_', self.name))
+        self.session_log = SessionLog(log_dir)
+        self.update_session_log()
+        self.add_on_change('session_log', self.update_session_log)
+        self.add_on_change('session_log_max_mb',
+                           self.update_session_log)
+        self.add_on_change('session_log_max_files',
+                           self.update_session_log)
+
+        # compiled SynthDefs, reused while their source does not change
+        cache_dir = os.path.join(sublime.cache_path(), 'SuperCollider',
+                                 'synthdefs')
+        if self.name is not None:
+            cache_dir = os.path.join(cache_dir,
+                                     re.sub(r'[^\w.-]', '_', self.name))
+        self.synthdef_cache = SynthDefCache(cache_dir)
+        self.update_synthdef_cache()
+        self.add_on_change('synthdef_cache', self.update_synthdef_cache)
+
+        self.update_benchmark()
+        for key in ('benchmark_runs', 'benchmark_warmup',
+                    'benchmark_timeout_ms', 'benchmark_history',
+                    'benchmark_regression'):
+            self.add_on_change(key, self.update_benchmark)
 
         # Would like to auto syntax-highlight post window, but it doesn't play
         # nice. Changes the syntax of the view, but doesn't update highlighting
@@ -50,19 +542,19 @@ class SuperColliderProcess():
         # // Whether to syntax highlight the post view, use either "True" or "False"
         # "highlight_post_view": "True",
         self.update_highlight_post_view()
-        self.settings.add_on_change('highlight_post_view',
-                                    self.update_highlight_post_view)
-
-        self.sclang_thread = None
-        self.sclang_process = None
-        self.sclang_queue = None
-        self.sclang_thread = None
+        self.add_on_change('highlight_post_view',
+                           self.update_highlight_post_view)
 
-        self.post_view_name = 'SuperCollider - Post'
+        suffix = '' if self.name is None else ' ({})'.format(self.name)
+        self.post_view_name = 'SuperCollider - Post' + suffix
+        self.info_panel_name = 'SuperCollider - Info' + suffix
+        self.osc_trace_view_name = 'SuperCollider - OSC Trace' + suffix
         self.inactive_post_view_name = '{} - Inactive'.format(
             self.post_view_name)
         self.post_view = None
         self.post_view_cache = None
+        # when logging, closed post views are restored from the session log
+        self.post_view_restore_from_log = False
         self.panel_open = False
         # the post view buffer is kept alive, even when the views into it are
         # closed with this cache, we can restore the previous state when
@@ -89,23 +581,127 @@ class SuperColliderProcess():
 
     # Settings callbacks
     # --------------------------------------------------------------------------
+    def setting(self, key, default=None):
+        # project settings of this instance override the package settings
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.settings.get(key, default)
+
+    def add_on_change(self, tag, callback):
+        # tags are per instance, or instances would replace each other's
+        tag = '{}:{}'.format(self.key, tag)
+        self.setting_tags.append(tag)
+        self.settings.add_on_change(tag, callback)
+
+    def close(self):
+        for tag in self.setting_tags:
+            self.settings.clear_on_change(tag)
+        self.setting_tags = []
+        self.discard_standby()
 
     def update_sc_path(self):
-        path = self.settings.get('sc_path')[sublime.platform()]
+        path = self.setting('sc_path')
+        if isinstance(path, dict):
+            path = path[sublime.platform()]
         self.sc_dir = os.path.dirname(path)
         self.sc_exe = os.path.basename(path)
+        self.sclang_args = self.setting('sclang_args', [])
 
     def update_post_view_max_lines(self):
-        self.post_view_max_lines = self.settings.get('max_post_view_lines')
+        self.post_view_max_lines = self.setting('max_post_view_lines')
+
+    def update_post_backlog(self):
+        self.post_backlog_max_lines = self.setting(
+            'max_post_backlog_lines', -1)
+        self.post_backlog_overflow = self.setting(
+            'post_backlog_overflow', 'drop_oldest')
+
+        if self.sclang_queue is not None:
+            self.sclang_queue.configure(self.post_backlog_max_lines,
+                                        self.post_backlog_overflow)
+
+    def update_post_coalescing(self):
+        self.collapse_repeated_post_lines = self.setting(
+            'collapse_repeated_post_lines', True)
+        self.post_rate_limit = self.setting(
+            'post_rate_limit_per_pattern', 0)
+
+        if self.sclang_coalescer is not None:
+            self.sclang_coalescer.configure(self.collapse_repeated_post_lines,
+                                            self.post_rate_limit)
 
     def update_stdout_flag(self):
-        self.stdout_flag = self.settings.get('stdout_flag')
+        self.stdout_flag = self.setting('stdout_flag')
+
+    def update_warm_standby(self):
+        self.warm_standby = self.setting('warm_standby', False)
+        if not self.warm_standby:
+            self.discard_standby()
+        elif self.is_alive() and self.ready_requested is None:
+            self.spawn_standby()
+
+    def update_supervision(self):
+        self.heartbeat_ms = self.setting('sclang_heartbeat_ms', 2000)
+        self.hang_timeout_ms = self.setting('sclang_hang_timeout_ms', 10000)
+        self.auto_restart = self.setting('auto_restart_sclang', 'crashed')
+
+    def update_show_pipeline_metrics(self):
+        self.show_pipeline_metrics = self.setting(
+            'show_pipeline_metrics', False)
+        if self.show_pipeline_metrics:
+            self.update_metrics_status()
 
     def update_open_post_view_in(self):
-        self.open_post_view_in = self.settings.get('open_post_view_in')
+        self.open_post_view_in = self.setting('open_post_view_in')
+
+    def update_osc_control_port(self):
+        self.osc_control_port = self.setting('osc_control_port', -1)
+
+    def update_osc_trace(self):
+        self.osc_trace_to_post_view = self.setting('osc_trace_to_post_view',
+                                                   False)
+        self.osc_trace.configure(
+            self.setting('osc_trace_buffer', 10000),
+            self.setting('osc_trace_include', []),
+            self.setting('osc_trace_exclude', []),
+            self.setting('osc_trace_sample', {}),
+            self.setting('osc_trace_rate_limit', 0))
+
+    def update_server_status(self):
+        self.server_cpu_warning = self.setting('server_cpu_warning', 80)
+        monitor = self.server_monitor
+        polled = (monitor.host, monitor.port, monitor.interval_ms)
+        monitor.configure(
+            self.setting('server_address', '127.0.0.1'),
+            self.setting('server_port', 57110),
+            self.setting('server_status_poll_ms', 1000))
+
+        # settings callbacks run on any change, polling is only restarted
+        # when it has to
+        if (monitor.is_running() and
+                polled != (monitor.host, monitor.port, monitor.interval_ms)):
+            monitor.stop()
+            monitor.start()
+
+    def update_session_log(self):
+        self.session_log.configure(
+            self.setting('session_log', True),
+            int(self.setting('session_log_max_mb', 8) * 1048576),
+            self.setting('session_log_max_files', 10))
+
+    def update_synthdef_cache(self):
+        self.cache_synthdefs = self.setting('synthdef_cache', False)
+
+    def update_benchmark(self):
+        self.benchmark_runs = max(1, self.setting('benchmark_runs', 20))
+        self.benchmark_warmup = max(0, self.setting('benchmark_warmup', 3))
+        self.benchmark_timeout_ms = self.setting('benchmark_timeout_ms',
+                                                 60000)
+        self.benchmark_history = self.setting('benchmark_history', 20)
+        self.benchmark_regression = self.setting('benchmark_regression', 0.1)
 
     def update_highlight_post_view(self):
-        self.highlight_post = self.settings.get('highlight_post_view') == 'True'
+        self.highlight_post = self.setting('highlight_post_view') == 'True'
 
         if self.has_post_view():
             self.set_post_view_syntax(self.highlight_post)
@@ -115,131 +711,669 @@ class SuperColliderProcess():
     def is_alive(self):
         if (self.sclang_process is None or
                 self.sclang_thread is None or not
-                self.sclang_thread.isAlive()):
+                self.sclang_thread.is_alive()):
             return False
 
         self.sclang_process.poll()
 
         return self.sclang_process.returncode is None
 
+    def is_running(self):
+        """Cheap check for the UI, from the state kept by the supervisor"""
+        return self.state != 'dead'
+
+    def describe(self):
+        """One line summary of the process and its resource use"""
+        if not self.is_alive():
+            return 'not running'
+
+        parts = [self.state, 'pid {}'.format(self.sclang_process.pid)]
+        rss = process_rss(self.sclang_process.pid)
+        if rss is not None:
+            parts.append('{:.0f} MB'.format(rss / 1048576))
+        elif sublime.platform() == 'windows':
+            parts.append('memory use not shown on Windows')
+        else:
+            parts.append('memory use unknown')
+        parts.append('up {:.0f}s'.format(time.time() - self.metrics.started))
+        parts.append('{} lines read'.format(
+            self.metrics.counter('read_lines')))
+        parts.append('{} waiting'.format(len(self.sclang_queue)))
+        parts.append('{} requests pending'.format(len(self.requests)))
+        if self.last_ready_ms is not None:
+            parts.append('ready in {:.0f} ms'.format(self.last_ready_ms))
+        if self.standby is not None:
+            parts.append('standby {}'.format(self.standby.state))
+        if self.last_recovery_ms is not None:
+            parts.append('recovered in {:.0f} ms'.format(
+                self.last_recovery_ms))
+        return ', '.join(parts)
+
+    def sclang_command(self):
+        """Popen arguments starting sclang, (args, cwd, close_fds, shell)"""
+        if os.name == 'posix':
+            path = os.path.join(self.sc_dir, self.sc_exe)
+            return ([path, '-i', 'sublime'] + list(self.sclang_args), None,
+                    True, False)
+        return ([self.sc_exe, '-i', 'sublime'] + list(self.sclang_args),
+                self.sc_dir, False, True)
+
     def start(self):
         if self.is_alive():
             sublime.status_message('sclang already running!')
             return
 
-        # create subprocess
-        if os.name is 'posix':
-            path = os.path.join(self.sc_dir, self.sc_exe)
-            cwd = None
-            close_fds = True
-            shell = False
+        # create subprocess, or take over the standby if it is ready
+        command = self.sclang_command()
+        self.ready_requested = time.perf_counter()
+        self.recompiling = False
+        standby = self.take_standby(command)
+        if standby is not None:
+            self.sclang_process = standby.process
+            initial_output = bytes(standby.output)
         else:
-            path = self.sc_exe
-            cwd = self.sc_dir
-            close_fds = False
-            shell = True
-
-        try:
-            self.sclang_process = subprocess.Popen(
-                args=[path, '-i', 'sublime'],
-                cwd=cwd,
-                bufsize=0,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                close_fds=close_fds,
-                shell=shell
-            )
-        except OSError:
-            msg = """Could not start sclang
+            try:
+                self.sclang_process = spawn_sclang(*command)
+            except OSError:
+                msg = """Could not start sclang
 Please check the *sc_path* setting in your SuperCollider package settings"""
-            sublime.error_message(msg)
+                sublime.error_message(msg)
+                self.ready_requested = None
+                return
+            initial_output = b''
 
         # create post window update queue and thread
         # this function is the thread target, it reads input until the process
         # is terminated, after which it closes the input and deactivates post
-        def enqueue_output(input, queue):
-            for line in iter(input.readline, b''):
-                decoded = line.decode('utf-8')
-                if self.stdout_flag in decoded:
-                    self.handle_flagged_output(decoded)
-                else:
-                    queue.append(decoded)
+        # stdout is unbuffered (bufsize=0), so each read returns whatever is
+        # available up to READ_CHUNK_SIZE rather than waiting for a full chunk
+        # output of a process that has been replaced by restart is dropped
+        def enqueue_output(process, queue, coalescer, initial_output,
+                           supervisor):
+            input = process.stdout
+            splitter = SclangOutputSplitter()
+            classifier = OutputClassifier(self.output_record_serials)
+            chunks = iter(lambda: input.read(READ_CHUNK_SIZE), b'')
+            if initial_output:
+                chunks = itertools.chain([initial_output], chunks)
+            for data in chunks:
+                if self.sclang_process is not process:
+                    continue
+                lines, flagged = splitter.feed(data, self.stdout_flag)
+                self.metrics.count('read_chunks')
+                self.metrics.count('read_bytes', len(data))
+                self.metrics.count('read_lines', len(lines))
+                self.session_log.write(lines)
+                self.output_records.extend(classifier.feed(lines))
+                self.server_late_lines = classifier.late_lines
+                with coalescer.lock:
+                    lines = coalescer.feed(lines)
+                    # only block when a post view is there to drain it
+                    queue.extend(lines, self.has_post_view)
+                    pending = coalescer.has_pending()
+                self.metrics.count('post_lines', len(lines))
+                self.metrics.gauge('backlog_lines', len(queue))
+                if len(lines) > 0:
+                    self.schedule_post_view_update()
+                if pending:
+                    self.schedule_coalescer_flush()
+                for line in flagged:
+                    self.handle_flagged_output(line)
+                if self.ready_requested is not None:
+                    self.check_ready(lines)
+
+            supervisor.on_eof()
+            if self.sclang_process is not process:
+                input.close()
+                return
+
+            lines, flagged = splitter.feed(b'', self.stdout_flag, final=True)
+            self.session_log.write(lines)
+            self.output_records.extend(classifier.feed(lines))
+            with coalescer.lock:
+                queue.extend(coalescer.feed(lines) + coalescer.flush())
+            for line in flagged:
+                self.handle_flagged_output(line)
             input.close()
-            if self.has_post_view():
-                self.deactivate_post_view(TERMINATE_MSG)
+            self.stop_server_monitor()
+            self.session_log.close()
+            self.sclang_writer.close()
+            self.fail_requests('sclang terminated')
+            # deactivate on the main thread, after any pending flush
+            sublime.set_timeout(
+                lambda: self.deactivate_post_view(TERMINATE_MSG, True), 0)
+
+        self.session_log.open()
+        self.metrics.reset()
+        if standby is not None:
+            self.metrics.count('standby_promotions')
+        self.metrics_status_last = None
+        self.output_records.clear()
+        self.output_record_visited = 0
+        self.server_late_lines = 0
+        self.server_late_shown = 0
 
         # queue and thread for getting sclang output
-        self.sclang_queue = deque()
+        self.sclang_queue = PostBacklog(self.post_backlog_max_lines,
+                                        self.post_backlog_overflow)
+        self.sclang_coalescer = PostCoalescer(
+            self.collapse_repeated_post_lines, self.post_rate_limit)
+        # writes to sclang go through their own thread
+        self.sclang_writer = SclangWriter(self.sclang_process.stdin,
+                                          metrics=self.metrics)
+        self.state = 'starting'
+        self.supervisor = SclangSupervisor(self, self.sclang_process,
+                                           self.sclang_queue,
+                                           self.sclang_writer)
+
         self.sclang_thread = threading.Thread(
             target=enqueue_output,
             args=(
-                self.sclang_process.stdout,
-                self.sclang_queue
+                self.sclang_process,
+                self.sclang_queue,
+                self.sclang_coalescer,
+                initial_output,
+                self.supervisor
             )
         )
 
         self.sclang_thread.daemon = True  # dies with the program
         self.sclang_thread.start()
-        sublime.status_message('Starting SuperCollider')
+        if standby is not None:
+            sublime.status_message('Starting SuperCollider from standby')
+        else:
+            sublime.status_message('Starting SuperCollider')
+        if self.show_pipeline_metrics:
+            self.update_metrics_status()
+
+        self.start_control_channel()
+        self.update_class_index()
+        self.server_monitor.start()
 
     def terminate(self):
-        try:
-            self.sclang_process.terminate()
-        except Exception:
-            pass
+        if self.supervisor is not None:
+            self.supervisor.shutdown(terminate=True)
+        self.close_control_channel()
+        self.stop_server_monitor()
 
     def stop(self):
+        """Ask sclang to exit, the supervisor terminates or kills it if not"""
         if self.is_alive():
-            self.execute('0.exit;')
-            sublime.set_timeout(self.terminate, 1000)
+            self.supervisor.shutdown()
         else:
             sublime.status_message('stop: sclang not running')
 
-    def write_out(self, cmd, token):
+    def restart(self):
+        """Replace sclang with a new one, the standby if it is ready
+
+        The post view stays, the old sclang is shut down by its supervisor.
+        """
         if self.is_alive():
-            self.sclang_process.stdin.write(bytes(cmd + token, 'utf-8'))
-            self.sclang_process.stdin.flush()
+            self.supervisor.shutdown()
+            # from here on the old reader drops whatever it reads
+            self.sclang_process = None
+            self.close_control_channel()
+            self.server_monitor.stop()
+            self.fail_requests('sclang restarted')
+        self.start()
+        self.resume_osc_trace()
+
+    def recompile(self):
+        """Recompile the class library, by restarting from a fresh standby
+
+        The standby is only used if no class file known to the class index,
+        nor their directories, changed after it was started.
+        """
+        if (self.standby is not None and self.standby.is_ready() and
+                not self.standby.is_stale(self.class_index.mtimes)):
+            self.restart()
+            return
+
+        self.discard_standby()
+        # the new class library has lost the control channel's OSCdef and
+        # the OSC trace's recv func, both are set up again once ready and
+        # control commands go to stdin until then
+        self.close_control_channel()
+        self.recompiling = True
+        self.ready_requested = time.perf_counter()
+        self.execute('\x18')
+        self.update_class_index()
+
+    # Status bar
+    # --------------------------------------------------------------------------
+    # Statuses are kept here and set on the active view of each of the
+    # instance's windows, and on any view of them once it gets activated, so
+    # they follow tab switches and instances don't overwrite each other's.
+    def show_status(self, kind, text):
+        """Show text as the status of kind, None to clear it"""
+        if self.statuses.get(kind) == text:
+            return
+        self.statuses[kind] = text
+        for window in self.windows():
+            self.apply_statuses(window.active_view(), [kind])
+
+    def apply_statuses(self, view, kinds=None):
+        if view is None:
+            return
+        for kind in kinds or list(self.statuses):
+            key = 'supercollider-{}-{}'.format(kind, self.key)
+            text = self.statuses.get(kind)
+            if text is None:
+                view.erase_status(key)
+            else:
+                view.set_status(key, text)
+
+    def windows(self):
+        # the windows routed to this instance
+        if instances is None:
+            return sublime.windows()
+        return [window for window in sublime.windows()
+                if instances.key_for(window)[0] == self.key]
+
+    # Supervision
+    # --------------------------------------------------------------------------
+    def on_state(self, supervisor, state):
+        # called on the main thread when the state of a process changes
+        if supervisor is not self.supervisor:
+            return
+
+        self.show_status('state', None if state == 'dead'
+                         else 'sclang: {}'.format(state))
+
+        if state == 'hung':
+            self.outage = (supervisor.hung_since, time.perf_counter())
+            if self.auto_restart == 'hung':
+                self.schedule_auto_restart('not responding')
+            else:
+                sublime.status_message(
+                    'sclang is not responding, restart it to recover')
+        elif state == 'dead':
+            self.close_control_channel()
+            if self.tracing_osc:
+                self.tracing_osc = False
+                self.osc_trace.close()
+            if supervisor.exit_requested is not None:
+                return
+            if supervisor.process.returncode == 0:
+                # exited on its own, e.g. 0.exit or thisProcess.shutdown
+                sublime.status_message('sclang exited')
+                return
+            self.outage = (supervisor.eof_at or supervisor.exited_at,
+                           time.perf_counter())
+            if self.auto_restart in ('crashed', 'hung'):
+                self.schedule_auto_restart('exited with code {}'.format(
+                    supervisor.process.returncode))
+            else:
+                sublime.status_message('sclang exited with code {}'.format(
+                    supervisor.process.returncode))
+
+    def schedule_auto_restart(self, reason):
+        now = time.time()
+        if now - self.last_auto_restart > AUTO_RESTART_RESET_S:
+            self.auto_restarts = 0
+        delay = min(AUTO_RESTART_MAX_MS,
+                    AUTO_RESTART_MS * 2 ** self.auto_restarts)
+        self.auto_restarts += 1
+        self.last_auto_restart = now
+        sublime.status_message('sclang {}, restarting in {:.1f} s'.format(
+            reason, delay / 1000))
+        sublime.set_timeout(self.auto_restart_now, delay)
+
+    def auto_restart_now(self):
+        # unless it has been restarted or stopped in the meantime
+        if self.state == 'hung':
+            self.restart()
+        elif self.state == 'dead' and self.outage is not None:
+            self.start()
+            if not self.has_post_view():
+                self.open_post_view()
+
+    # Warm standby
+    # --------------------------------------------------------------------------
+    def check_ready(self, lines):
+        # called from the reader until sclang reports the library compiled
+        for line in lines:
+            if SCLANG_COMPILE_FAILED in line:
+                self.ready_requested = None
+                return
+            if SCLANG_READY in line:
+                ready_ms = (time.perf_counter() - self.ready_requested) * 1000
+                self.ready_requested = None
+                self.last_ready_ms = ready_ms
+                self.metrics.observe('ready_ms', ready_ms)
+                sublime.set_timeout(self.on_ready, 0)
+                return
+
+    def on_ready(self):
+        if self.outage is not None:
+            started, detected = self.outage
+            self.outage = None
+            self.last_recovery_ms = (time.perf_counter() - detected) * 1000
+            self.metrics.observe('outage_detect_ms',
+                                 (detected - started) * 1000)
+            self.metrics.observe('recovery_ms', self.last_recovery_ms)
+            sublime.status_message('sclang recovered in {:.0f} ms'.format(
+                self.last_recovery_ms))
+        else:
+            sublime.status_message('sclang ready in {:.0f} ms'.format(
+                self.last_ready_ms))
+        if self.recompiling:
+            self.recompiling = False
+            self.start_control_channel()
+            self.resume_osc_trace()
+        # the standby compiles once this one is done, not alongside it
+        if self.warm_standby:
+            self.spawn_standby()
+
+    def spawn_standby(self):
+        if self.standby is not None and self.standby.is_alive():
+            return
+
+        try:
+            self.standby = SclangStandby(self.sclang_command())
+        except OSError:
+            self.standby = None
+
+    def take_standby(self, command):
+        # the standby, if it is ready and started the way sclang would be
+        standby = self.standby
+        self.standby = None
+        if standby is None:
+            return None
+        if standby.is_ready() and standby.command == command:
+            return standby
+
+        standby.kill()
+        return None
+
+    def discard_standby(self):
+        if getattr(self, 'standby', None) is not None:
+            self.standby.kill()
+            self.standby = None
+
+    def write_out(self, cmd, token, priority=False):
+        return self.write_batch([cmd + token], priority)
+
+    def write_batch(self, cmds, priority=False):
+        # queue terminated commands as a single write, never blocks, returns
+        # whether they were queued
+        if not self.is_alive():
+            return False
+
+        start = time.perf_counter()
+        data = bytes(''.join(cmds), 'utf-8')
+        queued = self.sclang_writer.write(data, priority)
+        if not queued:
+            self.metrics.count('write_refused')
+            sublime.status_message(
+                'sclang is not keeping up, input queue full, not sent')
+        self.metrics.observe('write_out_ms',
+                             (time.perf_counter() - start) * 1000)
+        self.metrics.gauge('input_queue_bytes',
+                           self.sclang_writer.pending_bytes)
+
+        if self.sclang_writer.pending_bytes > WRITE_CHUNK_SIZE:
+            self.update_input_status()
+        return queued
+
+    def update_input_status(self):
+        # shows the input queue in the status bar until it has been written
+        if self.sclang_writer is None or self.sclang_writer.pending_bytes == 0:
+            self.input_status_scheduled = False
+            self.show_status('input', None)
+            return
+
+        self.show_status('input', 'sclang input: {}'.format(
+            self.sclang_writer.describe()))
+
+        if not self.input_status_scheduled:
+            self.input_status_scheduled = True
+            sublime.set_timeout(self.refresh_input_status, INPUT_STATUS_MS)
+
+    def refresh_input_status(self):
+        self.input_status_scheduled = False
+        self.update_input_status()
+
+    def update_metrics_status(self):
+        # shows a summary of the pipeline metrics while sclang is running
+        if not self.show_pipeline_metrics or not self.is_alive():
+            self.metrics_status_scheduled = False
+            self.show_status('metrics', None)
+            return
+
+        self.show_status('metrics', self.metrics_summary())
+
+        if not self.metrics_status_scheduled:
+            self.metrics_status_scheduled = True
+            sublime.set_timeout(self.refresh_metrics_status, METRICS_STATUS_MS)
+
+    def refresh_metrics_status(self):
+        self.metrics_status_scheduled = False
+        self.update_metrics_status()
+
+    def metrics_summary(self):
+        now = time.perf_counter()
+        lines = self.metrics.counter('read_lines')
+        rate = 0
+        if self.metrics_status_last is not None:
+            last_time, last_lines = self.metrics_status_last
+            if now > last_time:
+                rate = (lines - last_lines) / (now - last_time)
+        self.metrics_status_last = (now, lines)
+
+        update_ms = self.metrics.percentile('post_view_update_ms', 95)
+        return 'sclang: {:.0f} lines/s, backlog {}, post p95 {}'.format(
+            rate,
+            len(self.sclang_queue) if self.sclang_queue is not None else 0,
+            '-' if update_ms is None else '{:.1f} ms'.format(update_ms))
 
     def execute(self, cmd):
         self.write_out(cmd, '\x0c')
 
+    def execute_batch(self, cmds):
+        """Execute several blocks of code with a single write"""
+        self.write_batch([cmd + '\x0c' for cmd in cmds])
+
     def execute_silently(self, cmd):
-        self.write_out(cmd, '\x1b')
+        return self.write_out(cmd, '\x1b')
+
+    def evaluate_batch(self, cmds):
+        """Execute code from the editor, SynthDefs going through the cache"""
+        if self.cache_synthdefs:
+            cmds, stored, loaded = self.synthdef_cache.prepare(cmds)
+            if loaded:
+                self.execute_silently(self.synthdef_cache.load_code(loaded))
+            self.metrics.count('synthdefs_stored', len(stored))
+            self.metrics.count('synthdefs_loaded', len(loaded))
+        self.execute_batch(cmds)
+
+    # Control channel
+    # --------------------------------------------------------------------------
+    # Control commands (server, volume, CmdPeriod) can be sent as OSC messages
+    # over localhost UDP, so they don't queue behind evaluations in stdin.
+    # sclang still only handles them when the interpreter is free.
+    def start_control_channel(self):
+        self.close_control_channel()
+        if self.osc_control_port is None or self.osc_control_port < 1:
+            return
+
+        port = self.osc_control_port
+        token = codecs.encode(os.urandom(16), 'hex').decode('ascii')
+
+        def on_done(result):
+            self.control_socket = socket.socket(socket.AF_INET,
+                                                socket.SOCK_DGRAM)
+            self.control_port = port
+            self.control_token = token
+
+        self.request(CONTROL_TEMPLATE.format(port=port, token=token),
+                     on_done,
+                     lambda error: sublime.status_message(
+                         'sclang: no control channel, {}'.format(error)),
+                     CONTROL_TIMEOUT_MS)
+
+    def close_control_channel(self):
+        if self.control_socket is not None:
+            self.control_socket.close()
+        self.control_socket = None
+        self.control_token = None
+
+    def has_control_channel(self):
+        return self.control_socket is not None
+
+    def execute_control(self, cmd, silently=False, urgent=False):
+        """Execute cmd over the control channel if there is one
+
+        Otherwise it is written to stdin, ahead of queued evaluations if
+        urgent (stop, kill all servers, mute). It still waits for the whole
+        evaluation being written when it is sent, which for megabytes of
+        code and a busy sclang can take seconds; the control channel doesn't.
+        """
+        if self.has_control_channel() and self.is_alive():
+            msg = osc_message('/sublime/eval', self.control_token, cmd)
+            if len(msg) <= CONTROL_MAX_BYTES:
+                try:
+                    self.control_socket.sendto(
+                        msg, ('127.0.0.1', self.control_port))
+                    self.metrics.count('control_messages')
+                    return
+                except OSError:
+                    pass
+
+        self.write_out(cmd, '\x1b' if silently else '\x0c', urgent)
+
+    # Requests
+    # --------------------------------------------------------------------------
+    def request(self, code, on_done=None, on_error=None,
+                timeout=REQUEST_TIMEOUT_MS):
+        """Evaluate code in sclang and get its result back as a string
+
+        The result is not printed in the post view. on_done(result) or
+        on_error(message) are called on the main thread, on_error defaults to
+        showing the message in the status bar. The returned SclangRequest can
+        also be waited on from a background thread.
+        """
+        if on_error is None:
+            on_error = self.show_request_error
+
+        request = SclangRequest(next(self.request_ids), on_done, on_error)
+
+        if not self.is_alive():
+            request.resolve(None, 'sclang not running')
+            return request
+
+        with self.requests_lock:
+            self.requests[request.id] = request
+        self.metrics.count('requests')
+
+        if not self.execute_silently(REQUEST_TEMPLATE.format(
+                code=code, flag=self.stdout_flag, id=request.id)):
+            # it would only time out, a missed heartbeat would look hung
+            self.resolve_request(request.id, None, 'input queue full')
+            return request
+
+        sublime.set_timeout(
+            lambda: self.resolve_request(request.id, None, 'timed out'),
+            timeout)
+
+        return request
+
+    def benchmark(self, code, on_done, on_error=None):
+        """Time code in sclang, on_done(times) gets the times of the runs
+
+        code is run benchmark_warmup times first, then benchmark_runs times,
+        times are in milliseconds. A block in parentheses is run without
+        them, so it can declare variables.
+        """
+        block = next(scan_blocks(code), None)
+        if (block is not None and code[block[0]] == '(' and
+                code[block[1] - 1] == ')' and
+                BLOCK_SURROUNDINGS_RE.match(code[:block[0]]) and
+                BLOCK_SURROUNDINGS_RE.match(code, block[1])):
+            # the only block, but for comments and semicolons around it
+            code = code[block[0] + 1:block[1] - 1]
+
+        def parse(result):
+            try:
+                times = [float(time) for time in result.split()]
+            except ValueError:
+                times = []
+            if len(times) != self.benchmark_runs:
+                (on_error or self.show_request_error)(
+                    'unexpected benchmark result {!r}'.format(result[:100]))
+                return
+            on_done(times)
+
+        return self.request(
+            BENCHMARK_TEMPLATE.format(code=code, runs=self.benchmark_runs,
+                                      warmup=self.benchmark_warmup),
+            parse, on_error, self.benchmark_timeout_ms)
+
+    def resolve_request(self, id, result, error):
+        with self.requests_lock:
+            request = self.requests.pop(id, None)
+
+        if request is not None:
+            if error is None:
+                self.metrics.observe(
+                    'request_ms', (time.perf_counter() - request.sent) * 1000)
+            else:
+                self.metrics.count('request_errors')
+            request.resolve(result, error)
 
-    def execute_flagged(self, flag, cmd):
-        msg = '"{}{}{}".post;({}).postln'.format(
-            self.stdout_flag, flag, self.stdout_flag, cmd)
-        self.execute_silently(msg)
+    def fail_requests(self, error):
+        with self.requests_lock:
+            requests = list(self.requests.values())
+            self.requests.clear()
+
+        for request in requests:
+            request.resolve(None, error)
+
+    def show_request_error(self, error):
+        sublime.status_message('sclang: {}'.format(error))
 
     def handle_flagged_output(self, output):
-        _, action, arg = output.split(self.stdout_flag)
-        arg = arg.rstrip()
+        parts = output.split(self.stdout_flag, 2)
+        if len(parts) != 3:
+            return  # flag used in user output, not one of our messages
+        _, action, arg = parts
+
+        if action == 'rpc':
+            header, _, result = arg.partition('\n')
+            try:
+                id, status, _ = header.split()
+                id = int(id)
+            except ValueError:
+                return
+
+            # drop the newline added by postln
+            result = result[:-1] if result.endswith('\n') else result
+
+            if status == 'ok':
+                self.resolve_request(id, result, None)
+            else:
+                self.resolve_request(id, None, result)
 
-        def open_file(file, create_if_not_found):
-            if not os.path.isfile(file):
-                if create_if_not_found:
-                    open(file, 'a').close()
-                else:
-                    return
+    def open_file(self, file, create_if_not_found=False):
+        if not os.path.isfile(file):
+            if create_if_not_found:
+                open(file, 'a').close()
+            else:
+                return
 
-            if len(sublime.windows()) == 0:
-                sublime.run_command('new_window')
+        if len(sublime.windows()) == 0:
+            sublime.run_command('new_window')
 
-            window = sublime.active_window()
-            window.open_file(file)
-
-        if action == 'open_file':
-            open_file(arg, False)
-        elif action == 'open_startup_file':
-            open_file(arg, True)
-        elif action == 'open_dir':
-            if sublime.platform() == 'osx':
-                subprocess.Popen(['open', arg])
-            elif sublime.platform() == 'linux':
-                subprocess.Popen(['xdg-open', arg])
-            elif sublime.platform() == 'windows':
-                os.startfile(arg)
+        window = sublime.active_window()
+        window.open_file(file)
+
+    def open_dir(self, path):
+        if sublime.platform() == 'osx':
+            subprocess.Popen(['open', path])
+        elif sublime.platform() == 'linux':
+            subprocess.Popen(['xdg-open', path])
+        elif sublime.platform() == 'windows':
+            os.startfile(path)
 
     # Post View
     # --------------------------------------------------------------------------
@@ -252,6 +1386,11 @@ Please check the *sc_path* setting in your SuperCollider package settings"""
         else:
             return None
 
+    def owns_view(self, view):
+        return (view.buffer_id() == self.post_view_buffer_id() or
+                view.name() in (self.post_view_name,
+                                self.inactive_post_view_name))
+
     def get_all_post_views(self):
         win_views = [window.views() for window in sublime.windows()]
         return [view for view in win_views for view in view]
@@ -260,118 +1399,3182 @@ Please check the *sc_path* setting in your SuperCollider package settings"""
         if not self.has_post_view():
             return False
 
-        ids = [view.buffer_id() for view in self.get_all_post_views()]
-        return self.post_view_buffer_id() in ids
+        ids = [view.buffer_id() for view in self.get_all_post_views()]
+        return self.post_view_buffer_id() in ids
+
+    def set_post_view(self, view):
+        self.post_view = view
+
+    def create_post_view(self, window):
+        self.post_view = window.new_file()
+        self.post_view.set_name(self.post_view_name)
+        # move post view to new pane if set
+        if self.open_post_view_in == 'group':
+            if window.num_groups() == 1:
+                window.run_command('new_pane')
+            else:
+                window.set_view_index(self.post_view, 1, 0)
+
+        # set post view attributes
+        self.set_post_view_syntax(self.highlight_post)
+        self.post_view.set_name(self.post_view_name)
+        self.post_view.set_scratch(True)
+        self.post_view.settings().set('rulers', 0)
+        self.post_view.settings().set('line_numbers', False)
+
+    def remove_post_view(self):
+        self.post_view = None
+
+    def open_post_view(self):
+        # create a new window if necessary
+        if len(sublime.windows()) == 0:
+            sublime.run_command('new_window')
+
+        # remember the original view
+        focus_window = sublime.active_window()
+        prev_view = focus_window.active_view()
+
+        if self.open_post_view_in == 'panel':
+            if not self.panel_open:
+                focus_window.run_command('show_panel', {
+                    'panel': 'output.{}'.format(self.post_view_name)
+                })
+                self.post_view = focus_window.get_output_panel(
+                    self.post_view_name)
+                self.panel_open = True
+        else:
+            self.deactivate_post_view('New post view created')
+            # create a new window if post window should open in it
+            if self.open_post_view_in == 'window':
+                sublime.run_command('new_window')
+
+            # create new post view in the active window
+            window = sublime.active_window()
+            self.create_post_view(window)
+
+        # update the view with previous view content if possible
+        marks = []
+        if self.post_view_restore_from_log:
+            # the log has everything, including output waiting in the backlog
+            # and the lines behind the coalescer's pending counts
+            if self.sclang_queue is not None:
+                with self.sclang_coalescer.lock:
+                    self.sclang_queue.drain()
+                    self.sclang_coalescer.flush()
+            max_lines = self.post_view_max_lines
+            if max_lines < 1:
+                max_lines = SESSION_LOG_RESTORE_LINES
+            self.post_view_cache, marks = self.restore_post_content(
+                self.session_log.tail(max_lines))
+            self.post_view_restore_from_log = False
+
+        if self.post_view_cache is not None:
+            self.post_view.run_command('super_collider_update_post_view', {
+                'content': self.post_view_cache,
+                'max_lines': self.post_view_max_lines,
+                'force_scroll': True,
+                'marks': marks
+            })
+            self.post_view_cache = None
+
+        # focus on original view
+        focus_window.focus_view(prev_view)
+
+        # start updating post view
+        self.schedule_post_view_update()
+
+    def schedule_post_view_update(self, delay=0):
+        # called from the reader thread whenever output arrives, so the post
+        # view is only updated when there is something to show
+        with self.post_view_update_lock:
+            if self.post_view_update_scheduled:
+                return
+            self.post_view_update_scheduled = True
+            self.post_view_update_requested = time.perf_counter()
+
+        sublime.set_timeout(self.update_post_view, delay)
+
+    def schedule_coalescer_flush(self):
+        # posts the repeats and suppressed lines counted so far, regularly
+        # while a run of repeated lines goes on
+        with self.post_view_update_lock:
+            if self.coalescer_flush_scheduled:
+                return
+            self.coalescer_flush_scheduled = True
+
+        sublime.set_timeout(self.flush_coalescer, POST_COALESCE_FLUSH_MS)
+
+    def flush_coalescer(self):
+        with self.post_view_update_lock:
+            self.coalescer_flush_scheduled = False
+
+        coalescer = self.sclang_coalescer
+        if coalescer is None:
+            return
+
+        # the reader holds the lock while it waits for backlog space, which
+        # the main thread frees, so never wait for it here
+        if not coalescer.lock.acquire(False):
+            self.schedule_coalescer_flush()
+            return
+        try:
+            lines = coalescer.flush()
+            self.sclang_queue.extend(lines)
+        finally:
+            coalescer.lock.release()
+
+        if len(lines) > 0:
+            self.schedule_post_view_update()
+
+    def take_post_content(self, max_bytes=None):
+        """Drain the backlog, returns (content, marks)
+
+        marks locate the error and warning records in content, as
+        [offset, length, kind, serial] lists.
+        """
+        lines, dropped = self.sclang_queue.drain(max_bytes)
+
+        content = ''.join(lines)
+        offset = 0
+        if dropped > 0:
+            self.metrics.count('dropped_lines', dropped)
+            msg = DROPPED_MSG.format(dropped)
+            content = msg + content
+            offset = len(msg)
+
+        return content, output_marks(lines, offset)
+
+    def restore_post_content(self, text):
+        """Post lines restored from the session log, returns (content, marks)
+
+        The lines are classified and folded like live output, without the
+        rate limit. Their records are matched up with the live ones, so
+        they can be navigated to, a record that isn't (or no longer) among
+        the live ones is marked but can't be.
+        """
+        lines = text.splitlines(True)
+        records = OutputClassifier(itertools.count(1)).feed(lines)
+        live = list(self.output_records)
+        for record in reversed(records):
+            record.serial = None
+            if (len(live) > 0 and live[-1].kind == record.kind and
+                    live[-1].message == record.message):
+                record.serial = live.pop().serial
+
+        # unmatched records repeat the serial before them, which keeps the
+        # serials sorted and only the first of equal ones is ever found
+        serial = 0
+        for record in records:
+            if record.serial is None:
+                record.serial = serial
+            serial = record.serial
+
+        coalescer = PostCoalescer(self.collapse_repeated_post_lines)
+        lines = coalescer.feed(lines) + coalescer.flush()
+        return ''.join(lines), output_marks(lines)
+
+    def update_post_view(self):
+        with self.post_view_update_lock:
+            self.post_view_update_scheduled = False
+            requested = self.post_view_update_requested
+
+        if (self.sclang_queue is None or not self.has_post_view() or
+                len(self.sclang_queue) == 0):
+            return
+
+        content, marks = self.take_post_content(POST_VIEW_FRAME_BYTES)
+
+        start = time.perf_counter()
+        self.post_view.run_command('super_collider_update_post_view', {
+            'content': content,
+            'max_lines': self.post_view_max_lines,
+            'marks': marks
+        })
+        end = time.perf_counter()
+        elapsed_ms = int((end - start) * 1000)
+        self.metrics.count('post_view_chars', len(content))
+        self.metrics.observe('post_view_update_ms', (end - start) * 1000)
+        if requested is not None:
+            self.metrics.observe('post_view_delay_ms',
+                                 (start - requested) * 1000)
+
+        # still behind: flush again next frame, leaving the UI at least as
+        # much time as the last insert took
+        if len(self.sclang_queue) > 0:
+            self.schedule_post_view_update(max(POST_VIEW_FRAME_MS, elapsed_ms))
+
+    def cache_post_view(self, view):
+        # the session log already has the content, no need to copy the view
+        if self.session_log.is_open():
+            self.post_view_restore_from_log = True
+        else:
+            self.post_view_cache = view.substr(sublime.Region(0, view.size()))
+
+    def deactivate_post_view(self, msg, flush_backlog=False):
+        if self.has_post_view():
+            marks = []
+            if flush_backlog and self.sclang_queue is not None:
+                content, marks = self.take_post_content()
+                msg = content + msg
+
+            self.post_view.run_command('super_collider_update_post_view', {
+                'content': msg,
+                'force_scroll': True,
+                'marks': marks
+            })
+            self.post_view.set_name(self.inactive_post_view_name)
+
+    def clear_post_view(self, edit):
+        if self.has_post_view():
+            self.post_view.erase(
+                edit, sublime.Region(0, self.post_view.size()))
+
+    def next_output_record(self, forward=True):
+        """The record after (or before) the one last visited, wrapping around"""
+        records = list(self.output_records)
+        if len(records) == 0:
+            return None
+
+        serials = [record.serial for record in records]
+        if forward:
+            i = bisect.bisect_right(serials, self.output_record_visited)
+            record = records[i % len(records)]
+        else:
+            i = bisect.bisect_left(serials, self.output_record_visited)
+            record = records[i - 1]
+
+        self.output_record_visited = record.serial
+        return record
+
+    def open_help(self, word):
+        self.execute('HelpBrowser.openHelpFor("{}");'.format(word))
+
+    # OSC trace
+    # --------------------------------------------------------------------------
+    # sclang forwards the messages it receives to a UDP socket of the plugin,
+    # where they are filtered, sampled and kept in a ring buffer
+    def start_osc_trace(self):
+        if self.tracing_osc:
+            return
+
+        self.osc_trace.reset()
+        self.osc_trace.open()
+        self.forward_osc_trace()
+        self.tracing_osc = True
+        self.open_osc_trace_view()
+
+    def forward_osc_trace(self):
+        # exact addresses are already left out by sclang, patterns here
+        exclude = ['/sublime/eval'] + [
+            pattern for pattern in self.osc_trace.exclude
+            if not any(char in pattern for char in '*?[')]
+        self.execute_silently(OSC_TRACE_START_TEMPLATE.format(
+            port=self.osc_trace.port, exclude='[{}]'.format(', '.join(
+                "'{}'".format(address.replace("'", "\\'"))
+                for address in exclude))))
+
+    def resume_osc_trace(self):
+        # after a restart or recompile, which removed sclang's side of it
+        if not self.tracing_osc:
+            return
+        if self.osc_trace_to_post_view:
+            self.execute_silently('OSCFunc.trace(true, false);')
+        else:
+            self.forward_osc_trace()
+
+    def stop_osc_trace(self):
+        if not self.tracing_osc:
+            return
+
+        self.execute_silently(OSC_TRACE_STOP_CODE)
+        self.tracing_osc = False
+        self.osc_trace.close()
+        self.update_osc_trace_view()
+
+    def open_osc_trace_view(self):
+        view = self.osc_trace_view
+        if view is not None and view.window() is not None:
+            view.window().focus_view(view)
+        else:
+            window = sublime.active_window()
+            self.osc_trace_view = window.new_file()
+            self.osc_trace_view.set_name(self.osc_trace_view_name)
+            self.osc_trace_view.set_scratch(True)
+        self.update_osc_trace_view()
+
+    def update_osc_trace_view(self):
+        self.osc_trace_view_scheduled = False
+        view = self.osc_trace_view
+        if view is None or view.window() is None:
+            # closed
+            self.osc_trace_view = None
+            return
+
+        if self.tracing_osc:
+            header = 'Tracing OSC received by sclang'
+        else:
+            header = 'Stopped tracing OSC'
+        view.run_command('super_collider_replace_content', {
+            'content': self.osc_trace.render(header)
+        })
+
+        if self.tracing_osc and not self.osc_trace_view_scheduled:
+            self.osc_trace_view_scheduled = True
+            sublime.set_timeout(self.update_osc_trace_view, OSC_TRACE_VIEW_MS)
+
+    # Server status
+    # --------------------------------------------------------------------------
+    def stop_server_monitor(self):
+        self.server_monitor.stop()
+        # clears the status bar
+        sublime.set_timeout(lambda: self.show_server_status(None), 0)
+
+    def on_server_status(self, status):
+        # called from the monitor thread
+        sublime.set_timeout(lambda: self.show_server_status(status), 0)
+
+    def show_server_status(self, status):
+        if not self.server_monitor.is_running():
+            self.show_status('server', None)
+            return
+
+        late = self.server_late_lines - self.server_late_shown
+        self.server_late_shown = self.server_late_lines
+
+        if status is None:
+            text = 'scsynth: not responding'
+        else:
+            text = ('scsynth: CPU {:.1f}% (peak {:.1f}%), {} UGens, '
+                    '{} synths, {:.0f} Hz').format(
+                status['avg_cpu'], status['peak_cpu'], status['ugens'],
+                status['synths'], status['sample_rate'])
+            if late > 0:
+                text += ', {} late'.format(late)
+
+        self.show_status('server', text)
+
+        warnings = []
+        if status is not None and status['peak_cpu'] >= self.server_cpu_warning:
+            warnings.append('CPU overload, peak {:.1f}%'.format(
+                status['peak_cpu']))
+        if late > 0:
+            warnings.append('{} late messages'.format(late))
+        now = time.time()
+        if warnings and now - self.server_warned >= SERVER_WARNING_INTERVAL:
+            self.server_warned = now
+            sublime.status_message('scsynth: {}'.format(', '.join(warnings)))
+
+    # Class index
+    # --------------------------------------------------------------------------
+    def update_class_index(self):
+        """Export classes that changed since the index was last updated
+
+        Runs after startup and recompiling, so allow for compile time.
+        """
+        def on_list(result):
+            listing = {}
+            for line in result.split('\n'):
+                parts = line.split('\t')
+                if len(parts) > 1:
+                    listing[parts[0]] = parts[1:]
+
+            sublime.set_timeout_async(lambda: export(listing), 0)
+
+        def export(listing):
+            stale, mtimes = self.class_index.stale_classes(listing)
+            if len(stale) == 0:
+                self.class_index.update('', listing, mtimes)
+                return
+
+            classes = '#[{}]'.format(', '.join(
+                '\\' + name for name in stale))
+            self.request(CLASS_EXPORT_TEMPLATE.format(classes=classes),
+                         lambda result: sublime.set_timeout_async(
+                             lambda: self.class_index.update(
+                                 result, listing, mtimes), 0),
+                         timeout=CONTROL_TIMEOUT_MS)
+
+        self.request(CLASS_LIST_CODE, on_list, timeout=CONTROL_TIMEOUT_MS)
+
+    def open_class(self, klass):
+        entry = self.class_index.get(klass)
+        if entry is not None and os.path.isfile(entry['file']):
+            self.open_file(entry['file'])
+            return
+
+        cmd = '''
+            if('{0}'.asClass.isNil) {{
+                Error("{0} is not a Class!").throw;
+            }};
+            '{0}'.asClass.filenameSymbol;
+        '''.format(klass)
+        self.request(cmd, self.open_file)
+
+    def show_info(self, content):
+        # shows request results that used to be printed in the post view
+        window = sublime.active_window()
+        panel = window.get_output_panel(self.info_panel_name)
+        panel.run_command('select_all')
+        panel.run_command('right_delete')
+        panel.run_command('append', {'characters': content})
+        window.run_command('show_panel', {
+            'panel': 'output.{}'.format(self.info_panel_name)
+        })
+
+
+# ==============================================================================
+# OSC
+# ==============================================================================
+def osc_string(value):
+    data = value.encode('utf-8') + b'\x00'
+    return data + b'\x00' * (-len(data) % 4)
+
+
+def osc_blob(value):
+    data = struct.pack('>i', len(value)) + value
+    return data + b'\x00' * (-len(data) % 4)
+
+
+def osc_message(address, *args):
+    """Encode an OSC message, args can be int, float, str or bytes"""
+    tags = ','
+    data = b''
+    for arg in args:
+        if isinstance(arg, bool):
+            tags += 'T' if arg else 'F'
+        elif isinstance(arg, int):
+            tags += 'i'
+            data += struct.pack('>i', arg)
+        elif isinstance(arg, float):
+            tags += 'f'
+            data += struct.pack('>f', arg)
+        elif isinstance(arg, bytes):
+            tags += 'b'
+            data += osc_blob(arg)
+        else:
+            tags += 's'
+            data += osc_string(str(arg))
+
+    return osc_string(address) + osc_string(tags) + data
+
+
+def osc_read_string(data, offset):
+    end = data.index(b'\x00', offset)
+    return data[offset:end].decode('utf-8', 'replace'), (end + 4) & ~3
+
+
+def osc_decode(data):
+    """Decode an OSC packet into a list of (address, args)
+
+    Bundles are flattened, their time tags ignored. Raises ValueError for
+    malformed packets.
+    """
+    try:
+        if data.startswith(b'#bundle\x00'):
+            messages = []
+            offset = 16  # '#bundle' and the time tag
+            while offset < len(data):
+                size = struct.unpack_from('>i', data, offset)[0]
+                offset += 4
+                messages.extend(osc_decode(data[offset:offset + size]))
+                offset += size
+            return messages
+
+        address, offset = osc_read_string(data, 0)
+        if offset >= len(data):
+            return [(address, [])]  # no type tags
+        tags, offset = osc_read_string(data, offset)
+
+        args = []
+        for tag in tags[1:]:
+            if tag in 'if':
+                args.append(struct.unpack_from('>' + tag, data, offset)[0])
+                offset += 4
+            elif tag in 'hdt':
+                args.append(struct.unpack_from(
+                    '>q' if tag != 'd' else '>d', data, offset)[0])
+                offset += 8
+            elif tag in 'sS':
+                value, offset = osc_read_string(data, offset)
+                args.append(value)
+            elif tag == 'b':
+                size = struct.unpack_from('>i', data, offset)[0]
+                args.append(data[offset + 4:offset + 4 + size])
+                offset += (4 + size + 3) & ~3
+            elif tag in 'TFNI':
+                args.append({'T': True, 'F': False,
+                             'I': float('inf')}.get(tag))
+            else:
+                raise ValueError('unsupported OSC type tag {}'.format(tag))
+    except (struct.error, IndexError) as error:
+        raise ValueError('malformed OSC packet: {}'.format(error))
+
+    return [(address, args)]
+
+
+# ==============================================================================
+# Class index
+# ==============================================================================
+def file_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class ClassIndex():
+    """Class library metadata exported from sclang, cached on disk
+
+    Each class remembers the files defining it and its methods, extensions
+    included, along with their modification times, so after a recompile only
+    classes with changed files have to be exported again.
+    Methods map to a list of [argument, default] pairs, without 'this'.
+    """
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.classes = {}
+        self.mtimes = {}
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.classes)
+
+    def get(self, name):
+        return self.classes.get(name)
+
+    def add_listener(self, callback):
+        # called with the index whenever it has been loaded or updated
+        self.listeners.append(callback)
+
+    def notify(self):
+        for callback in self.listeners:
+            callback(self)
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if data.get('version') != self.version:
+            return False
+
+        self.classes = data['classes']
+        self.mtimes = data['mtimes']
+        self.notify()
+        return True
+
+    def save(self):
+        data = {
+            'version': self.version,
+            'classes': self.classes,
+            'mtimes': self.mtimes
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            print('SuperCollider: could not save class index: {}'.format(error))
+
+    def stale_classes(self, listing):
+        """Compare a listing of class name -> files with the index
+
+        Returns the names of classes that need exporting and the current
+        modification times of all files in the listing.
+        """
+        mtimes = {}
+        stale = []
+        for name, files in listing.items():
+            entry = self.classes.get(name)
+            fresh = entry is not None and entry['files'] == files
+            for file in files:
+                if file not in mtimes:
+                    mtimes[file] = file_mtime(file)
+                if mtimes[file] != self.mtimes.get(file):
+                    fresh = False
+
+            if not fresh:
+                stale.append(name)
+
+        return stale, mtimes
+
+    def update(self, export, listing, mtimes):
+        classes = dict((name, entry) for name, entry in self.classes.items()
+                       if name in listing)
+
+        for line in export.split('\n'):
+            parts = line.split('\t')
+            if parts[0] == 'C' and len(parts) == 4:
+                classes[parts[1]] = {
+                    'superclass': parts[2] or None,
+                    'file': parts[3],
+                    'files': listing.get(parts[1], [parts[3]]),
+                    'methods': {},
+                    'class_methods': {}
+                }
+            elif parts[0] == 'M' and len(parts) >= 4 and parts[1] in classes:
+                key = 'class_methods' if parts[2] == '1' else 'methods'
+                classes[parts[1]][key][parts[3]] = [
+                    arg.split('=', 1) for arg in parts[4:]]
+
+        self.classes = classes
+        self.mtimes = mtimes
+        self.save()
+        self.notify()
+
+    def find_method(self, name, method, class_method=False):
+        """Find the method a class responds to, returns (class, args)"""
+        key = 'class_methods' if class_method else 'methods'
+        while name is not None and name in self.classes:
+            entry = self.classes[name]
+            if method in entry[key]:
+                return name, entry[key][method]
+            name = entry['superclass']
+
+        # class methods not found in the metaclasses are inherited from Class
+        if class_method:
+            return self.find_method('Class', method)
+
+        return None
+
+    def format_args(self, args):
+        return '[ {} ]'.format(', '.join(
+            arg if default == 'nil' else '{}: {}'.format(arg, default)
+            for arg, default in args))
+
+
+# ==============================================================================
+# Completions
+# ==============================================================================
+class CompletionTrie():
+    """Prefix tree of (key, completion) entries
+
+    Nodes are [children, completions] lists. Searches walk to the node for
+    the prefix then collect completions depth first until the limit is
+    reached, so the cost depends on the prefix length and the limit rather
+    than the number of entries.
+    """
+
+    def __init__(self):
+        self.root = [{}, []]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, key, completion):
+        node = self.root
+        for char in key:
+            children = node[0]
+            if char not in children:
+                children[char] = [{}, []]
+            node = children[char]
+
+        node[1].append(completion)
+        self.size += 1
+
+    def search(self, prefix, limit=COMPLETIONS_LIMIT):
+        node = self.root
+        for char in prefix:
+            node = node[0].get(char)
+            if node is None:
+                return []
+
+        results = []
+        stack = [node]
+        while stack and len(results) < limit:
+            children, completions = stack.pop()
+            results.extend(completions)
+            stack.extend(children.values())
+
+        return results[:limit]
+
+
+def snippet_escape(text):
+    return text.replace('\\', '\\\\').replace('$', '\\$').replace('}', '\\}')
+
+
+class CompletionIndex():
+    """Class, method and argument completions built from a ClassIndex
+
+    Rebuilt off the main thread whenever the class index changes, the tries
+    are swapped in once complete so queries never see a partial build.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.classes = CompletionTrie()
+        self.methods = CompletionTrie()
+        self.class_methods = {}  # class name -> completions, filled lazily
+
+    def rebuild(self, index):
+        classes = CompletionTrie()
+        methods = CompletionTrie()
+        seen = set()
+        for name in sorted(index.classes):
+            entry = index.classes[name]
+            classes.insert(name, [
+                '{}\tclass'.format(name), name])
+
+            for method, args in sorted(entry['methods'].items()):
+                if method not in seen:
+                    seen.add(method)
+                    methods.insert(method, self.method_completion(
+                        method, args, name))
+
+        self.index = index
+        self.classes = classes
+        self.methods = methods
+        self.class_methods = {}
+
+    def method_completion(self, method, args, class_name):
+        if method.endswith('_') or not method[0].isalpha():
+            return ['{}\t{}'.format(method, class_name), method]
+
+        placeholders = []
+        for i, (arg, default) in enumerate(args):
+            text = arg if default == 'nil' else '{}: {}'.format(arg, default)
+            placeholders.append('${{{}:{}}}'.format(
+                i + 1, snippet_escape(text)))
+
+        return ['{}\t{}'.format(method, class_name),
+                '{}({})'.format(method, ', '.join(placeholders))]
+
+    def search_classes(self, prefix):
+        return self.classes.search(prefix)
+
+    def search_methods(self, prefix, class_name=None):
+        """Methods starting with prefix, class methods of class_name if given"""
+        if class_name is None or self.index is None:
+            return self.methods.search(prefix)
+
+        if class_name not in self.class_methods:
+            completions = {}
+            name = class_name
+            while name is not None and name in self.index.classes:
+                entry = self.index.classes[name]
+                for method, args in entry['class_methods'].items():
+                    if method not in completions:
+                        completions[method] = self.method_completion(
+                            method, args, name)
+                name = entry['superclass']
+            self.class_methods[class_name] = [
+                completions[method] for method in sorted(completions)]
+
+        return [completion for completion in self.class_methods[class_name]
+                if completion[1].startswith(prefix)]
+
+    def search_args(self, prefix, class_name, method):
+        if self.index is None:
+            return []
+
+        found = self.index.find_method(class_name, method, True)
+        if found is None:
+            return []
+
+        return [['{}:\t{} {}'.format(arg, found[0], method),
+                 '{}: ${{1:{}}}'.format(arg, snippet_escape(default))]
+                for arg, default in found[1] if arg.startswith(prefix)]
+
+
+# ==============================================================================
+# Code blocks
+# ==============================================================================
+# everything that can open or close a block, or hide brackets from it
+BLOCK_TOKEN_RE = re.compile(r'[()\[\]{}"\'$]|//|/\*')
+STRING_END_RE = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+SYMBOL_END_RE = re.compile(r"(?:[^'\\]|\\.)*'", re.DOTALL)
+COMMENT_RE = re.compile(r'/\*|\*/')
+# what may surround a block that is evaluated on its own
+BLOCK_SURROUNDINGS_RE = re.compile(r'(?:\s|;|//[^\n]*|/\*.*?\*/)*\Z',
+                                   re.DOTALL)
+
+
+def scan_blocks(text, pos=0):
+    """Yield (start, end) of the top level bracketed blocks in text
+
+    Scanning starts at pos, which must be outside any block, string or
+    comment. Brackets in strings, symbols, char literals and (nested)
+    comments are skipped. An unclosed block runs to the end of the text.
+    """
+    depth = 0
+    start = 0
+    search = BLOCK_TOKEN_RE.search
+    while True:
+        match = search(text, pos)
+        if match is None:
+            break
+
+        token = match.group()
+        pos = match.end()
+        if token in '([{':
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif token in ')]}':
+            if depth > 0:
+                depth -= 1
+                if depth == 0:
+                    yield start, pos
+        elif token == '"' or token == "'":
+            end_re = STRING_END_RE if token == '"' else SYMBOL_END_RE
+            end = end_re.match(text, pos)
+            pos = len(text) if end is None else end.end()
+        elif token == '$':
+            # char literal, possibly escaped: $a $( $\\ $\n
+            pos += 2 if text[pos:pos + 1] == '\\' else 1
+        elif token == '//':
+            end = text.find('\n', pos)
+            pos = len(text) if end == -1 else end
+        else:
+            nesting = 1
+            while nesting > 0:
+                end = COMMENT_RE.search(text, pos)
+                if end is None:
+                    pos = len(text)
+                    break
+                nesting += 1 if end.group() == '/*' else -1
+                pos = end.end()
+
+    if depth > 0:
+        yield start, len(text)
+
+
+def common_prefix_length(a, b):
+    # binary search on slice comparisons, which run at C speed
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def common_suffix_length(a, b, limit):
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class BlockIndex():
+    """Top level blocks of a document, updated incrementally
+
+    On update only the text from the last block ending before the change is
+    scanned again, until a block is found starting at the same place in the
+    unchanged text after the change, from where the old blocks are reused.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.starts = []
+        self.ends = []
+        self.change_count = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def update(self, text, change_count=None):
+        old = self.text
+        old_starts = self.starts
+        old_ends = self.ends
+        self.change_count = change_count
+        if text == old:
+            return
+
+        prefix = common_prefix_length(old, text)
+        suffix = common_suffix_length(old, text, min(len(old),
+                                                     len(text)) - prefix)
+        delta = len(text) - len(old)
+        changed_end = len(text) - suffix
+
+        # keep the blocks that end before the change, scanning resumes there
+        keep = bisect.bisect_right(old_ends, prefix)
+        starts = old_starts[:keep]
+        ends = old_ends[:keep]
+        pos = ends[-1] if keep > 0 else 0
+
+        for start, end in scan_blocks(text, pos):
+            if start >= changed_end:
+                i = bisect.bisect_left(old_starts, start - delta)
+                if i < len(old_starts) and old_starts[i] == start - delta:
+                    # same state and text from here, reuse the old blocks
+                    starts.extend(s + delta for s in old_starts[i:])
+                    ends.extend(e + delta for e in old_ends[i:])
+                    break
+            starts.append(start)
+            ends.append(end)
+
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+
+    def find(self, begin, end=None):
+        """The (start, end) of the block containing a point or region"""
+        end = begin if end is None else end
+        i = bisect.bisect_right(self.starts, begin) - 1
+        if i >= 0 and end <= self.ends[i]:
+            return self.starts[i], self.ends[i]
+        return None
+
+
+# block indexes of the views that have been evaluated, by buffer id, until
+# the buffer is closed. Edits only change the view's change count, the text
+# is read and rescanned when the index is next used.
+block_indexes = {}
+
+
+def get_block_index(view):
+    index = block_indexes.get(view.buffer_id())
+    if index is None:
+        index = BlockIndex()
+        block_indexes[view.buffer_id()] = index
+
+    if index.change_count != view.change_count():
+        index.update(view.substr(sublime.Region(0, view.size())),
+                     view.change_count())
+
+    return index
+
+
+# ==============================================================================
+# Project symbols
+# ==============================================================================
+# definitions like SynthDef(\\name, ... or Pdef('name', ... skipping comments
+# and strings, which are matched (and ignored) as a whole
+DEFINITION_RE = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"(?:[^"\\]|\\.)*"|'
+    r'\b(?P<kind>SynthDef|Pdef|Ndef|Tdef|Pdefn|Pbindef)(?:\.new)?\s*\(\s*'
+    r'(?:\\(?P<name>[A-Za-z_][A-Za-z0-9_]*)|\'(?P<quoted>[^\'\\\n]*)\')\s*,',
+    re.DOTALL)
+
+
+def find_definitions(text):
+    """List of [name, kind, line, column] defined in text, 1-based"""
+    definitions = []
+    line = 1
+    line_start = 0
+    last = 0
+    for match in DEFINITION_RE.finditer(text):
+        kind = match.group('kind')
+        if kind is None:
+            continue
+
+        start = match.start()
+        newlines = text.count('\n', last, start)
+        if newlines > 0:
+            line += newlines
+            line_start = text.rfind('\n', 0, start) + 1
+        last = start
+
+        name = match.group('name') or match.group('quoted')
+        definitions.append([name, kind, line, start - line_start + 1])
+
+    return definitions
+
+
+class ProjectSymbolIndex():
+    """SynthDef, Pdef, Ndef and Tdef definitions in project folders
+
+    Files are scanned on a pool of worker threads. Each file is cached with
+    its modification time, size and content hash: unchanged stats skip the
+    file entirely, and changed stats with the same content only re-hash it.
+    Definitions are also kept by name, so finding one doesn't go through the
+    whole index.
+    """
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}  # path -> {mtime, size, hash, definitions}
+        self.names = {}  # name -> {path -> definitions of name in path}
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.dirty = False  # changed since last saved
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == self.version:
+                with self.lock:
+                    self.files = data['files']
+                    self.names = {}
+                    for path, entry in self.files.items():
+                        self.update_names(path, None, entry)
+        except (OSError, ValueError):
+            pass
+        self.loaded = True
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': self.version, 'files': self.files}, file)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as error:
+            print('SuperCollider: could not save symbol index: {}'.format(
+                error))
+
+    def load_and_refresh_windows(self):
+        if not self.loaded:
+            self.load()
+        folders = []
+        for window in sublime.windows():
+            folders.extend(window.folders())
+        self.refresh(folders)
+
+    def source_files(self, folders):
+        for folder in folders:
+            for root, dirs, files in os.walk(folder):
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                for name in files:
+                    if name.endswith(SOURCE_EXTENSIONS):
+                        yield os.path.join(root, name)
+
+    def refresh(self, folders):
+        """Index all source files in folders, returns the number re-parsed"""
+        paths = list(self.source_files(folders))
+        with concurrent.futures.ThreadPoolExecutor(
+                SYMBOL_INDEX_WORKERS) as executor:
+            parsed = sum(executor.map(self.index_file, paths))
+
+        # forget files that were deleted from the folders
+        folders = [os.path.join(folder, '') for folder in folders]
+        seen = set(paths)
+        with self.lock:
+            for path in list(self.files):
+                if path not in seen and path.startswith(tuple(folders)):
+                    self.update_names(path, self.files.pop(path), None)
+                    self.dirty = True
+
+        if self.dirty:
+            self.save()
+        return parsed
+
+    def index_file(self, path):
+        """Index one file if it changed, returns 1 if it was parsed"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self.lock:
+                entry = self.files.pop(path, None)
+                if entry is not None:
+                    self.update_names(path, entry, None)
+                    self.dirty = True
+            return 0
+
+        entry = self.files.get(path)
+        if (entry is not None and entry['mtime'] == stat.st_mtime and
+                entry['size'] == stat.st_size):
+            return 0
+
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return 0
+
+        digest = hashlib.sha1(data).hexdigest()
+        if entry is not None and entry['hash'] == digest:
+            definitions = entry['definitions']
+            parsed = 0
+        else:
+            definitions = find_definitions(data.decode('utf-8', 'replace'))
+            parsed = 1
+
+        with self.lock:
+            new_entry = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'hash': digest,
+                'definitions': definitions
+            }
+            self.update_names(path, self.files.get(path), new_entry)
+            self.files[path] = new_entry
+            self.dirty = True
+
+        return parsed
+
+    def update_names(self, path, old_entry, new_entry):
+        # the definitions of path by name, from old_entry to new_entry, with
+        # the lock held
+        if old_entry is not None:
+            for definition in old_entry['definitions']:
+                paths = self.names.get(definition[0])
+                if paths is not None:
+                    paths.pop(path, None)
+                    if len(paths) == 0:
+                        del self.names[definition[0]]
+        if new_entry is not None:
+            for definition in new_entry['definitions']:
+                self.names.setdefault(definition[0], {}).setdefault(
+                    path, []).append(definition)
+
+    def all_definitions(self):
+        """List of (name, kind, path, line, column) sorted by name"""
+        with self.lock:
+            files = list(self.files.items())
+
+        return sorted((name, kind, path, line, column)
+                      for path, entry in files
+                      for name, kind, line, column in entry['definitions'])
+
+    def find(self, name):
+        """List of (name, kind, path, line, column) of name, sorted"""
+        with self.lock:
+            paths = list(self.names.get(name, {}).items())
+
+        return sorted((name, kind, path, line, column)
+                      for path, definitions in paths
+                      for _, kind, line, column in definitions)
+
+
+# ==============================================================================
+# SynthDef cache
+# ==============================================================================
+# what may follow SynthDef(...) for the block to be cached, '.add' alone
+SYNTHDEF_ADD_RE = re.compile(r'\s*\.add(?![\w(])')
+SYNTHDEF_NAME_RE = re.compile(r'^[\w.-]+$')
+
+
+def sc_string(value):
+    """value as a sclang string literal"""
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+class SynthDefCache():
+    """Compiled SynthDefs on disk, by the hash of their source
+
+    SynthDef(...).add blocks in evaluated code are hashed. A block whose
+    hash is the one stored next to its .scsyndef in the cache directory is
+    not built again: it is replaced by the SynthDef of its SynthDesc, read
+    from the file, and the defs go to the server with one /d_loadDir. Others are built and
+    stored to the cache directory by sclang, which then writes their hash.
+    Names are hashed with the source: a def renamed is a new one.
+    """
+    version = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.confirmed = {}  # name -> hash known to be on disk
+
+    def find_blocks(self, text):
+        """List of (start, end, name) of the SynthDef(...).add in text"""
+        blocks = []
+        for match in DEFINITION_RE.finditer(text):
+            if match.group('kind') != 'SynthDef':
+                continue
+            name = match.group('name') or match.group('quoted')
+            if not SYNTHDEF_NAME_RE.match(name):
+                continue
+
+            paren = text.index('(', match.start())
+            block = next(scan_blocks(text, paren), None)
+            if block is None or block[0] != paren:
+                continue
+            add = SYNTHDEF_ADD_RE.match(text, block[1])
+            if add is not None:
+                blocks.append((match.start(), add.end(), name))
+
+        return blocks
+
+    def digest(self, source):
+        return hashlib.sha1('{}\n{}'.format(
+            self.version, source).encode('utf-8')).hexdigest()
+
+    def path(self, name, extension):
+        return os.path.join(self.directory, name + extension)
+
+    def is_cached(self, name, digest):
+        if self.confirmed.get(name) == digest:
+            return True
+        try:
+            with open(self.path(name, '.sha1'), encoding='ascii') as file:
+                cached = file.read().strip()
+        except (OSError, ValueError):
+            return False
+        if cached != digest or not os.path.exists(self.path(name,
+                                                            '.scsyndef')):
+            return False
+        self.confirmed[name] = digest
+        return True
+
+    def prepare(self, cmds):
+        """(cmds, stored, loaded): cmds rewritten to use the cache, names"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as error:
+            print('SuperCollider: could not create SynthDef cache: {}'.format(
+                error))
+            return cmds, [], []
+
+        directory = sc_string(os.path.join(self.directory, ''))
+        stored = []
+        loaded = []
+        rewritten = []
+        for cmd in cmds:
+            parts = []
+            last = 0
+            for start, end, name in self.find_blocks(cmd):
+                source = cmd[start:end]
+                digest = self.digest(source)
+                parts.append(cmd[last:start])
+                if self.is_cached(name, digest):
+                    loaded.append(name)
+                    # keep the line numbers of the code that follows
+                    # the SynthDef, like SynthDef(...).add evaluates to
+                    parts.append("SynthDescLib.global.at('{}').def".format(
+                        name) + '\n' * source.count('\n'))
+                else:
+                    stored.append(name)
+                    self.confirmed.pop(name, None)
+                    add = SYNTHDEF_ADD_RE.search(source).start()
+                    parts.append(SYNTHDEF_STORE_TEMPLATE.format(
+                        dir=directory, name=name, digest=digest,
+                        source=source[:add]))
+                last = end
+            parts.append(cmd[last:])
+            rewritten.append(''.join(parts))
+
+        return rewritten, stored, loaded
+
+    def load_code(self, names):
+        return SYNTHDEF_LOAD_TEMPLATE.format(
+            dir=sc_string(os.path.join(self.directory, '')),
+            names='[{}]'.format(', '.join(sc_string(name)
+                                          for name in names)))
+
+    def clear(self):
+        """Delete the cached SynthDefs, returns how many there were"""
+        self.confirmed.clear()
+        count = 0
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        for name in names:
+            if name.endswith(('.scsyndef', '.sha1')):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    count += name.endswith('.scsyndef')
+                except OSError:
+                    pass
+        return count
+
+
+# ==============================================================================
+# Benchmarks
+# ==============================================================================
+def benchmark_stats(times):
+    """min, median, p95 (nearest rank) and max of times"""
+    times = sorted(times)
+    n = len(times)
+    return {
+        'runs': n,
+        'min': times[0],
+        'median': (times[(n - 1) // 2] + times[n // 2]) / 2,
+        'p95': times[max(0, int(math.ceil(n * 0.95)) - 1)],
+        'max': times[-1]
+    }
+
+
+class BenchmarkHistory():
+    """Timing statistics of benchmarked blocks, latest first, saved to disk
+
+    Blocks are known by their file and first line, so a block keeps its
+    history while its body is edited. Each entry has a hash of the code to
+    tell apart runs of the same and of edited code.
+    """
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.blocks = {}  # key -> list of entries, latest first
+        self.loaded = False
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == self.version:
+                self.blocks = data['blocks']
+        except (OSError, ValueError):
+            pass
+        self.loaded = True
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': self.version, 'blocks': self.blocks},
+                          file)
+            os.replace(tmp_path, self.path)
+        except OSError as error:
+            print('SuperCollider: could not save benchmark history: {}'.format(
+                error))
+
+    def add(self, key, code, stats, limit):
+        """Record stats of a run of code, returns the block's history"""
+        if not self.loaded:
+            self.load()
+
+        entry = dict(stats, time=time.time(), hash=hashlib.sha1(
+            code.encode('utf-8')).hexdigest())
+        history = [entry] + self.blocks.pop(key, [])
+        self.blocks[key] = history[:max(1, limit)]
+        if len(self.blocks) > BENCHMARK_HISTORY_BLOCKS:
+            oldest = min(self.blocks,
+                         key=lambda key: self.blocks[key][0]['time'])
+            del self.blocks[oldest]
+
+        self.save()
+        return self.blocks[key]
+
+
+def benchmark_change(entry, previous):
+    # relative change of the median from the previous run
+    if previous is None or previous['median'] <= 0:
+        return None
+    return entry['median'] / previous['median'] - 1
+
+
+def render_benchmark(label, history, warmup, regression):
+    """A benchmark result with the history of the block as text"""
+    entry = history[0]
+    lines = [
+        'Benchmark: {}'.format(label),
+        '{} runs after {} warmup runs, in ms'.format(entry['runs'], warmup),
+        '',
+        '{:>12} {:>12} {:>12} {:>12}'.format('min', 'median', 'p95', 'max'),
+        '{:>12.4f} {:>12.4f} {:>12.4f} {:>12.4f}'.format(
+            entry['min'], entry['median'], entry['p95'], entry['max'])
+    ]
+
+    previous = history[1] if len(history) > 1 else None
+    change = benchmark_change(entry, previous)
+    if change is not None and change > regression:
+        lines.extend(['', 'REGRESSION: median {:+.1f}% from the previous '
+                      'run{}'.format(change * 100, ' of the same code'
+                                     if entry['hash'] == previous['hash']
+                                     else ', the code was edited')])
+
+    lines.extend(['', 'History, latest first:', ''])
+    for i, entry in enumerate(history):
+        previous = history[i + 1] if i + 1 < len(history) else None
+        change = benchmark_change(entry, previous)
+        notes = []
+        if change is not None:
+            notes.append('{:+.1f}%'.format(change * 100))
+            if change > regression:
+                notes.append('slower')
+        if previous is not None and entry['hash'] != previous['hash']:
+            notes.append('edited')
+        lines.append('{}  median {:>10.4f}  min {:>10.4f}  p95 {:>10.4f}  '
+                     '{}'.format(time.strftime('%Y-%m-%d %H:%M:%S',
+                                               time.localtime(entry['time'])),
+                                 entry['median'], entry['min'], entry['p95'],
+                                 ' '.join(notes)).rstrip())
+
+    return '\n'.join(lines) + '\n'
+
+
+# ==============================================================================
+# Help
+# ==============================================================================
+# a line starting with a tag, e.g. 'method:: ar, kr'
+HELP_TAG_RE = re.compile(r'^\s*([A-Za-z]+)::\s?(.*)$')
+# inline markup, e.g. 'link::Classes/SinOsc::' or 'code::1 + 2::'
+HELP_INLINE_RE = re.compile(r'([A-Za-z]+)::(.*?)::')
+HELP_TOKEN_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]+')
+# how much a token counts depending on where it is, per occurrence
+HELP_WEIGHTS = {'title': 20, 'method': 5, 'summary': 3, 'text': 1}
+HELP_MAX_WEIGHT = 100
+HELP_HEADINGS = {
+    'description': 'Description',
+    'classmethods': 'Class Methods',
+    'instancemethods': 'Instance Methods',
+    'examples': 'Examples'
+}
+
+
+def help_inline(text):
+    """Help text without inline markup, links shown as their label or name"""
+    def replace(match):
+        if match.group(1).lower() != 'link':
+            return match.group(2)
+        parts = match.group(2).split('#')
+        if len(parts) > 2 and parts[2]:
+            return parts[2]
+        return parts[0].rstrip('/').split('/')[-1]
+
+    return HELP_INLINE_RE.sub(replace, text)
+
+
+def parse_help(text):
+    """Title, summary, categories and methods of a .schelp document
+
+    Methods are [name, kind, [argument, ...]], kind '*' for class methods
+    and '-' for instance methods. Returns the document and the weights of
+    its tokens.
+    """
+    doc = {'title': '', 'summary': '', 'categories': '', 'methods': []}
+    tokens = {}
+
+    def add(text, where):
+        weight = HELP_WEIGHTS[where]
+        for token in HELP_TOKEN_RE.findall(text):
+            token = token.lower()
+            tokens[token] = min(HELP_MAX_WEIGHT, tokens.get(token, 0) + weight)
+
+    kind = '-'
+    methods = []
+    in_code = False
+    for line in text.split('\n'):
+        if in_code:
+            if line.lstrip().startswith('::'):
+                in_code = False
+            else:
+                add(line, 'text')
+            continue
+
+        match = HELP_TAG_RE.match(line)
+        if match is None:
+            add(line, 'text')
+            continue
+
+        tag, rest = match.group(1).lower(), match.group(2).strip()
+        if tag in ('class', 'title'):
+            doc['title'] = rest
+            add(rest, 'title')
+        elif tag == 'summary':
+            doc['summary'] = help_inline(rest)
+            add(rest, 'summary')
+        elif tag == 'categories':
+            doc['categories'] = rest
+            add(rest, 'summary')
+        elif tag in ('classmethods', 'instancemethods'):
+            kind = '*' if tag == 'classmethods' else '-'
+            methods = []
+        elif tag == 'method':
+            # 'method:: ar, kr' or 'method:: new (a, b)'
+            names, _, args = rest.partition('(')
+            args = [arg.strip() for arg in args.rstrip(')').split(',')
+                    if arg.strip()]
+            methods = [[name.strip(), kind, list(args)]
+                       for name in names.split(',') if name.strip()]
+            doc['methods'].extend(methods)
+            add(names, 'method')
+        elif tag == 'argument':
+            if rest:
+                for method in methods:
+                    if rest.split()[0] not in method[2]:
+                        method[2].append(rest.split()[0])
+            add(rest, 'text')
+        elif tag == 'code' and rest == '':
+            in_code = True
+        elif tag in HELP_HEADINGS or tag in ('section', 'subsection'):
+            methods = []
+            add(rest, 'text')
+        elif tag not in ('private', 'keyword', 'redirect', 'copymethod'):
+            add(rest, 'text')
+
+    return doc, tokens
+
+
+def render_help(text):
+    """A .schelp document as plain text for the help panel"""
+    out = []
+    kind = '-'
+    in_code = False
+    for line in text.split('\n'):
+        if in_code:
+            if line.lstrip().startswith('::'):
+                in_code = False
+                out.append('')
+            else:
+                out.append('    ' + line)
+            continue
+
+        match = HELP_TAG_RE.match(line)
+        if match is None:
+            if line.strip() == '::':
+                # end of a list, table or note
+                continue
+            line = help_inline(line).replace('||', ' | ')
+            if line.lstrip().startswith('##'):
+                line = '  - ' + line.lstrip()[2:].strip()
+            out.append(line)
+            continue
+
+        tag, rest = match.group(1).lower(), help_inline(match.group(2))
+        rest = rest.rstrip(': ').strip()
+        if tag in ('class', 'title'):
+            out.extend([rest, '=' * len(rest)])
+        elif tag in ('summary', 'categories'):
+            out.append(rest if tag == 'summary' else 'Categories: ' + rest)
+        elif tag == 'related':
+            out.append('See also: ' + ', '.join(
+                link.strip().rstrip('/').split('/')[-1]
+                for link in rest.split(',')))
+        elif tag in HELP_HEADINGS:
+            kind = '*' if tag == 'classmethods' else '-'
+            out.extend(['', HELP_HEADINGS[tag],
+                        '-' * len(HELP_HEADINGS[tag])])
+        elif tag == 'section':
+            out.extend(['', rest, '-' * len(rest)])
+        elif tag == 'subsection':
+            out.extend(['', rest])
+        elif tag == 'method':
+            names, paren, args = rest.partition('(')
+            out.extend(['', ', '.join(kind + name.strip()
+                                      for name in names.split(',')) +
+                        (' (' + args if paren else '')])
+        elif tag == 'argument':
+            out.append('  {}:'.format(rest))
+        elif tag == 'returns':
+            out.append('  Returns: ' + rest)
+        elif tag == 'code' and rest == '':
+            in_code = True
+        elif tag in ('note', 'warning'):
+            out.append('{}: {}'.format(tag.capitalize(), rest))
+        elif tag not in ('private', 'keyword', 'redirect', 'copymethod',
+                         'list', 'numberedlist', 'table', 'definitionlist',
+                         'tree', 'footnote'):
+            out.append(rest)
+
+    # collapse runs of empty lines
+    text = re.sub(r'\n\s*\n(\s*\n)+', '\n\n', '\n'.join(out))
+    return text.strip() + '\n'
+
+
+def help_source_dirs(settings):
+    """Directories with the installed help, from help_source_paths or sc_path
+
+    Besides the help of SuperCollider itself, the extension directories are
+    included, quarks keep their help there.
+    """
+    paths = settings.get('help_source_paths') or []
+    if len(paths) == 0:
+        sc_path = settings.get('sc_path')
+        if isinstance(sc_path, dict):
+            sc_path = sc_path.get(sublime.platform(), '')
+        sc_dir = os.path.dirname(os.path.realpath(sc_path or '.'))
+        home = os.path.expanduser('~')
+        if sublime.platform() == 'osx':
+            paths = [
+                os.path.join(sc_dir, '..', 'Resources', 'HelpSource'),
+                os.path.join(home, 'Library', 'Application Support',
+                             'SuperCollider', 'Extensions'),
+                '/Library/Application Support/SuperCollider/Extensions'
+            ]
+        elif sublime.platform() == 'windows':
+            paths = [
+                os.path.join(sc_dir, 'HelpSource'),
+                os.path.join(os.environ.get('LOCALAPPDATA', home),
+                             'SuperCollider', 'Extensions')
+            ]
+        else:
+            paths = [
+                os.path.join(sc_dir, '..', 'share', 'SuperCollider',
+                             'HelpSource'),
+                os.path.join(home, '.local', 'share', 'SuperCollider',
+                             'Extensions'),
+                '/usr/share/SuperCollider/Extensions',
+                '/usr/local/share/SuperCollider/Extensions'
+            ]
+
+    paths = [os.path.normpath(os.path.expanduser(path)) for path in paths]
+    return [path for path in paths if os.path.isdir(path)]
+
+
+def refresh_help_index():
+    if help_index is not None:
+        help_index.refresh(help_source_dirs(
+            sublime.load_settings('SuperCollider.sublime-settings')))
+
+
+class HelpIndex():
+    """Inverted index of the installed SCDoc .schelp help files
+
+    Each file is cached with its modification time and size, its title,
+    summary and methods and the weights of its tokens, so refreshing only
+    parses changed files. The postings, token -> {path: weight}, are put
+    together from the cached files after loading or refreshing.
+    """
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}  # path -> {mtime, size, doc, tokens}
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.dirty = False  # changed since last saved
+        self.refreshed = 0
+        # built from files
+        self.postings = {}
+        self.terms = []
+        self.titles = {}
+        self.methods = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') == self.version:
+                self.files = data['files']
+        except (OSError, ValueError):
+            pass
+        self.loaded = True
+        self.build()
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': self.version, 'files': self.files}, file)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as error:
+            print('SuperCollider: could not save help index: {}'.format(
+                error))
+
+    def help_files(self, dirs):
+        for directory in dirs:
+            for root, subdirs, files in os.walk(directory):
+                subdirs[:] = [d for d in subdirs if not d.startswith('.')]
+                for name in files:
+                    if name.endswith('.schelp'):
+                        yield os.path.join(root, name)
+
+    def refresh(self, dirs):
+        """Index the help files in dirs, returns the number parsed"""
+        if not self.loaded:
+            self.load()
+
+        paths = list(self.help_files(dirs))
+        parsed = sum(self.index_file(path) for path in paths)
+
+        # forget files that are gone, or not in dirs any more
+        seen = set(paths)
+        with self.lock:
+            for path in list(self.files):
+                if path not in seen:
+                    del self.files[path]
+                    self.dirty = True
+
+        if self.dirty:
+            self.build()
+            self.save()
+        self.refreshed = time.time()
+        return parsed
+
+    def index_file(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0
+
+        entry = self.files.get(path)
+        if (entry is not None and entry['mtime'] == stat.st_mtime and
+                entry['size'] == stat.st_size):
+            return 0
+
+        try:
+            with open(path, encoding='utf-8', errors='replace') as file:
+                doc, tokens = parse_help(file.read())
+        except OSError:
+            return 0
+
+        if not doc['title']:
+            doc['title'] = os.path.splitext(os.path.basename(path))[0]
+        # Classes, Guides, Reference, ...
+        doc['kind'] = os.path.basename(os.path.dirname(path))
+        with self.lock:
+            self.files[path] = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'doc': doc,
+                'tokens': tokens
+            }
+            self.dirty = True
+
+        return 1
+
+    def build(self):
+        postings = {}
+        titles = {}
+        methods = {}
+        with self.lock:
+            files = list(self.files.items())
+
+        for path, entry in files:
+            doc = entry['doc']
+            titles[doc['title']] = path
+            for method in doc['methods']:
+                methods.setdefault(method[0], []).append(path)
+            for token, weight in entry['tokens'].items():
+                postings.setdefault(token, {})[path] = weight
+
+        # searches may be running, swap the new index in whole
+        self.postings, self.terms = postings, sorted(postings)
+        self.titles, self.methods = titles, methods
+
+    def get(self, path):
+        entry = self.files.get(path)
+        return entry['doc'] if entry is not None else None
+
+    def find(self, word):
+        """[(path, method)] documenting a class, Class.method or method"""
+        name, _, method = word.strip().partition('.')
+        if method:
+            path = self.titles.get(name)
+            doc = self.get(path)
+            if doc is not None and any(m[0] == method for m in doc['methods']):
+                return [(path, method)]
+            return [(path, None)] if doc is not None else []
+
+        if name in self.titles:
+            return [(self.titles[name], None)]
+        return [(path, name) for path in self.methods.get(name, [])]
+
+    def search(self, query, limit=HELP_SEARCH_LIMIT):
+        """Paths of the documents best matching query, best first
+
+        Documents containing every word of the query rank first, by the
+        weights of the words times their inverse document frequency. The
+        last word also matches longer words starting with it.
+        """
+        words = [word.lower() for word in HELP_TOKEN_RE.findall(query)]
+        postings = self.postings
+        terms = self.terms
+        count = max(1, len(self.files))
+        scores = {}
+        matched = {}
+        for i, word in enumerate(words):
+            expanded = [word]
+            if i == len(words) - 1 and len(word) >= 3:
+                start = bisect.bisect_left(terms, word)
+                end = bisect.bisect_left(terms, word + '\x7f')
+                expanded = terms[start:min(end, start + HELP_PREFIX_TERMS)]
+
+            hits = {}
+            for term in expanded:
+                docs = postings.get(term)
+                if docs is None:
+                    continue
+                idf = math.log(count / len(docs)) + 1
+                boost = 1.0 if term == word else 0.5
+                for path, weight in docs.items():
+                    score = weight * idf * boost
+                    if score > hits.get(path, 0):
+                        hits[path] = score
+
+            for path, score in hits.items():
+                scores[path] = scores.get(path, 0) + score
+                matched[path] = matched.get(path, 0) + 1
+
+        ranked = sorted(scores, key=lambda path: (-matched[path],
+                                                  -scores[path]))
+        return ranked[:limit]
+
+
+# ==============================================================================
+# Session log
+# ==============================================================================
+class SessionLog():
+    """Rotating on-disk log of everything sclang printed
+
+    Each line is prefixed with a timestamp and a tab. A session starts a new
+    file, which rotates when it grows past max_bytes, and the oldest files
+    are deleted beyond max_files. Searches memory-map the files rather than
+    reading them in.
+    """
+    prefix = 'sclang-'
+    extension = '.log'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.enabled = True
+        self.max_bytes = 8388608
+        self.max_files = 10
+        self.file = None
+        self.path = None
+        self.session = None
+        self.part = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def configure(self, enabled, max_bytes, max_files):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        if not enabled:
+            self.close()
+
+    def is_open(self):
+        return self.file is not None
+
+    def open(self):
+        """Start a new session"""
+        self.close()
+        if not self.enabled:
+            return
+
+        self.session = time.strftime('%Y%m%d-%H%M%S')
+        self.part = 0
+        with self.lock:
+            self.open_part()
+
+    def open_part(self):
+        self.path = os.path.join(self.directory, '{}{}-{:03d}{}'.format(
+            self.prefix, self.session, self.part, self.extension))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.file = open(self.path, 'ab')
+        except OSError as error:
+            print('SuperCollider: could not open session log: {}'.format(
+                error))
+            self.file = None
+            return
+
+        self.size = self.file.tell()
+        self.remove_old_files()
+
+    def remove_old_files(self):
+        for path in self.files()[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+            self.file = None
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def write(self, lines):
+        if self.file is None or len(lines) == 0:
+            return
+
+        now = time.time()
+        stamp = '{}.{:03d}\t'.format(time.strftime('%H:%M:%S',
+                                                    time.localtime(now)),
+                                     int(now % 1 * 1000))
+        data = ''.join(stamp + line for line in lines)
+        if not data.endswith('\n'):
+            data += '\n'
+        data = data.encode('utf-8')
+
+        with self.lock:
+            if self.file is None:
+                return
+            try:
+                self.file.write(data)
+            except OSError:
+                return
+            self.size += len(data)
+            if self.size >= self.max_bytes:
+                self.file.close()
+                self.part += 1
+                self.open_part()
+
+    def files(self):
+        """All log files, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        return sorted(os.path.join(self.directory, name) for name in names
+                      if name.startswith(self.prefix) and
+                      name.endswith(self.extension))
+
+    def session_files(self):
+        return [path for path in self.files()
+                if os.path.basename(path).startswith(
+                    '{}{}-'.format(self.prefix, self.session))]
+
+    def tail(self, max_lines):
+        """The last max_lines lines of this session, without timestamps"""
+        self.flush()
+        chunks = []
+        count = 0
+        for path in reversed(self.session_files()):
+            try:
+                with open(path, 'rb') as file:
+                    file.seek(0, os.SEEK_END)
+                    end = file.tell()
+                    while end > 0 and count <= max_lines:
+                        start = max(0, end - 65536)
+                        file.seek(start)
+                        chunk = file.read(end - start)
+                        chunks.append(chunk)
+                        count += chunk.count(b'\n')
+                        end = start
+            except OSError:
+                continue
+            if count > max_lines:
+                break
+
+        data = b''.join(reversed(chunks)).decode('utf-8', 'replace')
+        lines = data.split('\n')[:-1][-max_lines:]
+        return ''.join(line.partition('\t')[2] + '\n' for line in lines)
+
+    def search(self, text, limit=SESSION_LOG_SEARCH_LIMIT):
+        """Case insensitive search of all logs, newest match first
+
+        Returns a list of (path, line number, line).
+        """
+        self.flush()
+        pattern = re.compile(re.escape(text.encode('utf-8')), re.IGNORECASE)
+        results = []
+        for path in reversed(self.files()):
+            matches = []
+            try:
+                with open(path, 'rb') as file, mmap.mmap(
+                        file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    line_number = 1
+                    last = 0
+                    for match in pattern.finditer(data):
+                        start = data.rfind(b'\n', 0, match.start()) + 1
+                        if start < last:
+                            continue  # already have this line
+                        line_number += data[last:start].count(b'\n')
+                        end = data.find(b'\n', match.end())
+                        end = len(data) if end == -1 else end
+                        matches.append((path, line_number,
+                                        data[start:end].decode('utf-8',
+                                                               'replace')))
+                        last = start
+            except (OSError, ValueError):
+                continue  # missing or empty file
+
+            results.extend(reversed(matches))
+            if len(results) >= limit:
+                break
+
+        return results[:limit]
+
+
+class LatencyHistogram():
+    """Counts of durations in milliseconds, in roughly logarithmic buckets"""
+    bounds = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+              1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """Upper bound of the bucket the p-th percentile falls in"""
+        if self.count == 0:
+            return None
+
+        rank = self.count * p / 100
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        buckets = {}
+        for bound, count in zip(self.bounds, self.counts):
+            if count > 0:
+                buckets['<={}'.format(bound)] = count
+        if self.counts[-1] > 0:
+            buckets['>{}'.format(self.bounds[-1])] = self.counts[-1]
+
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max,
+            'buckets': buckets
+        }
+
+
+class PipelineMetrics():
+    """Counters, gauges and latency histograms of the sclang I/O pipeline
+
+    Updated from the reader, writer and main threads, so all access goes
+    through a lock. Updates are made per read, write or flush, never per line.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.counters = {}
+            self.gauges = {}  # name: [value, max]
+            self.histograms = {}
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        with self.lock:
+            gauge = self.gauges.get(name)
+            if gauge is None:
+                self.gauges[name] = [value, value]
+            else:
+                gauge[0] = value
+                gauge[1] = max(gauge[1], value)
+
+    def observe(self, name, ms):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.observe(ms)
+
+    def counter(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def percentile(self, name, p):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            return None if histogram is None else histogram.percentile(p)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'started': time.strftime('%Y-%m-%d %H:%M:%S',
+                                         time.localtime(self.started)),
+                'seconds': time.time() - self.started,
+                'counters': dict(self.counters),
+                'gauges': dict((name, {'value': value, 'max': peak})
+                               for name, (value, peak) in self.gauges.items()),
+                'latencies': dict((name, histogram.as_dict())
+                                  for name, histogram
+                                  in self.histograms.items())
+            }
+
+
+class PostBacklog():
+    """Bounded queue of sclang output lines waiting for the post view
+
+    What happens when the backlog is full depends on the overflow policy:
+    'drop_oldest' discards the oldest waiting lines, 'drop_newest' discards
+    the incoming ones and 'block' makes the reader wait for space, which
+    stops it reading from sclang's stdout so sclang itself is held up.
+    Dropped lines are counted until the next drain.
+    A max_lines of -1 means unbounded.
+    """
+
+    def __init__(self, max_lines=-1, overflow='drop_oldest'):
+        self.lines = deque()
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.configure(max_lines, overflow)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def configure(self, max_lines, overflow):
+        with self.condition:
+            self.max_lines = max_lines
+            self.overflow = overflow
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def extend(self, lines, can_block=None):
+        with self.condition:
+            if self.max_lines < 1:
+                self.lines.extend(lines)
+                return
+
+            if self.overflow == 'block':
+                start = 0
+                while start < len(lines):
+                    space = self.max_lines - len(self.lines)
+                    if space > 0:
+                        self.lines.extend(lines[start:start + space])
+                        start += space
+                    elif (self.closed or can_block is None or
+                            not can_block()):
+                        # nobody is draining, fall back to dropping oldest
+                        self.extend_dropping_oldest(lines[start:])
+                        return
+                    else:
+                        self.condition.wait(BACKLOG_BLOCK_WAIT)
+            elif self.overflow == 'drop_newest':
+                space = max(0, self.max_lines - len(self.lines))
+                self.lines.extend(lines[:space])
+                self.dropped += max(0, len(lines) - space)
+            else:
+                self.extend_dropping_oldest(lines)
+
+    def extend_dropping_oldest(self, lines):
+        if len(lines) >= self.max_lines:
+            self.dropped += len(self.lines) + len(lines) - self.max_lines
+            self.lines.clear()
+            self.lines.extend(lines[len(lines) - self.max_lines:])
+            return
+
+        self.lines.extend(lines)
+        for i in range(len(self.lines) - self.max_lines):
+            self.lines.popleft()
+            self.dropped += 1
+
+    def drain(self, max_bytes=None):
+        """Remove lines up to roughly max_bytes of text (None for all)
+
+        Returns (lines, dropped count). At least one line is returned if any
+        are waiting, however long it is.
+        """
+        with self.condition:
+            if max_bytes is None:
+                lines = list(self.lines)
+                self.lines.clear()
+            else:
+                lines = []
+                size = 0
+                while self.lines and size < max_bytes:
+                    line = self.lines.popleft()
+                    lines.append(line)
+                    size += len(line)
+            dropped = self.dropped
+            self.dropped = 0
+            self.condition.notify_all()
+
+        return lines, dropped
+
+
+class PostCoalescer():
+    """Folds repeated post lines and optionally rate limits similar ones
+
+    The first line of a run of identical lines is passed on straight away,
+    the rest are counted and passed on as a single 'line (xN)' when the run
+    ends or flush is called, which happens regularly while a run goes on.
+    With a rate limit, lines that only differ in their numbers share a limit
+    of lines per second, the lines beyond it are counted and reported by
+    flush instead. Error and warning lines are never rate limited.
+    Callers hold lock around feed and flush.
+    """
+    digits_re = re.compile(r'\d+')
+
+    def __init__(self, collapse=True, rate_limit=0):
+        self.lock = threading.Lock()
+        self.last = None
+        self.repeats = 0
+        # pattern: [window start, lines in window, lines suppressed]
+        self.patterns = {}
+        self.suppressed = 0
+        self.configure(collapse, rate_limit)
+
+    def configure(self, collapse, rate_limit):
+        self.collapse = collapse
+        self.rate_limit = rate_limit
+
+    def has_pending(self):
+        return self.repeats > 0 or self.suppressed > 0
+
+    def feed(self, lines):
+        """Returns the lines to post"""
+        if not self.collapse and self.rate_limit < 1:
+            return lines
+
+        collapse = self.collapse
+        limit = self.rate_limit > 0
+        now = time.monotonic()
+        last = self.last
+        repeats = self.repeats
+        out = []
+        for line in lines:
+            if collapse and line == last:
+                repeats += 1
+                continue
+
+            if repeats > 0:
+                out.append(self.summary(last, repeats))
+                repeats = 0
+            last = line
+
+            if limit and type(line) is not OutputLine and not self.allow(
+                    line, now):
+                continue
+            out.append(line)
+
+        self.last = last
+        self.repeats = repeats
+        return out
+
+    def summary(self, line, repeats):
+        if repeats == 1:
+            return str(line)
+        return '{} (x{})\n'.format(line.rstrip('\n'), repeats)
+
+    def allow(self, line, now):
+        pattern = self.digits_re.sub('#', line.rstrip('\n'))
+        window = self.patterns.get(pattern)
+        if window is None:
+            if len(self.patterns) >= RATE_LIMIT_PATTERNS:
+                self.forget(now)
+            self.patterns[pattern] = [now, 1, 0]
+            return True
+
+        if now - window[0] >= 1:
+            window[0] = now
+            window[1] = 0
+
+        if window[1] < self.rate_limit:
+            window[1] += 1
+            return True
+
+        window[2] += 1
+        self.suppressed += 1
+        return False
+
+    def forget(self, now):
+        # drop patterns whose window expired with nothing left to report
+        self.patterns = dict(
+            (pattern, window) for pattern, window in self.patterns.items()
+            if now - window[0] < 1 or window[2] > 0)
+
+    def flush(self):
+        """Returns lines reporting the repeats and suppressed lines so far"""
+        out = []
+        if self.repeats > 0:
+            # the run may go on, further repeats are counted from here
+            out.append(self.summary(self.last, self.repeats))
+            self.repeats = 0
+
+        if self.suppressed > 0:
+            for pattern, window in self.patterns.items():
+                if window[2] > 0:
+                    out.append(SUPPRESSED_MSG.format(window[2], pattern))
+                    window[2] = 0
+            self.suppressed = 0
+            self.forget(time.monotonic())
+
+        return out
+
+
+class PostViewLines():
+    """Running line count of a post view buffer
+
+    Keeps the end offset of every line in the buffer, updated from inserted
+    text only, so trimming to a maximum number of lines costs time
+    proportional to the lines removed rather than the buffer size.
+    Offsets are stored relative to everything ever inserted, so removing
+    lines from the front does not require adjusting the others.
+    """
+
+    def __init__(self):
+        self.reset('')
+
+    def reset(self, text):
+        self.ends = deque()
+        self.start = 0  # offset of the start of the buffer
+        self.size = 0
+        self.add(text)
+
+    def __len__(self):
+        return len(self.ends)
+
+    def add(self, text):
+        base = self.start + self.size
+        ends = self.ends
+        find = text.find
+        i = find('\n')
+        while i != -1:
+            ends.append(base + i + 1)
+            i = find('\n', i + 1)
+
+        self.size += len(text)
+
+    def trim(self, max_lines):
+        """Drop all but the last max_lines lines
+
+        Returns the number of characters to erase from the buffer start.
+        """
+        excess = len(self.ends) - max_lines
+        if excess <= 0:
+            return 0
+
+        for i in range(excess - 1):
+            self.ends.popleft()
+        end = self.ends.popleft() - self.start
+
+        self.start += end
+        self.size -= end
+        return end
+
+
+class SclangWriter():
+    """Writes to sclang's stdin from a dedicated thread
+
+    Writes are queued and return immediately, so a busy interpreter or a full
+    pipe never blocks the caller. The queue is bounded in bytes: a write that
+    does not fit is refused, unless the queue is empty. Large writes go out
+    in chunks of WRITE_CHUNK_SIZE.
+    Priority writes are never refused and go out before anything queued,
+    as soon as the write in progress (if any) has finished; a command can't
+    be cut into the middle of another one.
+    """
+
+    def __init__(self, output, max_bytes=WRITE_QUEUE_BYTES, metrics=None):
+        self.output = output
+        self.max_bytes = max_bytes
+        self.metrics = metrics
+        self.items = deque()
+        self.priority_items = deque()
+        self.pending_bytes = 0  # queued or being written
+        self.writing = False
+        self.closed = False
+        self.condition = threading.Condition()
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __len__(self):
+        return (len(self.items) + len(self.priority_items) +
+                (1 if self.writing else 0))
+
+    def describe(self):
+        return '{} queued, {:.1f} KB'.format(len(self),
+                                             self.pending_bytes / 1024)
+
+    def write(self, data, priority=False):
+        with self.condition:
+            if self.closed:
+                return False
+
+            if priority:
+                self.priority_items.append(data)
+            elif (self.pending_bytes > 0 and
+                    self.pending_bytes + len(data) > self.max_bytes):
+                return False
+            else:
+                self.items.append(data)
+
+            self.pending_bytes += len(data)
+            self.condition.notify()
+            return True
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            for items in (self.items, self.priority_items):
+                self.pending_bytes -= sum(len(item) for item in items)
+                items.clear()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while (not self.items and not self.priority_items and
+                        not self.closed):
+                    self.condition.wait()
+                if self.closed:
+                    return
+                if self.priority_items:
+                    data = self.priority_items.popleft()
+                else:
+                    data = self.items.popleft()
+                self.writing = True
+
+            try:
+                start = time.perf_counter()
+                self.write_chunks(data)
+                if self.metrics is not None:
+                    self.metrics.count('stdin_bytes', len(data))
+                    self.metrics.observe(
+                        'stdin_write_ms', (time.perf_counter() - start) * 1000)
+            except (OSError, ValueError):
+                self.close()  # pipe closed, sclang has gone
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.pending_bytes -= len(data)
+
+    def write_chunks(self, data):
+        view = memoryview(data)
+        while len(view) > 0 and not self.closed:
+            written = self.output.write(view[:WRITE_CHUNK_SIZE])
+            view = view[written or 0:]
+
+        self.output.flush()
+
+
+class SclangSupervisor():
+    """Watches an sclang process from its own thread until it exits
+
+    Keeps the state of the process for the UI to read: starting (no output
+    yet), compiling, ready, busy (requests or input waiting, or a heartbeat
+    unanswered for a moment), hung (a heartbeat unanswered for the hang
+    timeout) and dead. Heartbeats are requests sent every heartbeat_ms
+    while sclang is up, the state goes back to ready once one is answered.
+    Shutting down asks sclang to exit, terminates it after SCLANG_EXIT_MS
+    and kills it after another SCLANG_TERMINATE_MS.
+    """
+
+    def __init__(self, sc, process, queue, writer):
+        self.sc = sc
+        self.process = process
+        self.queue = queue
+        self.writer = writer
+        self.state = 'starting'
+        self.wakeup = threading.Event()
+        self.started = time.perf_counter()
+        self.eof_at = None
+        self.exited_at = None
+        self.exit_requested = None
+        self.exit_phase = None
+        self.ping = None
+        self.ping_scheduled = False
+        self.last_ping = self.started
+        self.hung_since = None
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while self.process.poll() is None:
+            now = time.perf_counter()
+            if self.exit_requested is not None:
+                self.escalate(now)
+            else:
+                self.set_state(self.check_health(now))
+            if self.eof_at is not None:
+                # sclang closed its output, it should be gone any moment
+                try:
+                    self.process.wait(SUPERVISOR_TICK_MS / 1000)
+                except subprocess.TimeoutExpired:
+                    pass
+            else:
+                self.wakeup.wait(SUPERVISOR_TICK_MS / 1000)
+                self.wakeup.clear()
+
+        self.exited_at = time.perf_counter()
+        if self.exit_phase is not None:
+            self.sc.metrics.count('shutdown_{}'.format(self.exit_phase))
+            self.sc.metrics.observe(
+                'shutdown_ms', (self.exited_at - self.exit_requested) * 1000)
+
+        # release the reader if it is waiting for backlog space
+        self.queue.close()
+        self.writer.close()
+        self.set_state('dead')
+
+    def set_state(self, state):
+        if state == self.state:
+            return
+
+        self.state = state
+        if self.sc.supervisor is self:
+            self.sc.state = state
+        sublime.set_timeout(lambda: self.sc.on_state(self, state), 0)
+
+    def check_health(self, now):
+        sc = self.sc
+        if sc.metrics.counter('read_bytes') == 0:
+            return 'starting'
+        if sc.ready_requested is not None:
+            return 'compiling'
+
+        ping = self.ping
+        waiting = ping is not None and not ping.done()
+        if (sc.heartbeat_ms > 0 and not waiting and not self.ping_scheduled and
+                (now - self.last_ping) * 1000 >= sc.heartbeat_ms):
+            self.ping_scheduled = True
+            sublime.set_timeout(self.send_ping, 0)
+
+        if self.hung_since is not None:
+            return 'hung'
+        if waiting and (now - ping.sent) * 1000 > HEARTBEAT_BUSY_MS:
+            return 'busy'
+        if len(sc.requests) > int(waiting) or self.writer.pending_bytes > 0:
+            return 'busy'
+        return 'ready'
+
+    def send_ping(self):
+        # on the main thread, like other requests
+        self.ping_scheduled = False
+        if self.sc.supervisor is not self or self.exit_requested is not None:
+            return
+
+        self.last_ping = time.perf_counter()
+        self.ping = self.sc.request('0', self.on_pong, self.on_ping_error,
+                                    max(1, self.sc.hang_timeout_ms))
+
+    def on_pong(self, result):
+        self.hung_since = None
+        self.wakeup.set()
+
+    def on_ping_error(self, error):
+        if error == 'timed out' and self.hung_since is None:
+            self.hung_since = self.ping.sent
+        self.wakeup.set()
+
+    def on_eof(self):
+        # called by the reader, sclang has closed its output
+        self.eof_at = time.perf_counter()
+        self.wakeup.set()
+
+    def shutdown(self, terminate=False):
+        if self.exit_requested is None:
+            self.exit_requested = time.perf_counter()
+            self.exit_phase = 'exit'
+            # ahead of queued code, and never refused like a full queue's
+            self.writer.write(b'0.exit;\x0c', priority=True)
+        if terminate and self.exit_phase == 'exit':
+            self.exit_requested -= SCLANG_EXIT_MS / 1000
+        self.wakeup.set()
+
+    def escalate(self, now):
+        elapsed_ms = (now - self.exit_requested) * 1000
+        try:
+            if self.exit_phase == 'exit' and elapsed_ms >= SCLANG_EXIT_MS:
+                self.exit_phase = 'terminate'
+                self.process.terminate()
+            elif (self.exit_phase == 'terminate' and
+                    elapsed_ms >= SCLANG_EXIT_MS + SCLANG_TERMINATE_MS):
+                self.exit_phase = 'kill'
+                self.process.kill()
+        except OSError:
+            pass
+
+
+class SclangStandby():
+    """An sclang started ahead of time, compiled and waiting to be used
+
+    Its output is read until it posts that the class library has been
+    compiled, or failed to, and kept so whoever takes the process over can
+    post it. After that nothing reads its stdout, sclang blocks once the
+    pipe is full, which does no harm while it is only waiting.
+    It is a full sclang, which has run startup.scd and listens on a language
+    port of its own, see the warm_standby setting.
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.started = time.time()
+        self.output = bytearray()
+        self.state = 'compiling'
+        self.process = spawn_sclang(*command)
+        self.thread = threading.Thread(target=self.read)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def read(self):
+        ready = SCLANG_READY.encode('utf-8')
+        failed = SCLANG_COMPILE_FAILED.encode('utf-8')
+        overlap = max(len(ready), len(failed))
+        for data in iter(lambda: self.process.stdout.read(READ_CHUNK_SIZE),
+                         b''):
+            # only search what arrived, and what a marker could start in
+            start = max(0, len(self.output) - overlap)
+            self.output += data
+            if self.output.find(failed, start) >= 0:
+                self.state = 'failed'
+                return
+            if self.output.find(ready, start) >= 0:
+                self.state = 'ready'
+                return
+
+        self.state = 'failed'
+
+    def is_alive(self):
+        return self.state != 'failed' and self.process.poll() is None
+
+    def is_ready(self):
+        return self.state == 'ready' and self.process.poll() is None
+
+    def is_stale(self, mtimes):
+        """Whether any of the files, or their directories, changed since"""
+        paths = set(mtimes)
+        paths.update(os.path.dirname(path) for path in mtimes)
+        for path in paths:
+            mtime = file_mtime(path)
+            if mtime is not None and mtime >= self.started:
+                return True
+        return False
+
+    def kill(self):
+        try:
+            self.process.stdin.close()
+            self.process.kill()
+        except Exception:
+            pass
+
+
+class SclangOutputSplitter():
+    """Splits raw chunks of sclang output into post lines and flagged lines
+
+    Bytes are decoded incrementally, so multi-byte characters split across
+    reads survive, and invalid bytes are replaced instead of raising.
+    Incomplete trailing lines are held back until their newline arrives.
+    A flagged request reply carries the number of lines that follow it, those
+    lines are appended to the flagged line rather than posted.
+    """
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.partial = ''
+        self.message = []
+        self.message_lines = 0
+
+    def feed(self, data, flag, final=False):
+        text = self.partial + self.decoder.decode(data, final)
 
-    def set_post_view(self, view):
-        self.post_view = view
+        if final:
+            end = len(text)
+        else:
+            end = text.rfind('\n') + 1
 
-    def create_post_view(self, window):
-        self.post_view = window.new_file()
-        self.post_view.set_name(self.post_view_name)
-        # move post view to new pane if set
-        if self.open_post_view_in == 'group':
-            if window.num_groups() == 1:
-                window.run_command('new_pane')
+        self.partial = text[end:]
+        if end == 0:
+            return [], []
+
+        # split on newlines only, other line breaks are part of the line
+        body = text[:end]
+        if body.endswith('\n'):
+            lines = [line + '\n' for line in body[:-1].split('\n')]
+        else:
+            # final, unterminated line
+            lines = [line + '\n' for line in body.split('\n')]
+            lines[-1] = lines[-1][:-1]
+
+        # only inspect individual lines when the chunk contains the flag
+        if self.message_lines == 0 and flag not in text[:end]:
+            return lines, []
+
+        post = []
+        flagged = []
+        for line in lines:
+            if self.message_lines > 0:
+                self.message.append(line)
+                self.message_lines -= 1
+                if self.message_lines == 0:
+                    flagged.append(''.join(self.message))
+            elif flag in line:
+                self.message_lines = self.count_message_lines(line, flag)
+                if self.message_lines == 0:
+                    flagged.append(line)
+                else:
+                    self.message = [line]
             else:
-                window.set_view_index(self.post_view, 1, 0)
+                post.append(line)
 
-        # set post view attributes
-        self.set_post_view_syntax(self.highlight_post)
-        self.post_view.set_name(self.post_view_name)
-        self.post_view.set_scratch(True)
-        self.post_view.settings().set('rulers', 0)
-        self.post_view.settings().set('line_numbers', False)
+        return post, flagged
 
-    def remove_post_view(self):
-        self.post_view = None
+    def count_message_lines(self, line, flag):
+        parts = line.split(flag, 2)
+        if len(parts) != 3 or parts[1] != 'rpc':
+            return 0
 
-    def open_post_view(self):
-        # create a new window if necessary
-        if len(sublime.windows()) == 0:
-            sublime.run_command('new_window')
+        try:
+            return max(0, int(parts[2].split()[2]))
+        except (IndexError, ValueError):
+            return 0
+
+
+class OutputLine(str):
+    """A post line starting an error or warning record"""
+    __slots__ = ('record',)
+
+
+class OutputRecord():
+    """An error or warning found in sclang output
+
+    file and line are None when sclang didn't report them, errors in
+    interpreted code can only be found in the post view.
+    """
+
+    def __init__(self, serial, kind, message):
+        self.serial = serial
+        self.kind = kind  # 'error' or 'warning'
+        self.message = message
+        self.file = None
+        self.line = None
+        self.column = None
+
+
+def output_marks(lines, offset=0):
+    """Marks of the record headers in lines, as
+    [offset, length, kind, serial] lists, offsets start at offset
+    """
+    marks = []
+    for line in lines:
+        if type(line) is OutputLine:
+            marks.append([offset, len(line.rstrip()), line.record.kind,
+                          line.record.serial])
+        offset += len(line)
+    return marks
+
+
+class OutputClassifier():
+    """Finds error and warning records in sclang output as it arrives
+
+    A record starts at an ERROR: or WARNING: line and picks up the file and
+    'line N char M' position reported in the lines following it. Each line is
+    looked at once: only the few lines after a record header are searched,
+    any other line costs a single prefix check.
+    Header lines are replaced with OutputLine instances, so the records can
+    be located again when their lines reach the post view.
+    scsynth's 'late' lines (messages that arrived after their time) are only
+    counted.
+    """
+    error_prefixes = ('ERROR', '*** ERROR', 'FAILURE IN SERVER')
+    warning_prefixes = ('WARNING',)
+    stack_prefix = 'PROTECTED CALL STACK'
+    late_prefix = 'late '
+    prefixes = error_prefixes + warning_prefixes + (stack_prefix, late_prefix)
+    file_re = re.compile(r"[Ii]n file:? *'([^']+)'")
+    position_re = re.compile(r'line (\d+) char (\d+)')
+
+    def __init__(self, serials):
+        self.serials = serials
+        self.record = None
+        self.remaining = 0  # lines left to search for the record location
+        self.late_lines = 0
+
+    def feed(self, lines):
+        """Mark the record headers in lines, returns the new records"""
+        prefixes = self.prefixes
+        headers = [i for i, line in enumerate(lines)
+                   if line.startswith(prefixes)]
+
+        records = []
+        position = 0
+        for i in headers:
+            self.search(lines, position, i)
+            position = i + 1
+            if lines[i].startswith(self.late_prefix):
+                self.late_lines += 1
+                continue
+
+            record = self.start(lines[i])
+            if record is not None:
+                lines[i] = OutputLine(lines[i])
+                lines[i].record = record
+                records.append(record)
+
+        self.search(lines, position, len(lines))
+        return records
+
+    def search(self, lines, start, end):
+        # looks for the location of the open record in lines[start:end]
+        end = min(end, start + self.remaining)
+        for line in itertools.islice(lines, start, end):
+            self.remaining -= 1
+            self.locate(line)
+            if self.remaining == 0:
+                break
+
+    def start(self, line):
+        if line.startswith(self.stack_prefix):
+            # a protected call stack is part of the error just before it
+            if self.remaining > 0:
+                self.remaining = OUTPUT_RECORD_LINES
+                return None
+            kind = 'error'
+        elif line.startswith(self.warning_prefixes):
+            kind = 'warning'
+        else:
+            kind = 'error'
+
+        self.record = OutputRecord(next(self.serials), kind, line.strip())
+        self.remaining = OUTPUT_RECORD_LINES
+        return self.record
+
+    def locate(self, line):
+        record = self.record
+        if record.file is None:
+            match = self.file_re.search(line)
+            if match:
+                record.file = match.group(1)
+
+        if record.line is None:
+            match = self.position_re.search(line)
+            if match:
+                record.line = int(match.group(1))
+                record.column = int(match.group(2))
+
+        if record.file is not None and record.line is not None:
+            self.remaining = 0
+
+
+class SclangRequest():
+    """A request sent to sclang, resolved once with a result or an error
+
+    Callbacks run on the main thread, wait() can be used from others.
+    """
+
+    def __init__(self, id, on_done=None, on_error=None):
+        self.id = id
+        self.on_done = on_done
+        self.on_error = on_error
+        self.result = None
+        self.error = None
+        self.event = threading.Event()
+        self.sent = time.perf_counter()
+
+    def resolve(self, result, error):
+        if self.event.is_set():
+            return
 
-        # remember the original view
-        focus_window = sublime.active_window()
-        prev_view = focus_window.active_view()
+        self.result = result
+        self.error = error
+        self.event.set()
 
-        if self.open_post_view_in == 'panel':
-            if not self.panel_open:
-                focus_window.run_command('show_panel', {
-                    'panel': 'output.{}'.format(self.post_view_name)
-                })
-                self.post_view = focus_window.get_output_panel(
-                    self.post_view_name)
-                self.panel_open = True
-        else:
-            self.deactivate_post_view('New post view created')
-            # create a new window if post window should open in it
-            if self.open_post_view_in == 'window':
-                sublime.run_command('new_window')
+        if error is None and self.on_done is not None:
+            sublime.set_timeout(lambda: self.on_done(result), 0)
+        elif error is not None and self.on_error is not None:
+            sublime.set_timeout(lambda: self.on_error(error), 0)
 
-            # create new post view in the active window
-            window = sublime.active_window()
-            self.create_post_view(window)
+    def done(self):
+        return self.event.is_set()
 
-        # update the view with previous view content if possible
-        if self.post_view_cache is not None:
-            self.post_view.run_command('super_collider_update_post_view', {
-                'content': self.post_view_cache,
-                'max_lines': self.post_view_max_lines,
-                'force_scroll': True
-            })
-            self.post_view_cache = None
+    def wait(self, timeout=None):
+        """Block until resolved, returns the result or raises SclangError"""
+        if not self.event.wait(timeout):
+            raise SclangError('timed out')
+        if self.error is not None:
+            raise SclangError(self.error)
+        return self.result
 
-        # focus on original view
-        focus_window.focus_view(prev_view)
 
-        # start updating post view
-        self.update_post_view()
+class SclangError(Exception):
+    pass
 
-    def update_post_view(self):
-        sublime.set_timeout(self.update_post_view, 5)
-        if (not self.is_alive() or not self.has_post_view() or len(self.sclang_queue) == 0):
-            return
 
-        get_max = min(100, len(self.sclang_queue))
+class ServerStatusMonitor():
+    """Polls scsynth's /status over UDP from a background thread
 
-        content = ''
-        for i in range(0, get_max):
-            content += self.sclang_queue.popleft()
+    Talks to the server directly, so it works while sclang is busy and never
+    touches the interpreter. on_update(status) is called from the monitor
+    thread with every /status.reply, as a dict, and with None once the
+    server stops answering. Until it first answers nothing is reported, so
+    there is no status while no server is booted.
+    """
+    poll_message = osc_message('/status')
+    fields = ('ugens', 'synths', 'groups', 'synthdefs', 'avg_cpu',
+              'peak_cpu', 'sample_rate', 'actual_sample_rate')
 
-        self.post_view.run_command('super_collider_update_post_view', {
-            'content': content,
-            'max_lines': self.post_view_max_lines
-        })
+    def __init__(self, on_update):
+        self.on_update = on_update
+        self.thread = None
+        self.stopped = threading.Event()
+        self.status = None
+        self.configure('127.0.0.1', 57110, 1000)
 
-    def cache_post_view(self, content):
-        self.post_view_cache = content
+    def configure(self, host, port, interval_ms):
+        self.host = host
+        self.port = port
+        self.interval_ms = interval_ms
 
-    def deactivate_post_view(self, msg):
-        if self.has_post_view():
-            self.post_view.run_command('super_collider_update_post_view', {
-                'content': msg,
-                'force_scroll': True
-            })
-            self.post_view.set_name(self.inactive_post_view_name)
+    def is_running(self):
+        return (self.thread is not None and self.thread.is_alive() and
+                not self.stopped.is_set())
 
-    def clear_post_view(self, edit):
-        if self.has_post_view():
-            self.post_view.erase(
-                edit, sublime.Region(0, self.post_view.size()))
+    def start(self):
+        if self.is_running() or self.interval_ms < 1:
+            return
 
-    def open_help(self, word):
-        self.execute('HelpBrowser.openHelpFor("{}");'.format(word))
+        self.stopped = threading.Event()
+        self.status = None
+        self.thread = threading.Thread(target=self.run, args=(self.stopped,))
+        self.thread.daemon = True
+        self.thread.start()
 
-    def open_class(self, klass):
-        cmd = '''
-            if('{0}'.asClass.notNil) {{
-                '{0}'.asClass.filenameSymbol;
-            }} {{
-                "{0} is not a Class!".postln;
-            }}
-        '''.format(klass)
-        self.execute_flagged('open_file', cmd)
+    def stop(self):
+        self.stopped.set()
+
+    def run(self, stopped):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        missed = 0
+        answered = False  # since started
+        try:
+            while not stopped.is_set():
+                try:
+                    sock.sendto(self.poll_message, (self.host, self.port))
+                except OSError:
+                    pass
+
+                deadline = time.perf_counter() + self.interval_ms / 1000
+                if self.receive(sock, deadline, stopped):
+                    missed = 0
+                    answered = True
+                else:
+                    missed += 1
+                    if answered and missed == SERVER_STATUS_MISSED_POLLS:
+                        self.status = None
+                        self.on_update(None)
+        finally:
+            sock.close()
+
+    def receive(self, sock, deadline, stopped):
+        # waits for replies until the next poll is due, True if one came in
+        replied = False
+        while not stopped.is_set():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+
+            sock.settimeout(remaining)
+            try:
+                data = sock.recv(65536)
+            except socket.timeout:
+                break
+            except OSError:
+                # nothing listening, reported as an error on some platforms
+                stopped.wait(remaining)
+                break
+
+            try:
+                messages = osc_decode(data)
+            except ValueError:
+                continue
+
+            for address, args in messages:
+                if address == '/status.reply' and len(args) >= 9:
+                    self.status = dict(zip(self.fields, args[1:9]))
+                    self.on_update(self.status)
+                    replied = True
+
+        return replied
+
+
+class OscAddressStats():
+    """Counts and rate of the messages to one address"""
+    __slots__ = ('count', 'kept', 'rate', 'window_start', 'window_count',
+                 'window_kept', 'last')
+
+    def __init__(self, now):
+        self.count = 0
+        self.kept = 0
+        self.rate = None
+        self.window_start = now
+        self.window_count = 0
+        self.window_kept = 0
+        self.last = None
+
+    def current_rate(self, now):
+        # messages per second over the last full second, while they come in
+        elapsed = now - self.window_start
+        if elapsed > 2:
+            return 0.0
+        if self.rate is None:
+            return self.window_count / max(elapsed, 1)
+        return self.rate
+
+
+class OscTrace():
+    """Captures OSC messages sclang receives, forwarded to a UDP socket
+
+    Messages to addresses matching the include patterns (all if there are
+    none) and none of the exclude patterns are kept in a ring buffer of
+    size messages. Per address, only one in n messages is kept when a sample
+    pattern {pattern: n} matches it, and at most rate_limit per second.
+    Counts and rates are kept for every address forwarded, including the
+    messages that were dropped. Exclude patterns without wildcards are left
+    out by sclang already, so those addresses are never counted.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sock = None
+        self.port = None
+        self.messages = deque(maxlen=1)
+        self.configure(10000, [], [], {}, 0)
+        self.reset()
+
+    def configure(self, size, include, exclude, sample, rate_limit):
+        with self.lock:
+            self.messages = deque(self.messages, maxlen=max(1, size))
+            self.include = list(include)
+            self.exclude = list(exclude)
+            self.sample = dict(sample)
+            self.rate_limit = rate_limit
+            # address -> (traced, sample), matching patterns is slow
+            self.policies = {}
+
+    def reset(self):
+        with self.lock:
+            self.messages.clear()
+            self.addresses = {}
+            self.started = time.time()
+            self.received = 0
+            self.kept = 0
+            self.filtered = 0
+            self.sampled_out = 0
+            self.limited = 0
+
+    def is_open(self):
+        return self.sock is not None
+
+    def open(self):
+        """Start receiving on a free localhost port, returns the port"""
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                # bursts are read after the fact rather than lost
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                     1048576)
+            except OSError:
+                pass
+            self.sock.bind(('127.0.0.1', 0))
+            self.port = self.sock.getsockname()[1]
+            thread = threading.Thread(target=self.run, args=(self.sock,))
+            thread.daemon = True
+            thread.start()
+        return self.port
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+
+    def run(self, sock):
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                return  # closed
+
+            try:
+                messages = osc_decode(data)
+            except ValueError:
+                continue
+
+            now = time.time()
+            for address, args in messages:
+                if address == '/sublime/trace' and len(args) >= 3:
+                    self.add(now, args[0], args[1], str(args[2]), args[3:])
+
+    def policy(self, address):
+        policy = self.policies.get(address)
+        if policy is None:
+            traced = ((len(self.include) == 0 or
+                       any(fnmatch.fnmatchcase(address, pattern)
+                           for pattern in self.include)) and
+                      not any(fnmatch.fnmatchcase(address, pattern)
+                              for pattern in self.exclude))
+            sample = next((n for pattern, n in self.sample.items()
+                           if fnmatch.fnmatchcase(address, pattern)), 1)
+            policy = self.policies[address] = (traced, max(1, int(sample)))
+        return policy
+
+    def add(self, now, source_port, port, address, args):
+        with self.lock:
+            self.received += 1
+            stats = self.addresses.get(address)
+            if stats is None:
+                stats = self.addresses[address] = OscAddressStats(now)
+            if now - stats.window_start >= 1:
+                stats.rate = stats.window_count / (now - stats.window_start)
+                stats.window_start = now
+                stats.window_count = 0
+                stats.window_kept = 0
+            stats.count += 1
+            stats.window_count += 1
+            stats.last = args
+
+            traced, sample = self.policy(address)
+            if not traced:
+                self.filtered += 1
+            elif stats.count % sample != 0:
+                self.sampled_out += 1
+            elif 0 < self.rate_limit <= stats.window_kept:
+                self.limited += 1
+            else:
+                stats.kept += 1
+                stats.window_kept += 1
+                self.kept += 1
+                self.messages.append((now, source_port, port, address, args))
+
+    def render(self, header, messages=OSC_TRACE_VIEW_MESSAGES):
+        """The trace as text: totals, a table of addresses, latest messages"""
+        now = time.time()
+        with self.lock:
+            totals = (self.received, self.kept, len(self.messages),
+                      self.messages.maxlen, self.filtered, self.sampled_out,
+                      self.limited)
+            addresses = [(address, stats.count, stats.kept,
+                          stats.current_rate(now), stats.last)
+                         for address, stats in self.addresses.items()]
+            latest = list(itertools.islice(
+                reversed(self.messages), messages))[::-1]
+
+        lines = [
+            '{}, {:.0f} s'.format(header, now - self.started),
+            '{} received, {} kept ({} in buffer of {}), {} filtered out, '
+            '{} sampled out, {} rate limited'.format(*totals),
+            '',
+            '{:<40} {:>10} {:>10} {:>10}  last arguments'.format(
+                'address', 'received', 'kept', 'per second')
+        ]
+        addresses.sort(key=lambda entry: -entry[1])
+        for address, count, kept, rate, last in addresses:
+            lines.append('{:<40} {:>10} {:>10} {:>10.1f}  {}'.format(
+                address, count, kept, rate, format_osc_args(last)))
+
+        lines.extend(['', 'Latest messages, from port to port:', ''])
+        for received, source_port, port, address, args in latest:
+            lines.append('{}.{:03d}  {:>5} > {:<5}  {} {}'.format(
+                time.strftime('%H:%M:%S', time.localtime(received)),
+                int(received * 1000) % 1000, source_port, port, address,
+                format_osc_args(args)))
+        return '\n'.join(lines) + '\n'
+
+
+def format_osc_args(args):
+    if args is None:
+        return ''
+    return ' '.join('<{} bytes>'.format(len(arg)) if isinstance(arg, bytes)
+                    else '{:g}'.format(arg) if isinstance(arg, float)
+                    else str(arg) for arg in args)
 
 # ==============================================================================
 # Commands
@@ -382,16 +4585,37 @@ Please check the *sc_path* setting in your SuperCollider package settings"""
 # ------------------------------------------------------------------------------
 
 
-class SuperColliderAliveAbstract():
+class SuperColliderInstanceAbstract():
+    """Commands act on the sclang instance of their view or window"""
+
+    @property
+    def sc(self):
+        return instances.get(view=getattr(self, 'view', None),
+                             window=getattr(self, 'window', None))
+
+    @property
+    def existing_sc(self):
+        # the instance if it was created already, for is_enabled: drawing a
+        # menu must not start building instances
+        if instances is None:
+            return None
+        return instances.get(view=getattr(self, 'view', None),
+                             window=getattr(self, 'window', None),
+                             create=False)
+
+
+class SuperColliderAliveAbstract(SuperColliderInstanceAbstract):
 
     def is_enabled(self):
-        return sc.is_alive()
+        sc = self.existing_sc
+        return sc is not None and sc.is_running()
 
 
-class SuperColliderDeadAbstract():
+class SuperColliderDeadAbstract(SuperColliderInstanceAbstract):
 
     def is_enabled(self):
-        return not sc.is_alive()
+        sc = self.existing_sc
+        return sc is None or not sc.is_running()
 
 # ------------------------------------------------------------------------------
 # Interpreter Commands
@@ -402,15 +4626,25 @@ class SuperColliderStartInterpreterCommand(SuperColliderDeadAbstract,
                                            sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.start()
-        sc.open_post_view()
+        self.sc.start()
+        self.sc.open_post_view()
 
 
 class SuperColliderStopInterpreterCommand(SuperColliderAliveAbstract,
                                           sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.stop()
+        self.sc.stop()
+
+
+class SuperColliderRestartInterpreterCommand(
+        SuperColliderInstanceAbstract, sublime_plugin.ApplicationCommand):
+
+    def run(self):
+        sc = self.sc
+        sc.restart()
+        if not sc.has_post_view():
+            sc.open_post_view()
 
 
 class SuperColliderEvaluateCommand(SuperColliderAliveAbstract,
@@ -420,50 +4654,53 @@ class SuperColliderEvaluateCommand(SuperColliderAliveAbstract,
     HIGHLIGHT_SCOPE = 'supercollider-eval'
 
     def expand_selections(self):
-        reached_limit = False
-        expanded = False
-        # expand selection to brackets until the selections are the same as
-        # the previous selections (no further expansion possible)
-        while not reached_limit:
-            old = list(
-                map(lambda s: sublime.Region(s.a, s.b), self.view.sel()))
-
-            # nested selections get merged by this, so number of selections can
-            # get reduced
-            self.view.run_command('expand_selection', {'to': 'brackets'})
-
-            reached_limit = all(s.a == old[i].a and s.b == old[i].b
-                                for i, s, in enumerate(self.view.sel()))
-
-            if not reached_limit:
-                expanded = True
-
-        # if we expanded, expand further to whole line, makes it possible
-        # to execute blocks without surrouding with parenthesis
-        if expanded:
-            self.view.run_command('expand_selection', {'to': 'line'})
-
-    def run(self, edit, expand=False, all=False):
-
-        # store selection for later restoration
-        prev = []
+        # expand each selection to the outermost block containing it, then to
+        # whole lines, makes it possible to execute blocks without surrounding
+        # them with parentheses
+        index = get_block_index(self.view)
+        expanded = []
         for sel in self.view.sel():
-            prev.append(sel)
-
+            block = index.find(sel.begin(), sel.end())
+            if block is not None:
+                expanded.append(sublime.Region(
+                    self.view.line(block[0]).a,
+                    self.view.line(max(block[0], block[1] - 1)).b))
+
+        # overlapping selections get merged when added
+        for region in expanded:
+            self.view.sel().add(region)
+
+    def selected_regions(self, expand, all):
+        # the regions to execute, selections are changed to match them
         if all == 'True':
             self.view.sel().add(sublime.Region(0, self.view.size()))
         elif expand == 'True':
             self.expand_selections()
 
+        regions = []
         for sel in self.view.sel():
             # 'selection' is a single point
             if sel.a == sel.b:
                 sel = self.view.line(sel)
                 self.view.sel().add(sel)
 
-            sc.execute(self.view.substr(sel))
+            regions.append(sel)
+        return regions
+
+    def run(self, edit, expand=False, all=False):
+
+        # store selection for later restoration
+        prev = []
+        for sel in self.view.sel():
+            prev.append(sel)
 
-        # highlight
+        cmds = [self.view.substr(region)
+                for region in self.selected_regions(expand, all)]
+
+        self.sc.evaluate_batch(cmds)
+        self.highlight(prev)
+
+    def highlight(self, prev):
         self.view.add_regions(self.HIGHLIGHT_KEY,
                               self.view.sel(),
                               self.HIGHLIGHT_SCOPE,
@@ -478,59 +4715,211 @@ class SuperColliderEvaluateCommand(SuperColliderAliveAbstract,
                             500)
 
 
+class SuperColliderClearSynthDefCacheCommand(SuperColliderInstanceAbstract,
+                                             sublime_plugin.ApplicationCommand):
+
+    def run(self):
+        count = self.sc.synthdef_cache.clear()
+        sublime.status_message(
+            'SuperCollider: {} cached SynthDefs deleted'.format(count))
+
+
+class SuperColliderBenchmarkSelectionCommand(SuperColliderEvaluateCommand):
+    """Times each selected block in sclang, shows statistics and history"""
+
+    def block_key(self, region):
+        # file and first line, stays the same while the block is edited
+        row = self.view.rowcol(region.begin())[0]
+        lines = [line.strip() for line in self.view.substr(region).split('\n')]
+        first = next((line for line in lines if line.strip('( ')), '')
+        name = (self.view.file_name() or self.view.name() or
+                'untitled {}'.format(self.view.buffer_id()))
+        return '{}\n{}'.format(name, first), '{}:{}  {}'.format(
+            os.path.basename(name), row + 1, first[:60])
+
+    def run(self, edit, expand='True', all=False):
+        prev = []
+        for sel in self.view.sel():
+            prev.append(sel)
+
+        sc = self.sc
+        window = self.view.window() or sublime.active_window()
+        reports = []
+
+        def on_done(key, label, code, times):
+            history = benchmarks.add(key, code, benchmark_stats(times),
+                                     sc.benchmark_history)
+            reports.append(render_benchmark(label, history,
+                                            sc.benchmark_warmup,
+                                            sc.benchmark_regression))
+            panel = window.get_output_panel(BENCHMARK_PANEL_NAME)
+            panel.run_command('super_collider_replace_content', {
+                'content': '\n'.join(reports)
+            })
+            window.run_command('show_panel', {
+                'panel': 'output.{}'.format(BENCHMARK_PANEL_NAME)
+            })
+            previous = history[1] if len(history) > 1 else None
+            change = benchmark_change(history[0], previous)
+            if change is not None and change > sc.benchmark_regression:
+                sublime.status_message(
+                    'SuperCollider: {} is {:.0f}% slower'.format(
+                        label.split('  ')[0], change * 100))
+
+        for region in self.selected_regions(expand, all):
+            code = self.view.substr(region)
+            key, label = self.block_key(region)
+            sc.benchmark(code, lambda times, key=key, label=label, code=code:
+                         on_done(key, label, code, times))
+
+        self.highlight(prev)
+        sublime.status_message('SuperCollider: benchmarking...')
+
+
 class SuperColliderStopCommand(SuperColliderAliveAbstract,
                                sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('CmdPeriod.run;')
+        self.sc.execute_control('CmdPeriod.run;', urgent=True)
 
 
 class SuperColliderRecompileCommand(SuperColliderAliveAbstract,
                                     sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('\x18')
+        self.sc.recompile()
 
 
 class SuperColliderToggleTraceOsc(SuperColliderAliveAbstract,
                                   sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.tracing_osc = not sc.tracing_osc
-        enable = 'true' if sc.tracing_osc else 'false'
-        sc.execute_silently('OSCFunc.trace({}, false);'.format(enable))
-        msg = 'Tracing OSC' if sc.tracing_osc else 'Stopped tracing OSC'
-        sc.execute('"{}".postln;'.format(msg))
+        sc = self.sc
+        if sc.osc_trace_to_post_view:
+            sc.tracing_osc = not sc.tracing_osc
+            enable = 'true' if sc.tracing_osc else 'false'
+            sc.execute_silently('OSCFunc.trace({}, false);'.format(enable))
+            msg = 'Tracing OSC' if sc.tracing_osc else 'Stopped tracing OSC'
+            sc.execute('"{}".postln;'.format(msg))
+        elif sc.tracing_osc:
+            sc.stop_osc_trace()
+        else:
+            sc.start_osc_trace()
+
+
+class SuperColliderShowOscTraceCommand(SuperColliderInstanceAbstract,
+                                       sublime_plugin.ApplicationCommand):
+
+    def is_enabled(self):
+        sc = self.existing_sc
+        return sc is not None and (sc.tracing_osc or
+                                   sc.osc_trace.received > 0)
+
+    def run(self):
+        self.sc.open_osc_trace_view()
 
 # ------------------------------------------------------------------------------
 # Post View Commands
 # ------------------------------------------------------------------------------
 
 
-class SuperColliderUpdatePostViewCommand(SuperColliderAliveAbstract,
-                                         sublime_plugin.TextCommand):
-    update_count = 0
-    update_every = 20
+class SuperColliderReplaceContentCommand(sublime_plugin.TextCommand):
+
+    def run(self, edit, content):
+        self.view.replace(edit, sublime.Region(0, self.view.size()), content)
+
+
+class SuperColliderUpdatePostViewCommand(sublime_plugin.TextCommand):
+    # not an alive command: output still arrives after sclang has exited
     inf = float('inf')
     # updating and re-using regions is more performant than creating on the fly
-    all_region = sublime.Region(0, 0)
     erase_region = sublime.Region(0, 0)
+    # line accounting per post view buffer, shared by clones of the view
+    buffer_lines = {}
+    # serials of the records marked per buffer and kind, in region order
+    buffer_records = {}
+    record_scopes = {'error': 'invalid', 'warning': 'invalid.deprecated'}
+    record_icons = {'error': 'circle', 'warning': 'dot'}
 
     def view_is_at_bottom(self):
         return self.view.visible_region().b + 100 > self.view.size()
 
-    def run(self, edit, content, max_lines=-1, force_scroll=False):
+    def get_lines(self, size):
+        lines = self.buffer_lines.get(self.view.buffer_id())
+        if lines is None:
+            lines = PostViewLines()
+            self.buffer_lines[self.view.buffer_id()] = lines
+
+        # the buffer was changed behind our back (cleared, edited by hand)
+        if lines.size != size:
+            lines.reset(self.view.substr(sublime.Region(0, size)))
+
+        return lines
+
+    @staticmethod
+    def record_key(kind):
+        return 'supercollider-{}'.format(kind)
+
+    @classmethod
+    def find_record(cls, view, record):
+        """The region of record in view, None if it isn't there (anymore)"""
+        serials = cls.buffer_records.get(view.buffer_id(), {}).get(
+            record.kind, [])
+        i = bisect.bisect_left(serials, record.serial)
+        if i == len(serials) or serials[i] != record.serial:
+            return None
+
+        regions = view.get_regions(cls.record_key(record.kind))
+        if i >= len(regions) or regions[i].empty():
+            return None  # trimmed or cleared
+        return regions[i]
+
+    def mark_records(self, start, marks):
+        records = self.buffer_records.setdefault(self.view.buffer_id(), {})
+        for kind in set(mark[2] for mark in marks):
+            key = self.record_key(kind)
+            regions = self.view.get_regions(key)
+            serials = records.setdefault(kind, [])
+            for offset, length, mark_kind, serial in marks:
+                if mark_kind == kind:
+                    regions.append(sublime.Region(start + offset,
+                                                  start + offset + length))
+                    serials.append(serial)
+
+            # no point in marking more records than are kept
+            excess = len(regions) - OUTPUT_RECORDS_LIMIT
+            if excess > 0:
+                del regions[:excess]
+                del serials[:excess]
+
+            self.view.add_regions(key, regions, self.record_scopes[kind],
+                                  self.record_icons[kind],
+                                  sublime.DRAW_NO_FILL |
+                                  sublime.DRAW_NO_OUTLINE |
+                                  sublime.DRAW_SOLID_UNDERLINE)
+
+    def run(self, edit, content, max_lines=-1, force_scroll=False,
+            marks=None):
         scroll = self.view_is_at_bottom()
+        size = self.view.size()
+        lines = self.get_lines(size)
+
         # insert text
-        self.view.insert(edit, self.view.size(), content)
+        self.view.insert(edit, size, content)
+        if self.view.size() - size == len(content):
+            lines.add(content)
+        else:
+            # insert normalised the text, count what actually went in
+            lines.add(self.view.substr(sublime.Region(size, self.view.size())))
+
+        # mark errors and warnings, before erasing moves them
+        if marks:
+            self.mark_records(size, marks)
 
         # erase overspill
-        if max_lines >= 1 and self.update_count == 0:
-            self.all_region.b = self.view.size()
-            all_lines = self.view.lines(self.all_region)
-            total_lines = len(all_lines)
-            if total_lines > max_lines:
-                self.erase_region.b = all_lines[total_lines - max_lines].b + 1
+        if max_lines >= 1:
+            self.erase_region.b = lines.trim(max_lines)
+            if self.erase_region.b > 0:
                 self.view.erase(edit, self.erase_region)
 
         # scroll
@@ -545,21 +4934,127 @@ class SuperColliderUpdatePostViewCommand(SuperColliderAliveAbstract,
                 x = self.view.viewport_position()[0]
                 self.view.set_viewport_position((x, self.inf), False)
 
-        self.update_count = (self.update_count + 1) % self.update_every
+    @classmethod
+    def forget_buffer(cls, buffer_id):
+        cls.buffer_lines.pop(buffer_id, None)
+        cls.buffer_records.pop(buffer_id, None)
 
 
 class SuperColliderOpenPostViewCommand(SuperColliderAliveAbstract,
                                        sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.open_post_view()
+        self.sc.open_post_view()
 
 
 class SuperColliderClearPostViewCommand(SuperColliderAliveAbstract,
                                         sublime_plugin.TextCommand):
 
     def run(self, edit):
-        sc.clear_post_view(edit)
+        self.sc.clear_post_view(edit)
+
+
+class SuperColliderSearchSessionLogCommand(SuperColliderInstanceAbstract,
+                                           sublime_plugin.WindowCommand):
+
+    def is_enabled(self):
+        return instances is not None
+
+    def run(self):
+        self.window.show_input_panel(caption='Search sclang output for',
+                                     initial_text='',
+                                     on_done=self.search,
+                                     on_change=None,
+                                     on_cancel=None)
+
+    def search(self, text):
+        def search():
+            results = self.sc.session_log.search(text)
+            sublime.set_timeout(lambda: self.show(text, results), 0)
+
+        sublime.set_timeout_async(search, 0)
+
+    def show(self, text, results):
+        if len(results) == 0:
+            sublime.status_message('No sclang output matching {}'.format(text))
+            return
+
+        def on_done(i):
+            if i >= 0:
+                path, line, _ = results[i]
+                self.window.open_file('{}:{}'.format(path, line),
+                                      sublime.ENCODED_POSITION)
+
+        self.window.show_quick_panel(
+            [[line.partition('\t')[2], '{} {}'.format(
+                os.path.basename(path), line.partition('\t')[0])]
+             for path, _, line in results],
+            on_done)
+
+
+class SuperColliderNextErrorCommand(SuperColliderInstanceAbstract,
+                                    sublime_plugin.WindowCommand):
+
+    def is_enabled(self):
+        sc = self.existing_sc
+        return sc is not None and len(sc.output_records) > 0
+
+    def run(self, forward=True):
+        record = self.sc.next_output_record(forward)
+        if record is None:
+            sublime.status_message('No sclang errors or warnings')
+            return
+
+        sublime.status_message(record.message)
+
+        # class library errors point at a file
+        if record.file is not None and os.path.isfile(record.file):
+            self.window.open_file('{}:{}:{}'.format(record.file,
+                                                    record.line or 1,
+                                                    record.column or 1),
+                                  sublime.ENCODED_POSITION)
+            return
+
+        # interpreted code, show the error in the post view
+        if not self.sc.has_post_view():
+            return
+        view = self.sc.post_view
+        region = SuperColliderUpdatePostViewCommand.find_record(view, record)
+        if region is None:
+            return
+
+        if view.window() is None:
+            self.window.run_command('show_panel', {
+                'panel': 'output.{}'.format(self.sc.post_view_name)
+            })
+        else:
+            view.window().focus_view(view)
+        view.sel().clear()
+        view.sel().add(region)
+        view.show_at_center(region)
+
+
+class SuperColliderDumpMetricsCommand(SuperColliderInstanceAbstract,
+                                      sublime_plugin.WindowCommand):
+
+    def is_enabled(self):
+        return instances is not None
+
+    def run(self):
+        path = os.path.join(
+            sublime.cache_path(), 'SuperCollider', 'metrics',
+            time.strftime('metrics-%Y%m%d-%H%M%S.json'))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as file:
+                json.dump(self.sc.metrics.snapshot(), file, indent=4,
+                          sort_keys=True)
+        except OSError as error:
+            sublime.error_message(
+                'Could not write metrics to {}: {}'.format(path, error))
+            return
+
+        self.window.open_file(path)
 
 
 class SuperColliderCloseInactivePostsCommand(sublime_plugin.ApplicationCommand):
@@ -568,14 +5063,46 @@ class SuperColliderCloseInactivePostsCommand(sublime_plugin.ApplicationCommand):
         active_window = sublime.active_window()
         active_view = active_window.active_view()
 
+        names = set(instance.inactive_post_view_name
+                    for instance in instances.all())
         for window in sublime.windows():
             for view in window.views():
-                if view.name() == sc.inactive_post_view_name:
+                if view.name() in names:
                     view.window().focus_view(view)
                     view.window().run_command('close_file')
 
         active_window.focus_view(active_view)
 
+
+class SuperColliderListInstancesCommand(sublime_plugin.WindowCommand):
+
+    def is_enabled(self):
+        return instances is not None
+
+    def run(self):
+        instances.prune()
+        # the instance of this window is listed even if it is not started
+        instances.get(window=self.window)
+        listed = instances.all()
+
+        def on_done(i):
+            if i < 0:
+                return
+            sc = listed[i]
+            if not sc.is_alive():
+                sc.start()
+                sc.open_post_view()
+            elif sc.has_post_view() and sc.post_view.window() is not None:
+                sc.post_view.window().focus_view(sc.post_view)
+            else:
+                sc.open_post_view()
+
+        self.window.show_quick_panel(
+            [[sc.name or 'default', '{} - {}'.format(
+                sc.describe(), os.path.join(sc.sc_dir, sc.sc_exe))]
+             for sc in listed],
+            on_done)
+
 # ------------------------------------------------------------------------------
 # Server Commands
 # ------------------------------------------------------------------------------
@@ -585,63 +5112,65 @@ class SuperColliderBootServerCommand(SuperColliderAliveAbstract,
                                      sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('Server.default.boot;')
+        self.sc.execute_control('Server.default.boot;')
 
 
 class SuperColliderKillServerCommand(SuperColliderAliveAbstract,
                                      sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('"Server killed".postln; Server.default.quit;')
+        self.sc.execute_control('"Server killed".postln; Server.default.quit;')
 
 
 class SuperColliderKillAllServersCommand(SuperColliderAliveAbstract,
                                          sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('"All servers killed".postln; Server.killAll;')
+        self.sc.execute_control(
+            '"All servers killed".postln; Server.killAll;', urgent=True)
 
 
 class SuperColliderRebootServerCommand(SuperColliderAliveAbstract,
                                        sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('"Server rebooted".postln; Server.default.reboot;')
+        self.sc.execute_control(
+            '"Server rebooted".postln; Server.default.reboot;')
 
 
 class SuperColliderShowServerMeterCommand(SuperColliderAliveAbstract,
                                           sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('Server.default.meter;')
+        self.sc.execute('Server.default.meter;')
 
 
 class SuperColliderShowServerWindowCommand(SuperColliderAliveAbstract,
                                            sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('Server.default.makeWindow;')
+        self.sc.execute('Server.default.makeWindow;')
 
 
 class SuperColliderShowServerScopeCommand(SuperColliderAliveAbstract,
                                           sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('Server.default.scope;')
+        self.sc.execute('Server.default.scope;')
 
 
 class SuperColliderShowServerFreqScopeCommand(SuperColliderAliveAbstract,
                                               sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute('Server.default.freqscope;')
+        self.sc.execute('Server.default.freqscope;')
 
 
 class SuperColliderToggleMute(SuperColliderAliveAbstract,
                               sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute_silently('''
+        self.sc.execute_control('''
             if (Server.default.volume.isMuted) {
                 Server.default.unmute();
                 "Server unmuted".postln;
@@ -649,17 +5178,17 @@ class SuperColliderToggleMute(SuperColliderAliveAbstract,
                 Server.default.mute();
                 "Server muted".postln;
             };
-        ''')
+        ''', True, True)
 
 
 class SuperColliderChangeVolume(SuperColliderAliveAbstract,
                                 sublime_plugin.ApplicationCommand):
 
     def run(self, change):
-        sc.execute_silently('''
+        self.sc.execute_control('''
             s.volume.volume_({});
             ("Server volume:" + s.volume.volume).postln;
-        '''.format(change))
+        '''.format(change), True)
 
 
 class SuperColliderIncreaseVolume(SuperColliderChangeVolume):
@@ -687,14 +5216,85 @@ class SuperColliderStartRecording(SuperColliderAliveAbstract,
                                   sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute_silently('Server.default.record;')
+        self.sc.execute_control('Server.default.record;', True)
 
 
 class SuperColliderStopRecording(SuperColliderAliveAbstract,
                                  sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute_silently('Server.default.stopRecording;')
+        self.sc.execute_control('Server.default.stopRecording;', True)
+
+# ------------------------------------------------------------------------------
+# Symbol Commands
+# ------------------------------------------------------------------------------
+
+
+def open_definitions(window, definitions):
+    # opens the only definition, or lets the user pick one
+    def open_definition(i):
+        if i >= 0:
+            name, kind, path, line, column = definitions[i]
+            window.open_file('{}:{}:{}'.format(path, line, column),
+                             sublime.ENCODED_POSITION)
+
+    if len(definitions) == 1:
+        open_definition(0)
+    elif len(definitions) > 1:
+        window.show_quick_panel(
+            [['{} \\{}'.format(kind, name),
+              '{}:{}'.format(path, line)]
+             for name, kind, path, line, column in definitions],
+            open_definition)
+
+
+class SuperColliderGotoDefinitionCommand(sublime_plugin.WindowCommand):
+
+    def symbol_at_cursor(self):
+        view = self.window.active_view()
+        if view is None or len(view.sel()) == 0:
+            return None
+        word = view.substr(view.word(view.sel()[0]))
+        return word.strip().strip('\\\'') or None
+
+    def is_enabled(self):
+        return symbols is not None
+
+    def run(self):
+        name = self.symbol_at_cursor()
+        if name is None:
+            return
+
+        def find():
+            # saved files are indexed as they are saved, the folders are only
+            # scanned again for a name that isn't found
+            definitions = symbols.find(name)
+            if len(definitions) == 0:
+                symbols.refresh(self.window.folders())
+                definitions = symbols.find(name)
+            if len(definitions) == 0:
+                sublime.status_message(
+                    'No SynthDef, Pdef, Ndef or Tdef named {}'.format(name))
+            else:
+                sublime.set_timeout(
+                    lambda: open_definitions(self.window, definitions), 0)
+
+        sublime.set_timeout_async(find, 0)
+
+
+class SuperColliderGotoSymbolInProjectCommand(sublime_plugin.WindowCommand):
+
+    def is_enabled(self):
+        return symbols is not None
+
+    def run(self):
+        def find():
+            symbols.refresh(self.window.folders())
+            definitions = symbols.all_definitions()
+            sublime.set_timeout(
+                lambda: open_definitions(self.window, definitions), 0)
+
+        sublime.set_timeout_async(find, 0)
 
 # ------------------------------------------------------------------------------
 # Open/Info Commands
@@ -721,30 +5321,167 @@ class SuperColliderOpenClassCommand(SuperColliderAliveAbstract,
 
     def run(self):
         super(SuperColliderOpenClassCommand, self).run('Open Class File for',
-                                                       sc.open_class)
+                                                       self.sc.open_class)
 
 
 class SuperColliderOpenUserSupportDirCommand(SuperColliderAliveAbstract,
                                              sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute_flagged('open_dir', 'Platform.userConfigDir')
+        self.sc.request('Platform.userConfigDir', self.sc.open_dir)
 
 
 class SuperColliderOpenStartupFileCommand(SuperColliderAliveAbstract,
                                           sublime_plugin.ApplicationCommand):
 
     def run(self):
-        sc.execute_flagged('open_startup_file',
-                           'Platform.userConfigDir +/+ "startup.scd"')
-
-
-class SuperColliderHelpCommand(SuperColliderAliveAbstract,
+        self.sc.request('Platform.userConfigDir +/+ "startup.scd"',
+                        lambda path: self.sc.open_file(path, True))
+
+
+def show_help(window, path, method=None):
+    # renders a help file into the help panel, scrolled to method
+    try:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            text = render_help(file.read())
+    except OSError as error:
+        sublime.status_message('Could not open {}: {}'.format(path, error))
+        return
+
+    panel = window.get_output_panel(HELP_PANEL_NAME)
+    panel.run_command('select_all')
+    panel.run_command('right_delete')
+    panel.run_command('append', {'characters': text})
+    window.run_command('show_panel', {
+        'panel': 'output.{}'.format(HELP_PANEL_NAME)
+    })
+
+    point = 0
+    if method is not None:
+        match = re.search(r'^[*-]{}\b'.format(re.escape(method)), text, re.M)
+        if match is None:
+            match = re.search(r'(^|[ ,])[*-]{}\b'.format(re.escape(method)),
+                              text, re.M)
+        if match is not None:
+            point = match.start()
+    panel.show_at_center(point)
+
+
+def choose_help(window, found):
+    # shows the only match, or lets the user pick one
+    def on_done(i):
+        if i >= 0:
+            show_help(window, *found[i])
+
+    if len(found) == 1:
+        on_done(0)
+    else:
+        window.show_quick_panel(
+            [[help_index.get(path)['title'] +
+              ('.' + method if method else ''),
+              help_index.get(path)['summary']] for path, method in found],
+            on_done)
+
+
+class SuperColliderHelpCommand(SuperColliderInstanceAbstract,
                                SuperColliderSelectionOrInputAbstract):
+    """Help from the local help index, or sclang's help browser"""
+
+    def is_enabled(self):
+        sc = self.existing_sc
+        return ((help_index is not None and len(help_index) > 0) or
+                (sc is not None and sc.is_running()))
 
     def run(self):
         super(SuperColliderHelpCommand, self).run(
-            'Open Help for', sc.open_help)
+            'Open Help for', self.open_help)
+
+    def open_help(self, word):
+        found = help_index.find(word) if help_index is not None else []
+        if len(found) > 0:
+            choose_help(self.window, found)
+        elif self.sc.is_running():
+            self.sc.open_help(word)
+        else:
+            sublime.status_message('No help found for {}'.format(word))
+
+
+class SuperColliderSearchHelpCommand(sublime_plugin.WindowCommand):
+
+    def is_enabled(self):
+        return help_index is not None
+
+    def run(self):
+        if time.time() - help_index.refreshed > HELP_INDEX_REFRESH_S:
+            sublime.set_timeout_async(refresh_help_index, 0)
+
+        self.window.show_input_panel(caption='Search help for',
+                                     initial_text='',
+                                     on_done=self.search,
+                                     on_change=None,
+                                     on_cancel=None)
+
+    def search(self, text):
+        paths = help_index.search(text)
+        if len(paths) == 0:
+            sublime.status_message('No help matching {}'.format(text))
+            return
+
+        def on_done(i):
+            if i >= 0:
+                show_help(self.window, paths[i])
+
+        docs = [help_index.get(path) for path in paths]
+        self.window.show_quick_panel(
+            [[doc['title'], doc['summary'] or doc['kind']] for doc in docs],
+            on_done)
+
+
+class SuperColliderShowHelpPopupCommand(sublime_plugin.TextCommand):
+    """Summary of the class or method at the cursor in a popup"""
+
+    def is_enabled(self):
+        return help_index is not None and len(help_index) > 0
+
+    def word_at_cursor(self):
+        # 'SinOsc', 'ar' or 'SinOsc.ar', when the cursor is on 'ar'
+        region = self.view.word(self.view.sel()[0])
+        word = self.view.substr(region).strip()
+        line = self.view.substr(
+            sublime.Region(self.view.line(region).a, region.a))
+        receiver = re.search(r'([A-Z][A-Za-z0-9_]*)\.$', line)
+        if receiver is not None:
+            return '{}.{}'.format(receiver.group(1), word)
+        return word
+
+    def run(self, edit):
+        if len(self.view.sel()) == 0:
+            return
+        word = self.word_at_cursor()
+        found = help_index.find(word)
+        if len(found) == 0 and '.' in word:
+            found = help_index.find(word.partition('.')[2])
+        if len(found) == 0:
+            sublime.status_message('No help found for {}'.format(word))
+            return
+
+        items = []
+        for i, (path, method) in enumerate(found[:10]):
+            doc = help_index.get(path)
+            title = html.escape(doc['title'])
+            if method is not None:
+                signature = next(('{}{}({})'.format(kind, name,
+                                                    ', '.join(args))
+                                  for name, kind, args in doc['methods']
+                                  if name == method), method)
+                title += html.escape(signature)
+            items.append('<p><a href="{}"><b>{}</b></a><br>{}</p>'.format(
+                i, title, html.escape(doc['summary'])))
+
+        window = self.view.window()
+        self.view.show_popup(
+            ''.join(items), location=-1, max_width=640,
+            on_navigate=lambda i: show_help(window, *found[int(i)]))
 
 
 class SuperColliderDumpInterfaceCommand(SuperColliderAliveAbstract,
@@ -752,21 +5489,27 @@ class SuperColliderDumpInterfaceCommand(SuperColliderAliveAbstract,
 
     def run(self):
         cmd = '''
+            var out = List[];
             (
                 "Class":    {0}.class,
                 "Instance": {0}
             ).keysValuesDo {{ |type, class|
                 if(class.methods.notNil) {{
-                    ("="!80).join.postln;
-                    (type + "Methods:").postln;
-                    ("="!80).join.postln;
-                    class.dumpInterface;
+                    out.add(("="!80).join);
+                    out.add(type + "Methods:");
+                    out.add(("="!80).join);
+                    class.methods.do {{ |method|
+                        out.add("   " ++ method.name ++ " ( "
+                            ++ (method.argNames ? #[]).drop(1).join(", ")
+                            ++ " )");
+                    }};
                 }};
             }};
+            out.join("\\n");
         '''
         super(SuperColliderDumpInterfaceCommand, self).run(
             'Dump interface for',
-            lambda x: sc.execute_silently(cmd.format(x)))
+            lambda x: self.sc.request(cmd.format(x), self.sc.show_info))
 
 
 class SuperColliderDumpFullInterfaceCommand(SuperColliderAliveAbstract,
@@ -775,7 +5518,8 @@ class SuperColliderDumpFullInterfaceCommand(SuperColliderAliveAbstract,
     def run(self):
         super(SuperColliderDumpFullInterfaceCommand, self).run(
             'Dump full interface for',
-            lambda x: sc.execute_silently('{}.dumpFullInterface;'.format(x)))
+            lambda x: self.sc.execute_silently(
+                '{}.dumpFullInterface;'.format(x)))
 
 
 class SuperColliderGetMethodArgs(SuperColliderAliveAbstract,
@@ -783,17 +5527,23 @@ class SuperColliderGetMethodArgs(SuperColliderAliveAbstract,
 
     def callback(self, c):
         action = '''
-        "{0}:{1}: ".post;
-        {0}.findRespondingMethodFor(\\{1}).argNames
+        "{0}:{1}: " ++ {0}.findRespondingMethodFor(\\{1}).argNames
                                         .asString
                                         .replace("SymbolArray", "")
                                         .replace("this, ", "")
-                                        .replace("this", "")
-                                        .postln;
+                                        .replace("this", "");
         '''
+
+        def get_args(x):
+            found = self.sc.class_index.find_method(c, x, True)
+            if found is None:
+                self.sc.request(action.format(c, x), self.sc.show_info)
+            else:
+                self.sc.show_info('{}:{}: {}'.format(
+                    c, x, self.sc.class_index.format_args(found[1])))
+
         super(SuperColliderGetMethodArgs, self).run(
-            "Get arguments for {}'s Method".format(c),
-            lambda x: sc.execute_silently(action.format(c, x)))
+            "Get arguments for {}'s Method".format(c), get_args)
 
     def run(self):
         super(SuperColliderGetMethodArgs, self).run(
@@ -806,37 +5556,132 @@ class SuperColliderGetUgenArgs(SuperColliderAliveAbstract,
 
     def run(self):
         action = '''
+        var out = List[];
         {0}.class.methods.do {{|item, i|
             if (item.name != 'categories') {{
-                ("{0}:" ++ item.name ++ ": ").post;
-                {0}.class.findRespondingMethodFor(item.name)
-                    .argNames
-                    .asString
-                    .replace("SymbolArray", "")
-                    .replace("this, ", "")
-                    .postln;
+                out.add("{0}:" ++ item.name ++ ": " ++
+                    {0}.class.findRespondingMethodFor(item.name)
+                        .argNames
+                        .asString
+                        .replace("SymbolArray", "")
+                        .replace("this, ", ""));
             }}
         }} ?? {{
-            "UGen may get all methods from a superclass, try one of: ".post;
-            {0}.superclasses.asString.replace("class ", "").postln;
+            out.add("UGen may get all methods from a superclass, try one of: "
+                ++ {0}.superclasses.asString.replace("class ", ""));
         }};
+        out.join("\\n");
         '''
 
+        def get_args(ugen):
+            entry = self.sc.class_index.get(ugen)
+            if entry is None:
+                self.sc.request(action.format(ugen), self.sc.show_info)
+                return
+
+            lines = ['{}:{}: {}'.format(ugen, method,
+                                        self.sc.class_index.format_args(args))
+                     for method, args in sorted(entry['class_methods'].items())
+                     if method != 'categories']
+            if len(lines) == 0:
+                superclasses = []
+                name = entry['superclass']
+                while name is not None and name in self.sc.class_index.classes:
+                    superclasses.append(name)
+                    name = self.sc.class_index.get(name)['superclass']
+                lines.append('UGen may get all methods from a superclass, '
+                             'try one of: [ {} ]'.format(
+                                 ', '.join(superclasses)))
+
+            self.sc.show_info('\n'.join(lines))
+
         super(SuperColliderGetUgenArgs, self).run(
-            'Get arguments for UGen',
-            lambda ugen: sc.execute_silently(action.format(ugen)))
+            'Get arguments for UGen', get_args)
 
 
 # ==============================================================================
 # Event Listener
 # ==============================================================================
 class SuperColliderListener(sublime_plugin.EventListener):
+    # receiver before a '.', e.g. 'SinOsc.'
+    receiver_re = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\.$')
+    # call before an open paren, e.g. 'SinOsc.ar(' or 'SinOsc('
+    call_re = re.compile(
+        r'(?<![A-Za-z0-9_])([A-Z][A-Za-z0-9_]*)(?:\.([a-z][A-Za-z0-9_]*))?$')
+
+    def on_activated(self, view):
+        # statuses of the view's instance, set while another view was active
+        window = view.window()
+        if instances is None or window is None:
+            return
+        sc = instances.get(window=window, create=False)
+        if sc is not None:
+            sc.apply_statuses(view)
+
+    def on_query_completions(self, view, prefix, locations):
+        if instances is None or instances.completions.index is None:
+            return None
+        if not view.match_selector(locations[0], 'source.supercollider'):
+            return None
+
+        start = locations[0] - len(prefix)
+        line = view.substr(sublime.Region(view.line(start).a, start))
+
+        if line.endswith('.'):
+            receiver = self.receiver_re.search(line)
+            class_name = None
+            if receiver is not None and receiver.group(1)[0].isupper():
+                class_name = receiver.group(1)
+            return instances.completions.search_methods(prefix, class_name)
+
+        if prefix[:1].isupper():
+            return instances.completions.search_classes(prefix)
+
+        call = self.find_call(line)
+        if call is not None:
+            return instances.completions.search_args(prefix, *call)
+
+        return None
+
+    def find_call(self, line):
+        # find the innermost unclosed paren on the line and the call before it
+        depth = 0
+        for i in range(len(line) - 1, -1, -1):
+            char = line[i]
+            if char in ')]}':
+                depth += 1
+            elif char in '([{':
+                if depth == 0:
+                    if char != '(':
+                        return None
+                    match = self.call_re.search(line, 0, i)
+                    if match is None:
+                        return None
+                    return match.group(1), match.group(2) or 'new'
+                depth -= 1
+
+        return None
 
     def on_close(self, view):
-        if sc is None:
-            return
-        if view.buffer_id() != sc.post_view_buffer_id():
+        if not self.buffer_is_open(view):
+            SuperColliderUpdatePostViewCommand.forget_buffer(view.buffer_id())
+            block_indexes.pop(view.buffer_id(), None)
+
+        if instances is None:
             return
+        for sc in instances.all():
+            if view.buffer_id() == sc.post_view_buffer_id():
+                self.close_post_view(sc, view)
+                return
+
+    def buffer_is_open(self, view):
+        # whether other views (clones) still show the buffer of view
+        return any(other.buffer_id() == view.buffer_id() and
+                   other.id() != view.id()
+                   for window in sublime.windows()
+                   for other in window.views())
+
+    def close_post_view(self, sc, view):
         if sc.post_view_visible():
             if view.id() == sc.post_view.id():
                 sc.set_post_view(
@@ -844,14 +5689,32 @@ class SuperColliderListener(sublime_plugin.EventListener):
                          in sc.get_all_post_views()
                          if view.buffer_id() == sc.post_view_buffer_id()))
         else:
-            sc.cache_post_view(view.substr(sublime.Region(0, view.size())))
+            sc.cache_post_view(view)
             sc.remove_post_view()
 
+    def on_post_save_async(self, view):
+        if (symbols is not None and view.file_name() is not None and
+                view.file_name().endswith(SOURCE_EXTENSIONS)):
+            if symbols.index_file(view.file_name()):
+                symbols.save()
+
     def on_window_command(self, window, command_name, args):
+        # Goto Definition on a known SynthDef/Pdef/Ndef/Tdef name
+        if command_name == 'goto_definition' and symbols is not None:
+            view = window.active_view()
+            if (view is not None and len(view.sel()) > 0 and
+                    view.match_selector(view.sel()[0].b,
+                                        'source.supercollider')):
+                word = view.substr(view.word(view.sel()[0]))
+                if len(symbols.find(word.strip().strip('\\\''))) > 0:
+                    return ('super_collider_goto_definition', {})
+
+        if instances is None:
+            return
+        sc = instances.get(window=window, create=False)
         if sc is None or not sc.has_post_view() or window is not sc.post_view:
             return
 
         if command_name == 'hide_panel':
-            value = sc.post_view.substr(sublime.Region(0, sc.post_view.size()))
-            sc.cache_post_view(value)
+            sc.cache_post_view(sc.post_view)
             sc.panel_open = False
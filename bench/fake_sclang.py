@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Stands in for sclang in the benchmarks
+
+    fake_sclang.py [-i sublime] [--compile-seconds SECONDS]
+                   [--synthdef-ms MS] [--stdin-rate BYTES]
+
+Reads code terminated by \\x0c (posts the result) or \\x1b (silent) from stdin
+like sclang does, at most BYTES per second if given, and understands just
+enough of it:
+
+- compiling the class library, at startup and on \\x18, takes SECONDS,
+  0 by default, then posts the welcome message
+- requests wrapped by the plugin's REQUEST_TEMPLATE are answered with a
+  flagged reply, the result is the string literal in the request, if any,
+  or an error when it is just Error("message").throw
+- flood(lines, size, repeated, rate) posts lines of size characters, all
+  the same line if repeated, as fast as possible or at rate lines per second.
+  Like a Routine, it runs alongside whatever is evaluated next
+- benchmark requests run the benchmarked code: work(ms) in it takes about
+  ms, with some noise, and the measured times are the result
+- every SynthDef(...) takes MS to build, 0 by default. Those stored by the
+  plugin's SynthDef cache are written to its directory with their hash, and
+  reading a cached one into the SynthDescLib takes a twentieth of MS
+- the plugin's control channel request opens its UDP port, code sent there
+  with the right token is evaluated as soon as it arrives, until \\x18
+  recompiles and closes it
+- CmdPeriod.run posts 'CmdPeriod at <time.monotonic()>'
+- hang(seconds) stops reading input for that long, like a busy interpreter
+- trap() makes it ignore 0.exit; and SIGTERM from then on, so it has to be
+  killed
+- 0.exit; exits
+- arguments or variables named after a reserved word, e.g. |arg, i|, or
+  var in parentheses inside a function, e.g. { ( var x; ) }, are a parse
+  error like in sclang: an error is posted and nothing is evaluated
+- code ending with a SynthDef, or with the SynthDesc or SynthDef read from
+  the cache, answers '-> a SynthDef' or '-> a SynthDesc'
+- anything else is echoed as '-> <code>', long code as its size only
+
+Output ends with 'done\\n' after a flood, so the end can be waited for.
+"""
+import random
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+
+REQUEST_RE = re.compile(r'"([^"\s]{1,64}?)rpc\1(\d+) "')
+RESULT_RE = re.compile(r'result = \{\s*"([^"]*)"\s*;?\s*\}\.try', re.S)
+THROW_RE = re.compile(r'result = \{\s*Error\("([^"]*)"\)\.throw')
+HANG_RE = re.compile(r'hang\(([\d.]+)\)')
+BENCHMARK_RE = re.compile(
+    r'(\d+)\.do \{ func\.value \};\s*Array\.fill\((\d+),')
+WORK_RE = re.compile(r'work\(([\d.]+)\)')
+# var declarations are only allowed at the start of a function, not in
+# parentheses inside one
+NESTED_VAR_RE = re.compile(r'\{[^{}]*?\(\s*var\b')
+FLOOD_RE = re.compile(r'flood\((\d+), *(\d+)(?:, *(\d+))?(?:, *(\d+))?\)')
+SYNTHDEF_RE = re.compile(r'\bSynthDef\(')
+STORE_RE = re.compile(r'File\.use\("([^"]*)" \+\+ "([^"]*)\.sha1".*?'
+                      r'file << "([0-9a-f]+)"')
+READ_RE = re.compile(r'\[(.*)\]\.do \{ \|name\|\s*SynthDescLib\.global\.read')
+DESC_AT_RE = re.compile(
+    r"SynthDescLib\.global\.at\('[^']*'\)(\.def)?\s*;?\s*\Z")
+RESERVED = (r'(?:arg|var|classvar|const|this|super|nil|true|false|inf|pi|'
+            r'thisProcess|thisThread|thisMethod|thisFunction|'
+            r'thisFunctionDef)')
+RESERVED_RE = re.compile(r'\|[^|]*\b{0}\s*[,|=]|\bvar\s+(?:[^;]*,\s*)?'
+                         r'{0}\b'.format(RESERVED))
+ECHO_LIMIT = 200
+BATCH_LINES = 1000
+CONTROL_RE = re.compile(
+    r'openUDPPort\((\d+)\).*?msg\[1\]\.asString == "([0-9a-f]+)"', re.S)
+TERMINATOR_RE = re.compile(b'[\x0c\x1b\x18]')
+
+out = sys.stdout.buffer
+out_lock = threading.Lock()
+trapped = False
+synthdef_seconds = 0.0
+control_sockets = []
+
+
+def post(text):
+    with out_lock:
+        out.write(text.encode('utf-8'))
+        out.flush()
+
+
+def flood(lines, size, repeated=0, rate=0):
+    start = time.perf_counter()
+    sent = 0
+    while sent < lines:
+        batch = min(BATCH_LINES, lines - sent)
+        if rate > 0:
+            batch = min(batch, max(1, rate // 100))
+            due = start + sent / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        if repeated:
+            line = 'a Synth(\'default\' : 1000)'
+            text = (line.ljust(size - 1, ' ') + '\n') * batch
+        else:
+            text = ''.join('{:>8} {}\n'.format(
+                sent + i, 'x' * max(0, size - 10)) for i in range(batch))
+        post(text)
+        sent += batch
+
+    post('done\n')
+
+
+def run_benchmark(code, warmup, runs):
+    work = sum(float(ms) for ms in WORK_RE.findall(code)) / 1000
+    times = []
+    for i in range(warmup + runs):
+        start = time.perf_counter()
+        deadline = start + work * random.uniform(0.95, 1.1)
+        while time.perf_counter() < deadline:
+            pass
+        times.append((time.perf_counter() - start) * 1000)
+    return ' '.join(str(ms) for ms in times[warmup:])
+
+
+def osc_strings(data):
+    # the strings of an OSC message like the control channel's
+    strings = []
+    offset = 0
+    while offset < len(data):
+        end = data.index(b'\x00', offset)
+        strings.append(data[offset:end].decode('utf-8', 'replace'))
+        offset = (end + 4) & ~3
+    return strings
+
+
+def control_channel(port, token):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.bind(('127.0.0.1', port))
+    except OSError:
+        return  # taken, by a stand-in of the benchmarks
+    control_sockets.append(sock)
+    while True:
+        try:
+            data = sock.recv(65536)
+        except OSError:
+            data = b''
+        if not data:
+            return  # closed by a recompile
+        try:
+            message = osc_strings(data)
+        except ValueError:
+            continue
+        if message[:3] == ['/sublime/eval', ',ss', token]:
+            interpret(message[3], False)
+
+
+def interpret(code, silent):
+    match = RESERVED_RE.search(code)
+    if match is not None:
+        post('ERROR: syntax error, unexpected {!r}\n'.format(match.group()))
+        return
+    if NESTED_VAR_RE.search(code):
+        post('ERROR: syntax error, unexpected VAR\n')
+        return
+
+    request = REQUEST_RE.search(code)
+    if request is not None:
+        flag, id = request.groups()
+        result = RESULT_RE.search(code)
+        result = result.group(1) if result is not None else ''
+        benchmark = BENCHMARK_RE.search(code)
+        if benchmark is not None:
+            result = run_benchmark(code, *map(int, benchmark.groups()))
+        control = CONTROL_RE.search(code)
+        if control is not None:
+            thread = threading.Thread(target=control_channel, args=(
+                int(control.group(1)), control.group(2)))
+            thread.daemon = True
+            thread.start()
+        status = 'ok'
+        error = THROW_RE.search(code)
+        if error is not None:
+            status = 'error'
+            result = 'ERROR: ' + error.group(1)
+        post('{0}rpc{0}{1} {2} {3}\n{4}\n'.format(
+            flag, id, status, result.count('\n') + 1, result))
+        return
+
+    match = FLOOD_RE.search(code)
+    if match is not None:
+        thread = threading.Thread(
+            target=flood, args=[int(arg or 0) for arg in match.groups()])
+        thread.daemon = True
+        thread.start()
+        return
+
+    match = HANG_RE.search(code)
+    if match is not None:
+        time.sleep(float(match.group(1)))
+        return
+
+    synthdefs = len(SYNTHDEF_RE.findall(code))
+    if synthdefs:
+        time.sleep(synthdefs * synthdef_seconds)
+    for directory, name, digest in STORE_RE.findall(code):
+        with open(directory + name + '.scsyndef', 'wb') as file:
+            file.write(b'SCgf')
+        with open(directory + name + '.sha1', 'w') as file:
+            file.write(digest)
+    match = READ_RE.search(code)
+    if match is not None:
+        time.sleep(match.group(1).count('"') // 2 * synthdef_seconds / 20)
+
+    if re.match(r'\s*trap\(\)', code):
+        global trapped
+        trapped = True
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        return
+
+    if re.match(r'\s*0\.exit', code):
+        if not trapped:
+            sys.exit(0)
+        return
+
+    if 'CmdPeriod.run' in code:
+        post('CmdPeriod at {:.6f}\n'.format(time.monotonic()))
+        return
+
+    if not silent:
+        # code ending with a SynthDef, or a SynthDesc from the cache
+        desc = DESC_AT_RE.search(code)
+        if desc is not None:
+            post('-> a {}\n'.format(
+                'SynthDef' if desc.group(1) else 'SynthDesc'))
+        elif synthdefs:
+            post('-> a SynthDef\n')
+        elif len(code) > ECHO_LIMIT:
+            post('-> a String of size {}\n'.format(len(code)))
+        else:
+            post('-> {}\n'.format(code))
+
+
+def compile_library(seconds):
+    # like OSCdefs, the control channel doesn't survive a recompile
+    while control_sockets:
+        sock = control_sockets.pop()
+        try:
+            # wakes up its thread's recv, though not connected
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+    post('compiling class library...\n')
+    time.sleep(seconds)
+    post('Welcome to SuperCollider (fake)\n')
+
+
+def main():
+    global synthdef_seconds
+    compile_seconds = 0.0
+    if '--compile-seconds' in sys.argv:
+        compile_seconds = float(
+            sys.argv[sys.argv.index('--compile-seconds') + 1])
+    if '--synthdef-ms' in sys.argv:
+        synthdef_seconds = float(
+            sys.argv[sys.argv.index('--synthdef-ms') + 1]) / 1000
+    stdin_rate = 0
+    if '--stdin-rate' in sys.argv:
+        stdin_rate = int(sys.argv[sys.argv.index('--stdin-rate') + 1])
+    compile_library(compile_seconds)
+    buffer = bytearray()
+    input = sys.stdin.buffer
+    while True:
+        data = input.read1(65536)
+        if not data:
+            break
+        if stdin_rate > 0:
+            time.sleep(len(data) / stdin_rate)
+        start = 0
+        for match in TERMINATOR_RE.finditer(data):
+            buffer += data[start:match.start()]
+            if match.group() == b'\x18':
+                compile_library(compile_seconds)
+            else:
+                interpret(buffer.decode('utf-8', 'replace'),
+                          match.group() == b'\x1b')
+            buffer = bytearray()
+            start = match.end()
+        buffer += data[start:]
+
+
+if __name__ == '__main__':
+    main()
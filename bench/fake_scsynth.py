@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Stands in for scsynth in the benchmarks, answering /status over UDP
+
+    python3 bench/fake_scsynth.py [port]
+
+Replies to /status with a /status.reply like scsynth's, wrapped in a bundle
+every other time so both paths of the decoder are used. Everything else is
+ignored.
+"""
+import socket
+import struct
+import sys
+import threading
+
+
+def osc_string(value):
+    data = value.encode('utf-8') + b'\x00'
+    return data + b'\x00' * (-len(data) % 4)
+
+
+def status_reply(ugens, synths, avg_cpu, peak_cpu, sample_rate):
+    return (osc_string('/status.reply') + osc_string(',iiiiiffdd') +
+            struct.pack('>iiiiiffdd', 1, ugens, synths, 2, 100, avg_cpu,
+                        peak_cpu, sample_rate, sample_rate + 0.01))
+
+
+def bundle(message):
+    return (osc_string('#bundle') + struct.pack('>q', 1) +
+            struct.pack('>i', len(message)) + message)
+
+
+class FakeServer():
+
+    def __init__(self, port=0, avg_cpu=3.5, peak_cpu=7.25):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', port))
+        self.port = self.sock.getsockname()[1]
+        self.avg_cpu = avg_cpu
+        self.peak_cpu = peak_cpu
+        self.polls = 0
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+
+    def run(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(65536)
+            except OSError:
+                return  # closed
+            if not data.startswith(osc_string('/status')):
+                continue
+
+            self.polls += 1
+            reply = status_reply(self.polls, 4, self.avg_cpu, self.peak_cpu,
+                                 48000.0)
+            if self.polls % 2 == 0:
+                reply = bundle(reply)
+            try:
+                self.sock.sendto(reply, address)
+            except OSError:
+                return  # closed while replying
+
+
+if __name__ == '__main__':
+    server = FakeServer(int(sys.argv[1]) if len(sys.argv) > 1 else 57110)
+    print('fake scsynth on port {}'.format(server.port))
+    server.run()
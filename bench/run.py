@@ -0,0 +1,1337 @@
+#!/usr/bin/env python3
+"""Offline benchmarks of the plugin's sclang I/O pipeline
+
+Loads SuperCollider.py with the sublime API stub in bench/stub, starts
+bench/fake_sclang.py in place of sclang and prints the results as JSON.
+
+    python3 bench/run.py                      # all scenarios
+    python3 bench/run.py flood trimming       # some of them
+    python3 bench/run.py --output bench_output.txt
+
+Scenarios:
+    flood       sclang printing as fast as it can, distinct and repeated
+                lines, until everything is in the post view
+    large_eval  evaluating big blocks of code, time until sclang answers
+    round_trip  flagged requests, one at a time, in a burst and during a
+                flood
+    trimming    post view updates with line trimming, per buffer size
+    benchmark   Benchmark Selection on a block taking 2 ms, overhead of the
+                command and whether slowing the block down is flagged
+    synthdef_cache
+                evaluating a project of 200 SynthDefs with and without the
+                SynthDef cache: first, unchanged and with one edited
+    osc_trace   capturing forwarded OSC messages, all of them, sampled and
+                rate limited, rendering the trace view, and sclang's side
+                of it set up again after recompiling and restarting
+    server_status
+                scsynth /status polling against bench/fake_scsynth.py
+    restart     restarting and recompiling a slow to compile sclang, from
+                scratch and from a warm standby
+    help_index  building, refreshing and loading the help index of a
+                generated help tree, lookups and searches
+    supervisor  time to detect and recover from a crashed and a hung sclang,
+                and to shut down a cooperative and a stubborn one, and
+                one whose input queue is full
+    reader      reading sclang's stdout from a pipe, the former readline
+                reader against the chunked reader and output splitter
+    requests    checks of request ids, multi-line replies, errors,
+                concurrent requests, timeouts and sclang exiting
+    control_channel
+                checks of the OSC encoder and of control commands sent to
+                a UDP stand-in for sclang's control port
+    completions rebuilding completions from a class index the size of the
+                class library, and querying them per prefix length
+    cmd_period  Stop pressed while a large evaluation is being written to
+                sclang, until the fake sclang receives CmdPeriod.run, over
+                stdin and over the control channel
+    blocks      evaluating a block in the middle of a 20000 line document,
+                first, unchanged and after an edit before, in and after it
+    symbols     indexing a project of 1000 files of SynthDefs and Pdefs, cold
+                and warm, and looking names up as Goto Definition does
+    instances   enabling every command of the menus in windows that have no
+                sclang instance, which must not create any, and statuses
+                per instance and window
+    session_log reopening the post view from the session log, folded and
+                with its error marked like live output
+
+Only posix is supported, the fake sclang is started as an executable.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, 'stub'))
+sys.path.insert(0, PACKAGE_DIR)
+
+import sublime  # noqa: E402
+import sublime_plugin  # noqa: E402
+import SuperCollider  # noqa: E402
+from fake_scsynth import FakeServer  # noqa: E402
+
+SETTINGS = 'SuperCollider.sublime-settings'
+FAKE_SCLANG = os.path.join(BENCH_DIR, 'fake_sclang.py')
+TIMEOUT = 120
+CMD_PERIOD_RE = re.compile(r'CmdPeriod at ([\d.]+)\n')
+
+
+# Helpers
+# ------------------------------------------------------------------------------
+def configure(**settings):
+    """Reset the plugin settings to the defaults, then apply settings"""
+    sublime.load_settings(SETTINGS).clear()
+    sublime.load_default_settings(SETTINGS,
+                                  os.path.join(PACKAGE_DIR, SETTINGS))
+    defaults = {
+        'sc_path': {'linux': FAKE_SCLANG},
+        'open_post_view_in': 'tab',
+        'session_log': False
+    }
+    defaults.update(settings)
+    sublime.load_settings(SETTINGS).update(defaults)
+
+
+def start(**settings):
+    """A running SuperColliderProcess with a post view, the plugin's only one"""
+    configure(**settings)
+    SuperCollider.instances = SuperCollider.InstancePool()
+    sc = SuperCollider.instances.get()
+    sc.start()
+    sc.open_post_view()
+    if not sublime.run_until(lambda: 'Welcome' in sc.post_view.text, 10):
+        raise RuntimeError('fake sclang did not start')
+    # let the class index request go by
+    sublime.run_until(lambda: len(sc.requests) == 0, 10)
+    sc.metrics.reset()
+    return sc
+
+
+def stop(sc):
+    sc.stop()
+    sublime.run_until(lambda: sc.state == 'dead', 10)
+    sublime.run_until(lambda: not sc.sclang_thread.is_alive(), 5)
+    sublime.run_until(lambda: sublime.pending_timeouts() == 0, 1)
+    sc.close()
+
+
+def latency(sc, name):
+    snapshot = sc.metrics.snapshot()['latencies'].get(name)
+    if snapshot is None:
+        return None
+    snapshot.pop('buckets')
+    return snapshot
+
+
+def free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_post(sc, text):
+    if not sublime.run_until(lambda: sc.post_view.text.endswith(text),
+                             TIMEOUT):
+        raise RuntimeError('timed out waiting for {!r}'.format(text))
+
+
+# Scenarios
+# ------------------------------------------------------------------------------
+def flood(lines=200000, size=80, repeated=False, collapse=True,
+          max_lines=1000):
+    sc = start(collapse_repeated_post_lines=collapse,
+               max_post_view_lines=max_lines)
+    start_time = time.perf_counter()
+    sc.execute('flood({}, {}, {})'.format(lines, size, int(repeated)))
+    wait_for_post(sc, 'done\n')
+    elapsed = time.perf_counter() - start_time
+
+    counters = sc.metrics.snapshot()['counters']
+    result = {
+        'seconds': elapsed,
+        'lines_per_second': lines / elapsed,
+        'lines_posted': counters.get('post_lines', 0),
+        'view_chars_inserted': counters.get('post_view_chars', 0),
+        'lines_dropped': counters.get('dropped_lines', 0),
+        'view_lines': sc.post_view.text.count('\n'),
+        'post_view_update_ms': latency(sc, 'post_view_update_ms'),
+        'post_view_delay_ms': latency(sc, 'post_view_delay_ms')
+    }
+    stop(sc)
+    return result
+
+
+def reader(lines=100000, chunked=True):
+    """Lines per second read from a pipe, readline or chunks and splitter"""
+    read_fd, write_fd = os.pipe()
+    text = ''.join('{:>8} post line, caf\u00e9 \u2192 {}\n'.format(
+        i, 'x' * 16) for i in range(lines)).encode('utf-8')
+
+    def write():
+        with os.fdopen(write_fd, 'wb', buffering=0) as output:
+            view = memoryview(text)
+            while len(view) > 0:
+                view = view[output.write(view[:65536]):]
+
+    writer = threading.Thread(target=write)
+    writer.daemon = True
+    # unbuffered, like sclang's stdout pipe (bufsize=0)
+    input = os.fdopen(read_fd, 'rb', buffering=0)
+    flag = '***___SUBLIME___***'
+    count = 0
+    start_time = time.perf_counter()
+    writer.start()
+    if chunked:
+        splitter = SuperCollider.SclangOutputSplitter()
+        for data in iter(lambda: input.read(SuperCollider.READ_CHUNK_SIZE),
+                         b''):
+            count += len(splitter.feed(data, flag)[0])
+    else:
+        # the former reader, one byte per read on an unbuffered pipe
+        for line in iter(input.readline, b''):
+            if flag not in line.decode('utf-8'):
+                count += 1
+    elapsed = time.perf_counter() - start_time
+    input.close()
+    if count != lines:
+        raise RuntimeError('read {} lines of {}'.format(count, lines))
+
+    return {
+        'bytes_per_line': len(text) / lines,
+        'seconds': elapsed,
+        'lines_per_second': lines / elapsed
+    }
+
+
+def large_eval(size=1048576, count=4):
+    sc = start()
+    times = []
+    for i in range(count):
+        # a different size each time, repeated answers would be folded
+        code = '"{}"'.format('x' * (size - 2 + i))
+        start_time = time.perf_counter()
+        sc.execute(code)
+        wait_for_post(sc, '-> a String of size {}\n'.format(len(code)))
+        times.append((time.perf_counter() - start_time) * 1000)
+
+    result = {
+        'answer_ms': times,
+        'write_out_ms': latency(sc, 'write_out_ms'),
+        'stdin_write_ms': latency(sc, 'stdin_write_ms')
+    }
+    stop(sc)
+    return result
+
+
+def requests(concurrent=500):
+    """Checks request ids, multi-line replies, errors and timeouts"""
+    sc = start()
+
+    def wait(request):
+        if not sublime.run_until(request.done, TIMEOUT):
+            raise RuntimeError('request {} never resolved'.format(request.id))
+        return request
+
+    # replies of any number of lines, nothing of them posted
+    posted = sc.post_view.text
+    for lines in (1, 2, 50):
+        text = '\n'.join('line {}'.format(i) for i in range(lines))
+        request = wait(sc.request('"{}"'.format(text)))
+        if request.result != text:
+            raise RuntimeError('bad {} line reply {!r}'.format(
+                lines, request.result))
+    if sc.post_view.text != posted:
+        raise RuntimeError('a reply reached the post view')
+
+    request = wait(sc.request('Error("bad").throw'))
+    if request.error != 'ERROR: bad':
+        raise RuntimeError('bad error {!r}'.format(request.error))
+
+    # many in flight, each gets its own result
+    start_time = time.perf_counter()
+    pending = [sc.request('"reply {}"'.format(i)) for i in range(concurrent)]
+    for i, request in enumerate(pending):
+        if wait(request).result != 'reply {}'.format(i):
+            raise RuntimeError('request {} got {!r}'.format(
+                request.id, request.result))
+    concurrent_ms = (time.perf_counter() - start_time) * 1000
+    if len(set(request.id for request in pending)) != concurrent:
+        raise RuntimeError('request ids are not unique')
+
+    # waited on from another thread
+    request = sc.request('"from a thread"')
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(request.wait(5)))
+    waiter.start()
+    sublime.run_until(lambda: not waiter.is_alive(), TIMEOUT)
+    if results != ['from a thread']:
+        raise RuntimeError('wait() returned {!r}'.format(results))
+
+    # a busy sclang: the request times out, its late reply is ignored and
+    # the next request still gets its own
+    sc.execute('hang(0.5)')
+    start_time = time.perf_counter()
+    late = wait(sc.request('"late"', timeout=100))
+    timeout_ms = (time.perf_counter() - start_time) * 1000
+    if late.error != 'timed out' or late.result is not None:
+        raise RuntimeError('no timeout: {!r}'.format(late.result))
+    after = wait(sc.request('"after"'))
+    if after.result != 'after' or late.result is not None:
+        raise RuntimeError('replies got mixed up after a timeout')
+
+    # a full input queue, sclang not reading: the request fails at once
+    # instead of timing out
+    sc.execute('hang(1)')
+    code = '"{}"'.format('x' * (SuperCollider.WRITE_CHUNK_SIZE - 2))
+    while sc.metrics.snapshot()['counters'].get('write_refused', 0) == 0:
+        sc.execute(code)
+    start_time = time.perf_counter()
+    refused = wait(sc.request(code))
+    refused_ms = (time.perf_counter() - start_time) * 1000
+    if refused.error != 'input queue full' or len(sc.requests) > 0:
+        raise RuntimeError('refused request: {!r}'.format(refused.error))
+    sublime.run_until(lambda: sc.sclang_writer.pending_bytes == 0, TIMEOUT)
+
+    # requests still in flight fail when sclang dies
+    sc.execute('hang(0.5)')
+    orphan = sc.request('"orphan"')
+    sc.sclang_process.kill()
+    wait(orphan)
+    stop(sc)
+    if orphan.error is None:
+        raise RuntimeError('request did not fail when sclang exited')
+
+    return {
+        'concurrent': concurrent,
+        'concurrent_ms': concurrent_ms,
+        'timed_out_after_ms': timeout_ms,
+        'queue_full_error_after_ms': refused_ms,
+        'exit_error': orphan.error,
+        'checks': 'passed'
+    }
+
+
+def control_channel(commands=200):
+    """Checks of osc_message and execute_control against a UDP stand-in"""
+    # what osc_message encodes, osc_decode reads back
+    args = [1, -7, 0.5, 'CmdPeriod.run;', b'\x00\x01\x02', True, False]
+    packet = SuperCollider.osc_message('/sublime/eval', *args)
+    if len(packet) % 4 != 0:
+        raise RuntimeError('OSC message not aligned to 4 bytes')
+    if SuperCollider.osc_decode(packet) != [('/sublime/eval', args)]:
+        raise RuntimeError('bad round trip {!r}'.format(
+            SuperCollider.osc_decode(packet)))
+    packet = SuperCollider.osc_string('/nil') + SuperCollider.osc_string(
+        ',NI')
+    if SuperCollider.osc_decode(packet) != [('/nil', [None, float('inf')])]:
+        raise RuntimeError('bad N or I {!r}'.format(
+            SuperCollider.osc_decode(packet)))
+
+    # stands in for sclang's control port, the fake sclang answers the
+    # request installing the responder so the channel gets set up
+    port_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    port_socket.bind(('127.0.0.1', 0))
+    port_socket.settimeout(5)
+    sc = start(osc_control_port=port_socket.getsockname()[1])
+    sc.start_control_channel()
+    if not sublime.run_until(sc.has_control_channel, 10):
+        raise RuntimeError('no control channel')
+
+    times = []
+    for i in range(commands):
+        cmd = '"command {}".postln;'.format(i)
+        start_time = time.perf_counter()
+        sc.execute_control(cmd, urgent=True)
+        data = port_socket.recv(65536)
+        times.append((time.perf_counter() - start_time) * 1000)
+        expected = [('/sublime/eval', [sc.control_token, cmd])]
+        if SuperCollider.osc_decode(data) != expected:
+            raise RuntimeError('bad control message {!r}'.format(data))
+
+    # too large for a datagram: goes to stdin instead
+    large = '"{}"'.format('x' * SuperCollider.CONTROL_MAX_BYTES)
+    sc.execute_control(large)
+    wait_for_post(sc, '-> a String of size {}\n'.format(len(large)))
+    port_socket.settimeout(0.1)
+    try:
+        port_socket.recv(65536)
+        raise RuntimeError('large command sent over the control channel')
+    except socket.timeout:
+        pass
+
+    stop(sc)
+    if sc.has_control_channel():
+        raise RuntimeError('control channel still open after stopping')
+    port_socket.close()
+
+    # recompiling loses the fake sclang's responder: stdin until it is back
+    sc = start(osc_control_port=free_port())
+    if not sublime.run_until(sc.has_control_channel, 10):
+        raise RuntimeError('no control channel')
+    token = sc.control_token
+    sc.recompile()
+    if sc.has_control_channel():
+        raise RuntimeError('control channel kept while recompiling')
+    sc.execute_control('"while recompiling";')
+    wait_for_post(sc, '-> "while recompiling";\n')
+    if not sublime.run_until(lambda: sc.has_control_channel() and
+                             sc.control_token != token, 10):
+        raise RuntimeError('no control channel after recompiling')
+    sent = sc.metrics.snapshot()['counters'].get('control_messages', 0)
+    sc.execute_control('CmdPeriod.run;', urgent=True)
+    if not sublime.run_until(lambda: CMD_PERIOD_RE.search(
+            sc.post_view.text), 10):
+        raise RuntimeError('control command lost after recompiling')
+    if sc.metrics.snapshot()['counters'].get('control_messages') != sent + 1:
+        raise RuntimeError('control command not sent over the channel')
+    stop(sc)
+
+    times.sort()
+    return {
+        'send_to_receive_ms': {
+            'median': times[len(times) // 2],
+            'max': times[-1]
+        },
+        'checks': 'passed'
+    }
+
+
+def cmd_period(size=8388608, stdin_rate=0, control=False, count=3):
+    """Stop pressed right after a large evaluation, until sclang gets it"""
+    settings = {}
+    if stdin_rate > 0:
+        settings['sclang_args'] = ['--stdin-rate', str(stdin_rate)]
+    if control:
+        settings['osc_control_port'] = free_port()
+    sc = start(**settings)
+    if control and not sublime.run_until(sc.has_control_channel, 10):
+        raise RuntimeError('no control channel')
+
+    delays = []
+    for i in range(count):
+        # a different size each time, repeated answers would be folded
+        code = '"{}"'.format('x' * (size - 2 + i))
+        answer = '-> a String of size {}\n'.format(len(code))
+        posted = len(sc.post_view.text)
+        sc.execute(code)
+        pressed = time.monotonic()
+        sublime.run_command('super_collider_stop')
+
+        def received():
+            text = sc.post_view.text[posted:]
+            return answer in text and CMD_PERIOD_RE.search(text)
+        if not sublime.run_until(received, TIMEOUT):
+            raise RuntimeError('CmdPeriod or the answer never arrived')
+        at = float(CMD_PERIOD_RE.search(sc.post_view.text[posted:]).group(1))
+        delays.append((at - pressed) * 1000)
+
+    stop(sc)
+    return {
+        'evaluation_bytes': size,
+        'stop_received_after_ms': delays
+    }
+
+
+def blocks(lines=20000, edits=20):
+    """Evaluating a block of a long document, as Evaluate does with expand"""
+    sc = start()
+    window = sublime.active_window()
+    view = window.new_file()
+    # blocks of 10 lines, the one evaluated is in the middle
+    block = ('(\n'
+             '    // block {0}\n'
+             '    var freq = 200 + {0};\n'
+             '    x = {{ |amp = 0.1|\n'
+             '        SinOsc.ar(freq, 0, amp) ! 2\n'
+             '    }}.play;\n'
+             '    "(block {0}".postln;\n'
+             '    $).postln;\n'
+             ')\n'
+             '\n')
+    view.text = ''.join(block.format(i) for i in range(lines // 10))
+    view._change_count += 1
+    middle = view.text.index('// block {}\n'.format(lines // 20))
+
+    def evaluate(point):
+        view.sel().clear()
+        view.sel().add(sublime.Region(point))
+        start_time = time.perf_counter()
+        view.run_command('super_collider_evaluate', {'expand': 'True'})
+        elapsed = (time.perf_counter() - start_time) * 1000
+        evaluated = view.get_regions(
+            SuperCollider.SuperColliderEvaluateCommand.HIGHLIGHT_KEY)
+        expected = block.format(lines // 20).rstrip('\n')
+        if [view.substr(region) for region in evaluated] != [expected]:
+            raise RuntimeError('evaluated {!r}'.format(evaluated))
+        return elapsed
+
+    first = evaluate(middle)
+    unchanged = [evaluate(middle) for i in range(edits)]
+    edited = {}
+    for name, point in (('start', 0), ('middle', middle),
+                        ('end', len(view.text))):
+        times = []
+        for i in range(edits):
+            view.insert(None, point, '\n')
+            times.append(evaluate(view.text.index(
+                '// block {}\n'.format(lines // 20))))
+        edited[name] = sorted(times)[len(times) // 2]
+
+    view.close()
+    if view.buffer_id() in SuperCollider.block_indexes:
+        raise RuntimeError('block index kept after closing the view')
+    stop(sc)
+    return {
+        'blocks': lines // 10,
+        'first_evaluate_ms': first,
+        'unchanged_evaluate_ms': sorted(unchanged)[len(unchanged) // 2],
+        'evaluate_after_edit_ms': edited
+    }
+
+
+def round_trip(count=200, burst=200, flood_lines=0):
+    sc = start()
+    if flood_lines > 0:
+        sc.execute('flood({}, 80, 0, 200000)'.format(flood_lines))
+
+    times = []
+    for i in range(count):
+        start_time = time.perf_counter()
+        request = sc.request('"pong {}"'.format(i))
+        sublime.run_until(request.done, 10)
+        if request.result != 'pong {}'.format(i):
+            raise RuntimeError('bad reply {!r}'.format(request.result))
+        times.append((time.perf_counter() - start_time) * 1000)
+
+    start_time = time.perf_counter()
+    requests = [sc.request('"pong"') for i in range(burst)]
+    sublime.run_until(lambda: all(request.done() for request in requests),
+                      TIMEOUT)
+    burst_ms = (time.perf_counter() - start_time) * 1000
+
+    times.sort()
+    result = {
+        'sequential_ms': {
+            'min': times[0],
+            'median': times[len(times) // 2],
+            'p95': times[int(len(times) * 0.95)],
+            'max': times[-1]
+        },
+        'burst_ms': burst_ms,
+        'request_ms': latency(sc, 'request_ms')
+    }
+    stop(sc)
+    return result
+
+
+def trimming(buffer_lines=10000, chunk_lines=100, inserts=200):
+    # drives the update command directly, no sclang involved
+    configure()
+    window = sublime.active_window()
+    view = window.new_file()
+    line = 'a post line of some typical length, 12345\n'
+    view.run_command('super_collider_update_post_view', {
+        'content': line * buffer_lines,
+        'max_lines': buffer_lines
+    })
+
+    chunk = line * chunk_lines
+    times = []
+    for i in range(inserts):
+        start_time = time.perf_counter()
+        view.run_command('super_collider_update_post_view', {
+            'content': chunk,
+            'max_lines': buffer_lines
+        })
+        times.append((time.perf_counter() - start_time) * 1000)
+
+    times.sort()
+    return {
+        'insert_ms': {
+            'median': times[len(times) // 2],
+            'p95': times[int(len(times) * 0.95)],
+            'max': times[-1]
+        },
+        'view_lines': view.text.count('\n')
+    }
+
+
+def server_status(poll_ms=50, polls=40):
+    server = FakeServer()
+    sc = start(server_port=server.port, server_status_poll_ms=poll_ms)
+    window = sublime.active_window()
+
+    def status_text():
+        view = window.active_view()
+        return view._status.get('supercollider-server-' + sc.key, '')
+
+    # no server booted yet, nothing is shown
+    sublime.run_until(lambda: False,
+                      poll_ms * (SuperCollider.SERVER_STATUS_MISSED_POLLS + 2)
+                      / 1000)
+    if status_text():
+        raise RuntimeError('status shown without a server: {!r}'.format(
+            status_text()))
+    server.start()
+
+    start_time = time.perf_counter()
+    polls_before = server.polls
+    sublime.run_until(lambda: server.polls >= polls_before + polls, TIMEOUT)
+    if 'CPU' not in status_text():
+        raise RuntimeError('no server status shown')
+    polls_per_second = polls / (time.perf_counter() - start_time)
+    shown = status_text()
+
+    # polling is restarted when the server settings change, not on others
+    settings = sublime.load_settings(SETTINGS)
+    thread = sc.server_monitor.thread
+    settings.set('max_post_view_lines', 2000)
+    if sc.server_monitor.thread is not thread:
+        raise RuntimeError('polling restarted on an unrelated setting')
+    settings.set('server_status_poll_ms', poll_ms + 1)
+    if sc.server_monitor.thread is thread:
+        raise RuntimeError('polling not restarted on a new poll rate')
+
+    # the server goes away
+    server.stop()
+    start_time = time.perf_counter()
+    sublime.run_until(lambda: 'not responding' in status_text(), 10)
+    lost_ms = (time.perf_counter() - start_time) * 1000
+
+    result = {
+        'polls_per_second': polls_per_second,
+        'status': shown,
+        'not_responding_after_ms': lost_ms
+    }
+    stop(sc)
+    return result
+
+
+def restart(compile_seconds=1.0, standby=False, count=3):
+    sc = start(sclang_args=['--compile-seconds', str(compile_seconds)],
+               warm_standby=standby)
+
+    def restart_times(action):
+        ready = []
+        answered = []
+        for i in range(count):
+            if standby and not sublime.run_until(
+                    lambda: sc.standby is not None and sc.standby.is_ready(),
+                    TIMEOUT):
+                raise RuntimeError('standby did not get ready')
+            start_time = time.perf_counter()
+            action()
+            sublime.run_until(lambda: sc.ready_requested is None, TIMEOUT)
+            # until a request is answered by the new sclang
+            request = sc.request('"ready"')
+            sublime.run_until(request.done, TIMEOUT)
+            answered.append((time.perf_counter() - start_time) * 1000)
+            ready.append(sc.last_ready_ms)
+        return {'ready_ms': ready, 'answered_ms': answered}
+
+    result = {
+        'restart': restart_times(sc.restart),
+        'recompile': restart_times(sc.recompile)
+    }
+    stop(sc)
+    return result
+
+
+def supervisor(heartbeat_ms=100, hang_timeout_ms=500):
+    def elapsed_until(condition):
+        start_time = time.perf_counter()
+        if not sublime.run_until(condition, TIMEOUT):
+            raise RuntimeError('supervisor scenario timed out')
+        return (time.perf_counter() - start_time) * 1000
+
+    def outage(trigger, state):
+        trigger()
+        detect_ms = elapsed_until(lambda: sc.state == state)
+        ready_ms = elapsed_until(lambda: sc.state == 'ready' and
+                                 sc.last_recovery_ms is not None)
+        return {
+            'detect_ms': detect_ms,
+            'back_to_ready_ms': detect_ms + ready_ms,
+            'recovery_ms': sc.last_recovery_ms,
+            'outage_detect_ms': latency(sc, 'outage_detect_ms')
+        }
+
+    result = {}
+    sc = start(sclang_heartbeat_ms=heartbeat_ms,
+               sclang_hang_timeout_ms=hang_timeout_ms,
+               auto_restart_sclang='hung')
+    sublime.run_until(lambda: sc.state == 'ready', 10)
+    result['crash'] = outage(sc.sclang_process.kill, 'dead')
+    sc.last_recovery_ms = None
+    result['hang'] = outage(lambda: sc.execute('hang(30)'), 'hung')
+
+    # exiting by itself with code 0 is not a crash, it isn't restarted
+    sc.execute('0.exit;')
+    elapsed_until(lambda: sc.state == 'dead')
+    sublime.run_until(lambda: sc.state != 'dead',
+                      SuperCollider.AUTO_RESTART_MS * 3 / 1000)
+    if sc.state != 'dead':
+        raise RuntimeError('restarted after exiting with code 0')
+    sc.start()
+    sublime.run_until(lambda: sc.state == 'ready', 10)
+
+    sc.stop()
+    result['shutdown_ms'] = elapsed_until(lambda: sc.state == 'dead')
+    sc.start()
+    sublime.run_until(lambda: sc.state == 'ready', 10)
+    sc.execute('trap()')
+    sc.stop()
+    result['stubborn_shutdown_ms'] = elapsed_until(lambda: sc.state == 'dead')
+    result['stubborn_shutdown'] = {
+        name: count for name, count
+        in sc.metrics.snapshot()['counters'].items()
+        if name.startswith('shutdown_')
+    }
+    sc.close()
+
+    # exiting while the input queue is full, sclang reading 4 MB/s
+    sc = start(sclang_args=['--stdin-rate', '4194304'])
+    code = '"{}"'.format('x' * (SuperCollider.WRITE_CHUNK_SIZE - 2))
+    while sc.metrics.snapshot()['counters'].get('write_refused', 0) == 0:
+        sc.execute(code)
+    sc.stop()
+    result['busy_shutdown_ms'] = elapsed_until(lambda: sc.state == 'dead')
+    counters = sc.metrics.snapshot()['counters']
+    if counters.get('shutdown_exit') != 1:
+        raise RuntimeError('sclang did not exit by itself: {}'.format(
+            counters))
+    sc.close()
+    return result
+
+
+def synthdef_cache(synthdefs=200, synthdef_ms=20, cache=True):
+    """Evaluating a project of synthdefs SynthDefs, like after a boot"""
+    sc = start(sclang_args=['--synthdef-ms', str(synthdef_ms)],
+               synthdef_cache=cache)
+    sc.synthdef_cache = SuperCollider.SynthDefCache(
+        tempfile.mkdtemp(prefix='synthdefs-'))
+    view = sublime.active_window().new_file()
+    view.text = '\n'.join(
+        'SynthDef(\\def{0}, {{ |out, freq = {0}, amp = 0.1|\n'
+        '    var sig = SinOsc.ar(freq * [1, 1.01]) * amp;\n'
+        '    Out.ar(out, sig);\n'
+        '}}).add;\n'.format(i) for i in range(synthdefs))
+    text = view.text
+
+    def evaluate():
+        # until the batch is echoed, after the loader and every SynthDef
+        answers = sc.post_view.text.count('-> ')
+        start_time = time.perf_counter()
+        view.run_command('super_collider_evaluate', {'all': 'True'})
+        if not sublime.run_until(
+                lambda: sc.post_view.text.count('-> ') > answers, TIMEOUT):
+            raise RuntimeError('evaluation timed out')
+        # the same value as without the cache
+        if not sc.post_view.text.endswith('-> a SynthDef\n'):
+            raise RuntimeError('evaluated to {!r}'.format(
+                sc.post_view.text.splitlines()[-1]))
+        return (time.perf_counter() - start_time) * 1000
+
+    result = {'cold_ms': evaluate(), 'unchanged_ms': evaluate()}
+    view.text = text.replace('freq = 7|', 'freq = 8|')
+    result['one_changed_ms'] = evaluate()
+    counters = sc.metrics.snapshot()['counters']
+    result['stored'] = counters.get('synthdefs_stored', 0)
+    result['loaded'] = counters.get('synthdefs_loaded', 0)
+    shutil.rmtree(sc.synthdef_cache.directory)
+    stop(sc)
+    return result
+
+
+def benchmark(work_ms=2, runs=20, warmup=3):
+    """Benchmark Selection on a block, then on an edited, slower one"""
+    sc = start(benchmark_runs=runs, benchmark_warmup=warmup)
+    SuperCollider.benchmarks = SuperCollider.BenchmarkHistory(os.path.join(
+        tempfile.mkdtemp(prefix='benchmarks-'), 'history.json'))
+    window = sublime.active_window()
+    view = window.new_file()
+    panel = window.get_output_panel(SuperCollider.BENCHMARK_PANEL_NAME)
+
+    def run(code):
+        view.text = '(\n    var load = 1;\n    work({});\n)\n'.format(code)
+        view._change_count += 1
+        view.sel().clear()
+        view.sel().add(sublime.Region(8))
+        panel.text = ''
+        start_time = time.perf_counter()
+        view.run_command('super_collider_benchmark_selection')
+        if not sublime.run_until(lambda: panel.text, TIMEOUT):
+            raise RuntimeError('benchmark timed out')
+        elapsed = (time.perf_counter() - start_time) * 1000
+        history = list(SuperCollider.benchmarks.blocks.values())[0]
+        return elapsed, history[0], panel.text
+
+    elapsed, stats, _ = run(work_ms)
+    run(work_ms)
+    _, slower, report = run(work_ms * 1.5)
+
+    # a block with a semicolon and comments around it is run without its
+    # parentheses too, or its var would be a parse error
+    for code in ('( var load = 1; work(1); );',
+                 '// load\n(\n    var load = 1;\n    work(1);\n) // done\n'):
+        request = sc.benchmark(code, lambda times: None)
+        if not sublime.run_until(request.done, 10) or request.error:
+            raise RuntimeError('benchmark of {!r} failed: {}'.format(
+                code, request.error))
+    result = {
+        'command_ms': elapsed,
+        'overhead_ms': elapsed - (runs + warmup) * stats['median'],
+        'stats_ms': {name: stats[name]
+                     for name in ('min', 'median', 'p95', 'max')},
+        'edited_median_ms': slower['median'],
+        'regression_flagged': 'REGRESSION' in report
+    }
+    stop(sc)
+    return result
+
+
+def osc_trace(messages=200000, addresses=16, sample=None, rate_limit=0,
+              rate=50000):
+    """Messages forwarded like sclang's trace function, at rate per second"""
+    trace = SuperCollider.OscTrace()
+    trace.configure(10000, [], ['/address0'], sample or {}, rate_limit)
+    port = trace.open()
+    packets = [SuperCollider.osc_message(
+        '/sublime/trace', 57110, 57120, '/address{}'.format(i % addresses),
+        1000 + i, 0.5, 'freq') for i in range(addresses)]
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    start_time = time.perf_counter()
+    for i in range(messages):
+        if i % 100 == 0:
+            delay = start_time + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        sender.sendto(packets[i % addresses], ('127.0.0.1', port))
+    sent_s = time.perf_counter() - start_time
+
+    # wait until nothing more comes in
+    received = -1
+    while received != trace.received:
+        received = trace.received
+        time.sleep(0.2)
+    trace.close()
+    sender.close()
+
+    renders = []
+    for i in range(20):
+        render_start = time.perf_counter()
+        text = trace.render('Bench')
+        renders.append((time.perf_counter() - render_start) * 1000)
+    renders.sort()
+    return {
+        'sent': messages,
+        'send_seconds': sent_s,
+        'received': trace.received,
+        'lost': messages - trace.received,
+        'kept': trace.kept,
+        'filtered': trace.filtered,
+        'sampled_out': trace.sampled_out,
+        'rate_limited': trace.limited,
+        'buffered': len(trace.messages),
+        'render_ms_median': renders[len(renders) // 2],
+        'render_bytes': len(text)
+    }
+
+
+def osc_trace_recompile(compile_seconds=0.5):
+    """The trace set up in sclang again after recompiling and restarting"""
+    sc = start(sclang_args=['--compile-seconds', str(compile_seconds)])
+    sent = []
+    execute_silently = sc.execute_silently
+
+    def record(code):
+        sent.append(code)
+        execute_silently(code)
+    sc.execute_silently = record
+
+    sc.start_osc_trace()
+    port = sc.osc_trace.port
+    result = {}
+    for action in ('recompile', 'restart'):
+        del sent[:]
+        start_time = time.perf_counter()
+        getattr(sc, action)()
+        if not sublime.run_until(lambda: any(
+                'sublime/trace' in code for code in sent), TIMEOUT):
+            raise RuntimeError('trace not set up again after ' + action)
+        result[action + '_ms'] = (time.perf_counter() - start_time) * 1000
+        if not sc.tracing_osc or sc.osc_trace.port != port:
+            raise RuntimeError('trace stopped by ' + action)
+
+    sc.stop_osc_trace()
+    stop(sc)
+    return result
+
+
+def completions(classes=1700, method_names=12000, queries=1000):
+    """Completion queries on a class index the size of the class library"""
+    rng = random.Random(8)
+    names = ['{}{}'.format(rng.choice(['ar', 'kr', 'set', 'get', 'play',
+                                       'free', 'new', 'value', 'as', 'do']),
+                           i) for i in range(method_names)]
+
+    def methods(count):
+        return {name: [['arg{}'.format(i), 'nil' if i % 2 else str(i)]
+                       for i in range(rng.randrange(5))]
+                for name in rng.sample(names, count)}
+
+    index = SuperCollider.ClassIndex(os.path.join(sublime.cache_path(),
+                                                  'bench_class_index.json'))
+    class_names = ['Object'] + ['{}{}'.format(
+        rng.choice(['Sin', 'Pan', 'Buf', 'Env', 'Pattern', 'Server', 'UGen']),
+        i) for i in range(classes - 1)]
+    for i, name in enumerate(class_names):
+        index.classes[name] = {
+            'superclass': class_names[rng.randrange(i)] if i > 0 else None,
+            'file': '/classes/{}.sc'.format(name),
+            'files': ['/classes/{}.sc'.format(name)],
+            'methods': methods(rng.randrange(1, 30)),
+            'class_methods': methods(rng.randrange(1, 8))
+        }
+
+    completion = SuperCollider.CompletionIndex()
+    start_time = time.perf_counter()
+    completion.rebuild(index)
+    rebuild_ms = (time.perf_counter() - start_time) * 1000
+
+    def timed(search, words, length):
+        times = []
+        for i in range(queries):
+            prefix = rng.choice(words)[:length]
+            start_time = time.perf_counter()
+            search(prefix)
+            times.append((time.perf_counter() - start_time) * 1000)
+        times.sort()
+        return {'median': times[len(times) // 2],
+                'p95': times[int(len(times) * 0.95)], 'max': times[-1]}
+
+    receiver = class_names[-1]
+    result = {
+        'classes': len(index.classes),
+        'unique_methods': len(set(method for entry in index.classes.values()
+                                  for method in entry['methods'])),
+        'rebuild_ms': rebuild_ms
+    }
+    for length in (0, 1, 2, 3):
+        result['classes_prefix_{}_ms'.format(length)] = timed(
+            completion.search_classes, class_names, length)
+        result['methods_prefix_{}_ms'.format(length)] = timed(
+            completion.search_methods, names, length)
+    start_time = time.perf_counter()
+    completion.search_methods('', receiver)
+    result['class_methods_first_ms'] = (time.perf_counter() -
+                                        start_time) * 1000
+    result['class_methods_ms'] = timed(
+        lambda prefix: completion.search_methods(prefix, receiver), names, 1)
+    result['args_ms'] = timed(
+        lambda prefix: completion.search_args(prefix, receiver, 'new'),
+        ['arg1', 'arg2', 'a', ''], 1)
+    return result
+
+
+def symbols(files=1000, definitions=200, queries=1000):
+    """Indexing a project of definitions, and Goto Definition lookups"""
+    directory = tempfile.mkdtemp(prefix='symbols-')
+    for i in range(files):
+        folder = os.path.join(directory, 'part{}'.format(i % 10))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, 'file{}.scd'.format(i)), 'w') as file:
+            for j in range(definitions):
+                if j % 2 == 0:
+                    file.write('SynthDef(\\def{}_{}, {{ |out = 0|\n'
+                               '    Out.ar(out, SinOsc.ar(440) * 0.1)\n'
+                               '}}).add;\n'.format(i, j))
+                else:
+                    file.write("Pdef('def{}_{}', Pbind(\\dur, 0.25));\n"
+                               .format(i, j))
+    path = os.path.join(tempfile.mkdtemp(prefix='symbols-index-'),
+                        'index.json')
+
+    def timed(function, *args):
+        start_time = time.perf_counter()
+        value = function(*args)
+        return (time.perf_counter() - start_time) * 1000, value
+
+    index = SuperCollider.ProjectSymbolIndex(path)
+    cold_ms, parsed = timed(index.refresh, [directory])
+    warm_ms, _ = timed(index.refresh, [directory])
+    loaded = SuperCollider.ProjectSymbolIndex(path)
+    load_ms, _ = timed(loaded.load)
+
+    rng = random.Random(3)
+    lookups = []
+    for i in range(queries):
+        name = 'def{}_{}'.format(rng.randrange(files), rng.randrange(
+            definitions))
+        elapsed, found = timed(loaded.find, name)
+        if len(found) != 1:
+            raise RuntimeError('{} found {} times'.format(name, len(found)))
+        lookups.append(elapsed)
+
+    # a saved file is indexed again on its own
+    edited = os.path.join(directory, 'part0', 'file0.scd')
+    with open(edited, 'a') as file:
+        file.write('Ndef(\\edited, { SinOsc.ar * 0.1 });\n')
+    save_ms, _ = timed(loaded.index_file, edited)
+    if len(loaded.find('edited')) != 1:
+        raise RuntimeError('edited definition not found')
+    os.remove(edited)
+    loaded.refresh([directory])
+    if loaded.find('edited') or loaded.find('def0_0'):
+        raise RuntimeError('definitions of a deleted file still found')
+
+    lookups.sort()
+    result = {
+        'files_parsed': parsed,
+        'cold_refresh_ms': cold_ms,
+        'warm_refresh_ms': warm_ms,
+        'load_ms': load_ms,
+        'find_ms': {
+            'median': lookups[len(lookups) // 2],
+            'p95': lookups[int(len(lookups) * 0.95)],
+            'max': lookups[-1]
+        },
+        'all_definitions_ms': timed(loaded.all_definitions)[0],
+        'index_saved_file_ms': save_ms
+    }
+    shutil.rmtree(directory)
+    shutil.rmtree(os.path.dirname(path))
+    return result
+
+
+def instances(windows=3, renders=100):
+    """Enabling the commands of every menu, in windows without instances"""
+    configure(interpreter_per='window')
+    SuperCollider.instances = SuperCollider.InstancePool()
+    for i in range(windows):
+        sublime.run_command('new_window')
+    commands = [command for command in sublime_plugin.subclasses(
+        sublime_plugin.Command) if command.__module__ == 'SuperCollider' and
+        issubclass(command, SuperCollider.SuperColliderInstanceAbstract)]
+
+    def instance(command, window):
+        if issubclass(command, sublime_plugin.TextCommand):
+            return command(window.new_file())
+        if issubclass(command, sublime_plugin.WindowCommand):
+            return command(window)
+        return command()
+
+    menus = [(sublime_plugin.command_name(command), instance(command, window))
+             for window in sublime.windows() for command in commands]
+    enabled = {}
+    start_time = time.perf_counter()
+    for i in range(renders):
+        for name, command in menus:
+            enabled[name] = command.is_enabled()
+    render_ms = (time.perf_counter() - start_time) * 1000 / renders
+
+    if len(SuperCollider.instances.instances) > 0:
+        raise RuntimeError('is_enabled created {} instances'.format(
+            len(SuperCollider.instances.instances)))
+    if not enabled['super_collider_start_interpreter']:
+        raise RuntimeError('Start Interpreter disabled without an instance')
+    if enabled['super_collider_stop']:
+        raise RuntimeError('Stop enabled without an instance')
+
+    # statuses go to the instance's own windows and follow tab switches
+    first, second = sublime.windows()[-2:]
+    sc = SuperCollider.instances.get(window=first)
+    other = SuperCollider.instances.get(window=second)
+    listener = SuperCollider.SuperColliderListener()
+    key = 'supercollider-state-' + sc.key
+    hung_view = first.new_file()
+    sc.show_status('state', 'sclang: hung')
+    other.show_status('state', 'sclang: ready')
+    if (hung_view._status.get(key) != 'sclang: hung' or
+            key in second.active_view()._status):
+        raise RuntimeError('status not shown in its own window only')
+    view = first.new_file()
+    listener.on_activated(view)
+    sc.show_status('state', 'sclang: ready')
+    first.focus_view(hung_view)
+    listener.on_activated(hung_view)
+    if [v._status.get(key) for v in (view, hung_view)] != [
+            'sclang: ready', 'sclang: ready']:
+        raise RuntimeError('stale status after switching tabs')
+    sc.close()
+    other.close()
+
+    return {
+        'commands': len(commands),
+        'windows': len(sublime.windows()),
+        'menus_ms': render_ms
+    }
+
+
+def session_log(lines=100000):
+    """Reopening the post view from the session log after a repeated flood
+    and an error, folded and marked like live output
+    """
+    sc = start(session_log=True)
+    sc.execute('flood({}, 80, 1)'.format(lines))
+    wait_for_post(sc, 'done\n')
+    sc.execute('{ (var x = 1) }')
+    wait_for_post(sc, 'unexpected VAR\n')
+
+    sc.cache_post_view(sc.post_view)
+    sc.post_view.close()
+    sc.remove_post_view()
+    start_time = time.perf_counter()
+    sc.open_post_view()
+    restore_ms = (time.perf_counter() - start_time) * 1000
+
+    view = sc.post_view
+    # the repeated line, its count, 'done' and the error
+    if view.text.count('\n') != 4 or ' (x' not in view.text:
+        raise RuntimeError('restored lines not folded')
+    regions = view.get_regions('supercollider-error')
+    if (len(regions) != 1 or
+            not view.substr(regions[0]).startswith('ERROR')):
+        raise RuntimeError('restored error not marked')
+    record = SuperCollider.SuperColliderUpdatePostViewCommand.find_record(
+        view, sc.output_records[-1])
+    if record is None or record != regions[0]:
+        raise RuntimeError('restored error not found by its record')
+
+    result = {
+        'restore_ms': restore_ms,
+        'view_lines': view.text.count('\n')
+    }
+    stop(sc)
+    return result
+
+
+def write_help_tree(directory, files, words_per_file):
+    """A HelpSource like tree of generated .schelp files"""
+    rng = random.Random(1)
+    vocabulary = ['word{}'.format(i) for i in range(5000)]
+    for i in range(files):
+        kind = 'Classes' if i % 5 else 'Guides'
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+        text = ' '.join(rng.choice(vocabulary)
+                        for _ in range(words_per_file))
+        with open(os.path.join(directory, kind, 'Class{}.schelp'.format(i)),
+                  'w') as file:
+            file.write("""class:: Class{0}
+summary:: A generated class number {0} link::Classes/Class{1}::
+categories:: UGens>Generators
+related:: Classes/Class{1}
+
+description::
+{2}
+
+classmethods::
+method:: ar, kr
+argument:: freq
+Frequency in Hertz.
+argument:: phase
+Phase offset.
+
+instancemethods::
+method:: method{3}
+argument:: value
+returns:: this
+
+examples::
+code::
+{{ Class{0}.ar(440, 0) * 0.1 }}.play;
+::
+""".format(i, (i + 1) % files, text, i % 50))
+
+
+def help_index(files=1500, words_per_file=300, queries=200):
+    directory = tempfile.mkdtemp(prefix='help-')
+    write_help_tree(directory, files, words_per_file)
+    path = os.path.join(sublime.cache_path(), 'bench_help_index.json')
+
+    def timed(function, *args):
+        start_time = time.perf_counter()
+        value = function(*args)
+        return (time.perf_counter() - start_time) * 1000, value
+
+    index = SuperCollider.HelpIndex(path)
+    build_ms, parsed = timed(index.refresh, [directory])
+    unchanged_ms, _ = timed(index.refresh, [directory])
+    os.utime(os.path.join(directory, 'Classes', 'Class1.schelp'), (0, 0))
+    one_changed_ms, reparsed = timed(index.refresh, [directory])
+
+    loaded = SuperCollider.HelpIndex(path)
+    load_ms, _ = timed(loaded.load)
+
+    rng = random.Random(2)
+    lookups = []
+    searches = []
+    for i in range(queries):
+        lookups.append(timed(loaded.find, 'Class{}.ar'.format(
+            rng.randrange(files)))[0])
+        query = 'word{} word{}'.format(rng.randrange(5000),
+                                       rng.randrange(500))
+        searches.append(timed(loaded.search, query)[0])
+    prefix_ms = [timed(loaded.search, 'generated word{}'.format(i))[0]
+                 for i in range(1, 10)]
+
+    def summary(times):
+        times = sorted(times)
+        return {
+            'median': times[len(times) // 2],
+            'p95': times[int(len(times) * 0.95)],
+            'max': times[-1]
+        }
+
+    result = {
+        'files_parsed': parsed,
+        'build_ms': build_ms,
+        'refresh_unchanged_ms': unchanged_ms,
+        'refresh_one_changed_ms': one_changed_ms,
+        'files_reparsed': reparsed,
+        'index_bytes': os.path.getsize(path),
+        'load_ms': load_ms,
+        'terms': len(loaded.terms),
+        'lookup_ms': summary(lookups),
+        'search_ms': summary(searches),
+        'prefix_search_ms': summary(prefix_ms)
+    }
+    shutil.rmtree(directory)
+    return result
+
+
+SCENARIOS = {
+    'session_log': [
+        ('restore', session_log, {})
+    ],
+    'instances': [
+        ('menus', instances, {})
+    ],
+    'symbols': [
+        ('1000_files', symbols, {})
+    ],
+    'blocks': [
+        ('20k_lines', blocks, {})
+    ],
+    'cmd_period': [
+        ('stdin', cmd_period, {}),
+        ('stdin_2MBps', cmd_period, {'stdin_rate': 2097152, 'size': 2097152}),
+        ('control_channel', cmd_period, {'control': True}),
+        ('control_channel_2MBps', cmd_period, {'control': True,
+                                               'stdin_rate': 2097152,
+                                               'size': 2097152})
+    ],
+    'completions': [
+        ('class_library', completions, {})
+    ],
+    'control_channel': [
+        ('checks', control_channel, {})
+    ],
+    'requests': [
+        ('checks', requests, {})
+    ],
+    'reader': [
+        ('readline', reader, {'chunked': False}),
+        ('chunked', reader, {'lines': 500000})
+    ],
+    'flood': [
+        ('distinct', flood, {}),
+        ('distinct_unlimited_view', flood, {'max_lines': -1,
+                                            'lines': 50000}),
+        ('repeated', flood, {'repeated': True}),
+        ('repeated_no_collapse', flood, {'repeated': True,
+                                         'collapse': False})
+    ],
+    'large_eval': [
+        ('1MB', large_eval, {}),
+        ('8MB', large_eval, {'size': 8388608, 'count': 2})
+    ],
+    'round_trip': [
+        ('idle', round_trip, {}),
+        ('during_flood', round_trip, {'count': 50, 'burst': 50,
+                                      'flood_lines': 1000000})
+    ],
+    'restart': [
+        ('cold', restart, {}),
+        ('warm_standby', restart, {'standby': True})
+    ],
+    'help_index': [
+        ('1500_files', help_index, {})
+    ],
+    'supervisor': [
+        ('heartbeat_100ms', supervisor, {})
+    ],
+    'benchmark': [
+        ('2ms_block', benchmark, {})
+    ],
+    'synthdef_cache': [
+        ('200_synthdefs_uncached', synthdef_cache, {'cache': False}),
+        ('200_synthdefs', synthdef_cache, {})
+    ],
+    'osc_trace': [
+        ('all', osc_trace, {}),
+        ('sampled', osc_trace, {'sample': {'/address[1-7]': 10}}),
+        ('rate_limited', osc_trace, {'rate_limit': 100}),
+        ('recompile', osc_trace_recompile, {})
+    ],
+    'server_status': [
+        ('50ms', server_status, {})
+    ],
+    'trimming': [
+        ('1k_lines', trimming, {'buffer_lines': 1000}),
+        ('10k_lines', trimming, {'buffer_lines': 10000}),
+        ('100k_lines', trimming, {'buffer_lines': 100000, 'inserts': 50})
+    ]
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sclang I/O '
+                                     'pipeline against a fake sclang')
+    parser.add_argument('scenarios', nargs='*',
+                        help='scenarios to run, all by default: {}'.format(
+                            ', '.join(sorted(SCENARIOS))))
+    parser.add_argument('--output', help='write the JSON results to a file')
+    args = parser.parse_args()
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error('unknown scenario {}'.format(scenario))
+
+    results = []
+    for scenario in args.scenarios or sorted(SCENARIOS):
+        for name, function, params in SCENARIOS[scenario]:
+            print('{}/{}...'.format(scenario, name), file=sys.stderr)
+            results.append({
+                'scenario': scenario,
+                'name': name,
+                'params': params,
+                'results': function(**params)
+            })
+
+    output = json.dumps({
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""Minimal in-memory stand-in for Sublime Text's sublime module
+
+Only what SuperCollider.py uses when running the benchmarks. Views keep their
+text in a plain string, so absolute buffer timings are Python's, not Sublime's;
+compare them between runs rather than with the real editor.
+Callbacks passed to set_timeout are queued and run on the thread calling
+run_until, which plays the part of Sublime's main thread.
+"""
+import heapq
+import itertools
+import json
+import re
+import tempfile
+import threading
+import time
+
+import sublime_plugin
+
+ENCODED_POSITION = 1
+TRANSIENT = 4
+DRAW_EMPTY = 1
+HIDE_ON_MINIMAP = 2
+DRAW_EMPTY_AS_OVERWRITE = 4
+DRAW_NO_FILL = 32
+DRAW_NO_OUTLINE = 256
+DRAW_SOLID_UNDERLINE = 512
+
+_cache_path = tempfile.mkdtemp(prefix='sublime-stub-')
+_settings = {}
+_windows = []
+_status = []
+_timeouts = []
+_timeouts_lock = threading.Condition()
+_timeout_ids = itertools.count()
+_buffer_ids = itertools.count(1)
+_view_ids = itertools.count(1)
+
+
+# Main loop
+# ------------------------------------------------------------------------------
+def set_timeout(callback, delay=0):
+    with _timeouts_lock:
+        heapq.heappush(_timeouts, (time.perf_counter() + delay / 1000,
+                                   next(_timeout_ids), callback))
+        _timeouts_lock.notify()
+
+
+def set_timeout_async(callback, delay=0):
+    timer = threading.Timer(delay / 1000, callback)
+    timer.daemon = True
+    timer.start()
+
+
+def run_until(condition, timeout=60):
+    """Run queued callbacks until condition() is true, False on timeout"""
+    end = time.perf_counter() + timeout
+    while not condition():
+        now = time.perf_counter()
+        if now > end:
+            return False
+
+        with _timeouts_lock:
+            if not _timeouts or _timeouts[0][0] > now:
+                wait = end - now
+                if _timeouts:
+                    wait = min(wait, _timeouts[0][0] - now)
+                # wake up regularly, condition may depend on other threads
+                _timeouts_lock.wait(min(wait, 0.001))
+                continue
+            _, _, callback = heapq.heappop(_timeouts)
+
+        callback()
+
+    return True
+
+
+def pending_timeouts():
+    with _timeouts_lock:
+        return len(_timeouts)
+
+
+# Application
+# ------------------------------------------------------------------------------
+def platform():
+    return 'linux'
+
+
+def cache_path():
+    return _cache_path
+
+
+def installed_packages_path():
+    return _cache_path
+
+
+def status_message(msg):
+    _status.append(msg)
+
+
+def error_message(msg):
+    _status.append(msg)
+
+
+def load_settings(name):
+    if name not in _settings:
+        _settings[name] = Settings()
+    return _settings[name]
+
+
+def load_default_settings(name, path):
+    """Fill the settings called name from a .sublime-settings file"""
+    with open(path) as file:
+        text = re.sub(r'^\s*//.*$', '', file.read(), flags=re.M)
+    load_settings(name).update(json.loads(text))
+
+
+def windows():
+    return list(_windows)
+
+
+def active_window():
+    if not _windows:
+        _windows.append(Window())
+    return _windows[-1]
+
+
+def run_command(cmd, args=None):
+    if cmd == 'new_window':
+        _windows.append(Window())
+        return
+    command = sublime_plugin.find_command(sublime_plugin.ApplicationCommand,
+                                          cmd)
+    if command is not None:
+        command().run(**(args or {}))
+
+
+class Settings(dict):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.callbacks = {}
+
+    def set(self, key, value):
+        self[key] = value
+        for callbacks in list(self.callbacks.values()):
+            for callback in callbacks:
+                callback()
+
+    def add_on_change(self, key, callback):
+        self.callbacks.setdefault(key, []).append(callback)
+
+    def clear_on_change(self, key):
+        self.callbacks.pop(key, None)
+
+
+# Buffers
+# ------------------------------------------------------------------------------
+class Region():
+
+    def __init__(self, a, b=None):
+        self.a = a
+        self.b = a if b is None else b
+
+    def __repr__(self):
+        return 'Region({}, {})'.format(self.a, self.b)
+
+    def __eq__(self, other):
+        return (isinstance(other, Region) and
+                (self.a, self.b) == (other.a, other.b))
+
+    def __len__(self):
+        return self.size()
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return self.end() - self.begin()
+
+    def empty(self):
+        return self.a == self.b
+
+    def contains(self, x):
+        if isinstance(x, Region):
+            return self.begin() <= x.begin() and x.end() <= self.end()
+        return self.begin() <= x <= self.end()
+
+
+class Selection(list):
+
+    def add(self, region):
+        # overlapping regions are merged, like Sublime does
+        begin, end = region.begin(), region.end()
+        for other in list(self):
+            if other.begin() <= end and begin <= other.end():
+                begin = min(begin, other.begin())
+                end = max(end, other.end())
+                self.remove(other)
+        self.append(Region(begin, end))
+        self.sort(key=Region.begin)
+
+    def add_all(self, regions):
+        for region in regions:
+            self.add(region)
+
+
+class Edit():
+    pass
+
+
+class View():
+
+    def __init__(self, window=None):
+        self.text = ''
+        self._id = next(_view_ids)
+        self._buffer_id = next(_buffer_ids)
+        self._window = window
+        self._name = ''
+        self._settings = Settings()
+        self._sel = Selection()
+        self._regions = {}
+        self._status = {}
+        self._change_count = 0
+        self._viewport = (0, 0)
+
+    def id(self):
+        return self._id
+
+    def buffer_id(self):
+        return self._buffer_id
+
+    def window(self):
+        return self._window
+
+    def file_name(self):
+        return None
+
+    def name(self):
+        return self._name
+
+    def set_name(self, name):
+        self._name = name
+
+    def set_scratch(self, scratch):
+        pass
+
+    def set_syntax_file(self, syntax):
+        pass
+
+    def settings(self):
+        return self._settings
+
+    def change_count(self):
+        return self._change_count
+
+    def size(self):
+        return len(self.text)
+
+    def substr(self, x):
+        if isinstance(x, Region):
+            return self.text[x.begin():x.end()]
+        return self.text[x:x + 1]
+
+    def rowcol(self, point):
+        row = self.text.count('\n', 0, point)
+        return row, point - (self.text.rfind('\n', 0, point) + 1)
+
+    def line(self, x):
+        point = x.begin() if isinstance(x, Region) else x
+        begin = self.text.rfind('\n', 0, point) + 1
+        end = self.text.find('\n', point)
+        return Region(begin, len(self.text) if end == -1 else end)
+
+    def word(self, x):
+        point = x.begin() if isinstance(x, Region) else x
+        begin = point
+        while begin > 0 and (self.text[begin - 1].isalnum() or
+                             self.text[begin - 1] == '_'):
+            begin -= 1
+        end = point
+        while end < len(self.text) and (self.text[end].isalnum() or
+                                        self.text[end] == '_'):
+            end += 1
+        return Region(begin, end)
+
+    def match_selector(self, point, selector):
+        return False
+
+    def insert(self, edit, point, text):
+        self.text = self.text[:point] + text + self.text[point:]
+        self._change_count += 1
+        self.shift_regions(point, len(text))
+        return len(text)
+
+    def erase(self, edit, region):
+        begin, end = region.begin(), region.end()
+        self.text = self.text[:begin] + self.text[end:]
+        self._change_count += 1
+        self.shift_regions(end, begin - end)
+
+    def replace(self, edit, region, text):
+        self.erase(edit, region)
+        self.insert(edit, region.begin(), text)
+
+    def shift_regions(self, point, delta):
+        # regions move like Sublime's: after an erase they collapse
+        def shift(x):
+            if x < point:
+                return x if delta > 0 else min(x, point + delta)
+            return x + delta
+
+        for regions in self._regions.values():
+            for region in regions:
+                region.a = shift(region.a)
+                region.b = shift(region.b)
+
+    def sel(self):
+        return self._sel
+
+    def add_regions(self, key, regions, scope='', icon='', flags=0):
+        self._regions[key] = [Region(r.a, r.b) for r in regions]
+
+    def get_regions(self, key):
+        return [Region(r.a, r.b) for r in self._regions.get(key, [])]
+
+    def erase_regions(self, key):
+        self._regions.pop(key, None)
+
+    def set_status(self, key, value):
+        self._status[key] = value
+
+    def erase_status(self, key):
+        self._status.pop(key, None)
+
+    def visible_region(self):
+        # always scrolled to the bottom
+        return Region(max(0, len(self.text) - 4000), len(self.text))
+
+    def viewport_position(self):
+        return self._viewport
+
+    def set_viewport_position(self, position, animate=True):
+        self._viewport = position
+
+    def show(self, x, show_surrounds=True):
+        self._viewport = (0, 1)
+
+    def show_at_center(self, x):
+        self._viewport = (0, 1)
+
+    def close(self):
+        if self in self._window._views:
+            self._window._views.remove(self)
+            if self._window._active is self:
+                self._window._active = (self._window._views or [None])[-1]
+        for listener in sublime_plugin.subclasses(
+                sublime_plugin.EventListener):
+            if hasattr(listener, 'on_close'):
+                listener().on_close(self)
+
+    def run_command(self, cmd, args=None):
+        command = sublime_plugin.find_command(sublime_plugin.TextCommand, cmd)
+        if command is not None:
+            command(self).run(Edit(), **(args or {}))
+
+
+class Window():
+
+    def __init__(self):
+        self._views = []
+        self._panels = {}
+        self._active = None
+
+    def id(self):
+        return id(self)
+
+    def project_file_name(self):
+        return None
+
+    def project_data(self):
+        return None
+
+    def views(self):
+        return list(self._views)
+
+    def active_view(self):
+        return self._active
+
+    def new_file(self):
+        view = View(self)
+        self._views.append(view)
+        self._active = view
+        return view
+
+    def open_file(self, path, flags=0):
+        view = View(self)
+        self._views.append(view)
+        self._active = view
+        return view
+
+    def focus_view(self, view):
+        if view is not None:
+            self._active = view
+
+    def num_groups(self):
+        return 1
+
+    def set_view_index(self, view, group, index):
+        pass
+
+    def folders(self):
+        return []
+
+    def get_output_panel(self, name):
+        if name not in self._panels:
+            self._panels[name] = View(None)
+        return self._panels[name]
+
+    def show_quick_panel(self, items, on_done, *args, **kwargs):
+        pass
+
+    def show_input_panel(self, caption, initial_text, on_done, on_change,
+                         on_cancel):
+        pass
+
+    def run_command(self, cmd, args=None):
+        command = sublime_plugin.find_command(sublime_plugin.WindowCommand, cmd)
+        if command is not None:
+            command(self).run(**(args or {}))
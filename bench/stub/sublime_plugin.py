@@ -0,0 +1,57 @@
+"""Minimal stand-in for Sublime Text's sublime_plugin module"""
+import re
+
+
+class Command():
+
+    def is_enabled(self, *args, **kwargs):
+        return True
+
+    def is_visible(self, *args, **kwargs):
+        return True
+
+
+class ApplicationCommand(Command):
+    pass
+
+
+class WindowCommand(Command):
+
+    def __init__(self, window):
+        self.window = window
+
+
+class TextCommand(Command):
+
+    def __init__(self, view):
+        self.view = view
+
+
+class EventListener():
+    pass
+
+
+def command_name(cls):
+    # SuperColliderUpdatePostViewCommand -> super_collider_update_post_view
+    name = re.sub(r'Command$', '', cls.__name__)
+    return re.sub(r'(?<!^)([A-Z])', r'_\1', name).lower()
+
+
+def subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        for nested in subclasses(subclass):
+            yield nested
+
+
+_commands = {}
+
+
+def find_command(base, name):
+    key = (base, name)
+    if key not in _commands:
+        _commands[key] = None
+        for cls in subclasses(base):
+            if command_name(cls) == name:
+                _commands[key] = cls
+    return _commands[key]